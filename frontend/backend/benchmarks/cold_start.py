@@ -0,0 +1,134 @@
+"""Measure cold start: process spawn to liveness, readiness and the first served frame.
+
+Each run starts a fresh ``uvicorn main:app`` process with local storage in
+a temporary directory, polls ``/health/live`` and, as soon as the process
+is live, sends one JPEG to ``/api/frame`` the way a camera reconnecting
+after a deploy would. The frame waits for the model if warm-up has not
+finished, so "first frame" is what the first client actually sees.
+
+    python benchmarks/cold_start.py --runs 3
+    python benchmarks/cold_start.py --runs 3 --no-warmup      # model loads on the first frame
+    python benchmarks/cold_start.py --wait-ready              # send the frame only after /health/ready
+
+The server's own view (import time, per-step warm-up seconds) is taken
+from its readiness snapshot and included in the output.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import tempfile
+from statistics import median
+from typing import Any, Dict, List
+
+import cv2
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import SyntheticScene
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, url: str, deadline: float, expect_status: int = 200) -> float:
+    # Tek istemci ve seyrek yoklama: tek çekirdekte yoklama warm-up'tan CPU çalmasın
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url, timeout=1).status_code == expect_status:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} did not return {expect_status} in time")
+
+
+def cold_start(frame: bytes, warmup: bool, wait_ready: bool, timeout: float) -> Dict[str, Any]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, STORAGE_BACKEND="local", MODEL_WARMUP="true" if warmup else "false")
+    workdir = tempfile.mkdtemp(prefix="vs-cold-")
+    spawned = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    client = httpx.Client()
+    try:
+        deadline = spawned + timeout
+        live = wait_for(client, f"{url}/health/live", deadline)
+        ready = wait_for(client, f"{url}/health/ready", deadline) if wait_ready else None
+        response = client.post(
+            f"{url}/api/frame", content=frame, headers={"content-type": "image/jpeg"},
+            timeout=max(1.0, deadline - time.perf_counter())
+        )
+        first_frame = time.perf_counter()
+        if response.status_code != 200 or "error" in response.json():
+            raise RuntimeError(f"First frame failed: {response.status_code} {response.text[:200]}")
+        if ready is None:
+            ready = wait_for(client, f"{url}/health/ready", deadline)
+        server_view = client.get(f"{url}/health/ready", timeout=5).json()
+        # İkinci frame sıcak yolun maliyetini gösterir
+        started = time.perf_counter()
+        client.post(f"{url}/api/frame?session={response.json()['session_token']}", content=frame,
+                   headers={"content-type": "image/jpeg"}, timeout=30)
+        second_frame_ms = (time.perf_counter() - started) * 1000
+    finally:
+        client.close()
+        server.terminate()
+        server.wait(timeout=30)
+    return {
+        "live_s": round(live - spawned, 3),
+        "ready_s": round(ready - spawned, 3),
+        "first_frame_s": round(first_frame - spawned, 3),
+        "second_frame_ms": round(second_frame_ms, 1),
+        "server": server_view
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--no-warmup", action="store_true", help="Start with MODEL_WARMUP=false")
+    parser.add_argument("--wait-ready", action="store_true", help="Send the first frame after /health/ready")
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds allowed per cold start")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    ok, encoded = cv2.imencode(".jpg", SyntheticScene(width, height).frame(0))
+    frame = encoded.tobytes()
+
+    runs: List[Dict[str, Any]] = []
+    for index in range(args.runs):
+        result = cold_start(frame, not args.no_warmup, args.wait_ready, args.timeout)
+        runs.append(result)
+        print(f"run {index + 1}: live {result['live_s']}s, ready {result['ready_s']}s, "
+              f"first frame {result['first_frame_s']}s, second frame {result['second_frame_ms']}ms", file=sys.stderr)
+
+    summary = {
+        "warmup": not args.no_warmup,
+        "wait_ready": args.wait_ready,
+        "runs": args.runs,
+        **{key: round(median(run[key] for run in runs), 3)
+           for key in ("live_s", "ready_s", "first_frame_s", "second_frame_ms")},
+        "server": runs[-1]["server"]
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": summary, "runs": runs}, f, indent=2)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
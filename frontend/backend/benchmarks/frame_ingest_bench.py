@@ -0,0 +1,90 @@
+"""Per-frame ingest cost of the /frame endpoint: JSON/base64 vs binary body.
+
+Old path: JSON body with a base64 data URL -> json.loads -> base64 decode ->
+full-resolution imdecode.
+New path: raw JPEG body copied once into a pooled buffer -> header
+validation -> reduced-resolution imdecode when the model input allows it.
+
+    python benchmarks/frame_ingest_bench.py --iterations 200
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.frame_ingest import FrameBufferPool, decode_frame
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "1440p": (2560, 1440)}
+
+
+def synthetic_jpeg(width: int, height: int) -> bytes:
+    rng = np.random.default_rng(0)
+    frame = np.zeros((height, width, 3), np.uint8)
+    frame[:] = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+    for _ in range(20):
+        x, y = int(rng.integers(0, width - 200)), int(rng.integers(0, height - 200))
+        cv2.rectangle(frame, (x, y), (x + 150, y + 180), tuple(int(c) for c in rng.integers(0, 255, 3)), -1)
+    frame = cv2.add(frame, rng.integers(0, 20, frame.shape, dtype=np.uint8))
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return buf.tobytes()
+
+
+def old_ingest(body: bytes) -> np.ndarray:
+    data = json.loads(body)
+    image_b64 = data.get("image")
+    header, encoded = image_b64.split(",", 1) if "," in image_b64 else ("", image_b64)
+    img_bytes = base64.b64decode(encoded)
+    return cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def new_ingest(body: bytes, pool: FrameBufferPool) -> np.ndarray:
+    buffer = pool.acquire()
+    try:
+        buffer[:len(body)] = body  # request.stream() -> pooled buffer kopyası
+        frame, _ = decode_frame(memoryview(buffer)[:len(body)])
+        return frame
+    finally:
+        pool.release(buffer)
+
+
+def time_per_frame(func, iterations: int, *args) -> float:
+    func(*args)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    pool = FrameBufferPool()
+    report = {}
+    for name, (width, height) in RESOLUTIONS.items():
+        jpeg = synthetic_jpeg(width, height)
+        json_body = json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()}).encode()
+        decoded = new_ingest(jpeg, pool)
+        report[name] = {
+            "old_payload_bytes": len(json_body),
+            "new_payload_bytes": len(jpeg),
+            "old_ms_per_frame": round(time_per_frame(old_ingest, args.iterations, json_body), 3),
+            "new_ms_per_frame": round(time_per_frame(new_ingest, args.iterations, jpeg, pool), 3),
+            "new_decoded_shape": list(decoded.shape)
+        }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Micro-benchmarks for the detector, tracker and analyzer hot paths.
+
+Runs offline: frames come from ``SyntheticScene`` and inference from
+``StubYOLO``, so only our own code is measured (plus the configured stub
+latency). Results are written as JSON; pass ``--compare`` with an earlier
+result file to print the change per benchmark. Errors logged while a
+benchmark runs (e.g. a hot path falling back after an exception) are
+recorded in its result and make the script exit non-zero, since the
+timings then measure the error path.
+
+    python benchmarks/hot_paths_bench.py --output bench.json
+    python benchmarks/hot_paths_bench.py --compare bench.json --only tracker
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import SyntheticScene, StubYOLO, box_iou
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "iterations": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 4),
+        "p50_ms": round(ordered[len(ordered) // 2], 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "min_ms": round(ordered[0], 4)
+    }
+
+
+def measure(func: Callable[[int], Any], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """Time ``func(i)`` per call in milliseconds"""
+    for i in range(warmup):
+        func(i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(warmup + i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+class ErrorCollector(logging.Handler):
+    """Collects ERROR records logged while a benchmark runs"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(f"{record.name}: {record.getMessage()}")
+
+
+def make_detector(stub: StubYOLO):
+    from models.detector import ObjectDetector
+    return ObjectDetector(model=stub)
+
+
+def warm_tracker(detector, scene: SyntheticScene, frames: int):
+    """Fill tracker and behaviour history to steady state without timing it"""
+    for index in range(frames):
+        detector.process_raw(detector.model._boxes(index), detector.model.names)
+
+
+def bench_preprocess(args, scene: SyntheticScene) -> Dict[str, Any]:
+    detector = make_detector(StubYOLO(scene))
+    frames = [scene.frame(i) for i in range(8)]
+    return measure(lambda i: detector.preprocess_frame(frames[i % len(frames)]), args.iterations)
+
+
+def bench_process_video_frame(args, scene: SyntheticScene) -> Dict[str, Any]:
+    stub = StubYOLO(scene, latency_ms=args.stub_latency_ms)
+    detector = make_detector(stub)
+    frames = [scene.frame(i) for i in range(args.iterations + 3)]
+    matched = total = 0
+
+    def step(i):
+        nonlocal matched, total
+        detections, _ = detector.process_video_frame(frames[i])
+        truth = scene.ground_truth(i)
+        if detections:
+            iou = box_iou(np.array([d["bbox"] for d in detections], np.float32), truth[:, :4])
+            matched += int((iou.max(axis=0) > 0.5).sum())
+        total += len(truth)
+
+    result = measure(step, args.iterations)
+    result["recall_vs_ground_truth"] = round(matched / total, 4) if total else None
+    result["stub_latency_ms"] = args.stub_latency_ms
+    return result
+
+
+def bench_get_track_id(args, scene: SyntheticScene) -> Dict[str, Any]:
+    stub = StubYOLO(scene)
+    detector = make_detector(stub)
+    warm_tracker(detector, scene, 40)
+    # Mevcut track'lerin hiçbiriyle eşleşmeyen kutu: en kötü durum, tüm track'ler taranır
+    track_count = len(detector.tracked_objects)
+    far = (-1000.0, -1000.0, -990.0, -990.0)
+
+    def step(i):
+        detector._get_track_id(*far, "person")
+        detector.tracked_objects.pop(detector.next_track_id - 1, None)
+
+    result = measure(step, args.iterations * 10)
+    result["tracks"] = track_count
+    return result
+
+
+def bench_analyze_behaviors(args, scene: SyntheticScene) -> Dict[str, Any]:
+    stub = StubYOLO(scene)
+    detector = make_detector(stub)
+    warm_tracker(detector, scene, detector.anomaly_window + 5)
+    detections = [dict(d) for d in detector.frame_history[-1]]
+    result = measure(lambda i: detector._analyze_behaviors(detections), args.iterations * 5)
+    result["detections"] = len(detections)
+    return result
+
+
+def bench_detect_anomalies(args, scene: SyntheticScene) -> Dict[str, Any]:
+    stub = StubYOLO(scene)
+    detector = make_detector(stub)
+    warm_tracker(detector, scene, detector.anomaly_window + 5)
+    detections = [dict(d) for d in detector.frame_history[-1]]
+    behaviors = detector._analyze_behaviors(detections)
+    result = measure(lambda i: detector._detect_anomalies(detections, behaviors), args.iterations * 5)
+    result["detections"] = len(detections)
+    return result
+
+
+def bench_crime_analyzer(args, scene: SyntheticScene) -> Dict[str, Any]:
+    from models.crime_analyzer import CrimeVideoAnalyzer
+    analyzer = CrimeVideoAnalyzer()
+    frames = [scene.frame(i) for i in range(8)]
+    return measure(lambda i: analyzer.analyze_frame(frames[i % len(frames)]), args.iterations)
+
+
+def bench_process_video(args, scene: SyntheticScene) -> Dict[str, Any]:
+    """Whole batch pipeline: decode, detector, spool, results upload to local storage"""
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+    # Stub çıktıları gerçek model sürümüyle önbelleğe yazılmamalı
+    os.environ["RAW_DETECTION_CACHE"] = "false"
+    workdir = tempfile.mkdtemp(prefix="vs-bench-")
+    os.environ.setdefault("LOCAL_STORAGE_DIR", os.path.join(workdir, "storage"))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import threading
+        from models import detector as detector_module
+        from services import video_analysis
+
+        stub = StubYOLO(scene, latency_ms=args.stub_latency_ms)
+        detector_module._shared_models[detector_module.DEFAULT_MODEL_PATH] = (stub, threading.Lock())
+        samples = []
+        for run in range(args.video_runs):
+            stub.reset()
+            video_path = scene.write_video(os.path.join(workdir, f"bench-{run}.mp4"), args.video_frames)
+            start = time.perf_counter()
+            result = video_analysis.process_video(f"bench-{run}", video_path, f"videos/bench-{run}.mp4")
+            samples.append((time.perf_counter() - start) * 1000)
+        summary = summarize(samples)
+        summary["frames"] = args.video_frames
+        summary["ms_per_frame"] = round(summary["mean_ms"] / args.video_frames, 4)
+        summary["processed_frames"] = result["summary"]["processedFrames"]
+        return summary
+    finally:
+        os.chdir(cwd)
+
+
+BENCHMARKS = {
+    "preprocess_frame": bench_preprocess,
+    "process_video_frame": bench_process_video_frame,
+    "tracker.get_track_id": bench_get_track_id,
+    "tracker.analyze_behaviors": bench_analyze_behaviors,
+    "tracker.detect_anomalies": bench_detect_anomalies,
+    "crime_analyzer.analyze_frame": bench_crime_analyzer,
+    "process_video": bench_process_video,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def print_comparison(previous: Dict[str, Any], current: Dict[str, Any]):
+    print(f"\n{'benchmark':32} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before or "mean_ms" not in before or "mean_ms" not in result:
+            continue
+        if before.get("logged_errors") or result.get("logged_errors"):
+            print(f"{name:32} {'skipped: errors logged during the run':>32}")
+            continue
+        change = (result["mean_ms"] - before["mean_ms"]) / before["mean_ms"] * 100 if before["mean_ms"] else 0.0
+        print(f"{name:32} {before['mean_ms']:>11.4f} {result['mean_ms']:>11.4f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--objects", type=int, default=6, help="Moving objects in the synthetic scene")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Simulated inference time per frame")
+    parser.add_argument("--video-frames", type=int, default=60)
+    parser.add_argument("--video-runs", type=int, default=3)
+    parser.add_argument("--only", help="Run benchmarks whose name contains this string")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    scene = SyntheticScene(args.width, args.height, args.objects)
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": {}
+    }
+    failed = []
+    for name, bench in BENCHMARKS.items():
+        if args.only and args.only not in name:
+            continue
+        collector = ErrorCollector()
+        logging.getLogger().addHandler(collector)
+        try:
+            report["results"][name] = bench(args, scene)
+        except Exception as e:
+            report["results"][name] = {"error": str(e)}
+        finally:
+            logging.getLogger().removeHandler(collector)
+        if collector.messages:
+            # Süreler hata yolunu ölçer (ör. preprocess istisna atıp ham frame'e düşer)
+            report["results"][name]["logged_errors"] = len(collector.messages)
+            report["results"][name]["first_error"] = collector.messages[0]
+        if "error" in report["results"][name] or collector.messages:
+            failed.append(name)
+        print(f"{name}: {json.dumps(report['results'][name])}", flush=True)
+    report["failed"] = failed
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+    if failed:
+        print(f"Benchmarks hit errors, timings are not comparable: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Round-trip cost of handing a frame to the inference server.
+
+Forks an inference worker whose model is ``StubYOLO`` (no compute), so
+the measured time is transport only: the slot copy, the request header
+over the Unix socket and the boxes back. For comparison the same frame
+goes to a forked process over a ``multiprocessing.Pipe``, which pickles
+the frame and the boxes. Also checks that boxes come back unchanged, and
+rescaled correctly when a frame is downscaled to fit a small slot.
+
+    python benchmarks/inference_transport.py
+    python benchmarks/inference_transport.py --sizes 1920x1080 --frames 500 --output transport.json
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import StubYOLO
+from models import detector as detector_module
+from utils import inference_server
+
+
+def start_inference_worker(socket_path: str) -> int:
+    listener = inference_server.bind_listener(socket_path)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            inference_server.run_worker(listener)
+        finally:
+            os._exit(0)
+    listener.close()
+    return pid
+
+
+def start_pipe_worker(stub: StubYOLO):
+    parent, child = multiprocessing.Pipe()
+    pid = os.fork()
+    if pid == 0:
+        parent.close()
+        try:
+            while True:
+                child.recv()
+                child.send(stub._boxes(0))
+        except EOFError:
+            pass
+        finally:
+            os._exit(0)
+    child.close()
+    return pid, parent
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.array(samples) * 1e6
+    return {"p50_us": round(float(np.percentile(values, 50)), 1), "p95_us": round(float(np.percentile(values, 95)), 1)}
+
+
+def measure(client: inference_server.InferenceClient, pipe, frame: np.ndarray, frames: int) -> Dict[str, Any]:
+    shm, piped = [], []
+    for _ in range(frames):
+        started = time.perf_counter()
+        client.infer(frame, detector_module.DEFAULT_MODEL_PATH, 640, 0.0, 0.5, preprocess=False)
+        shm.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        pipe.send(frame)
+        pipe.recv()
+        piped.append(time.perf_counter() - started)
+    result = {"shape": list(frame.shape), "megabytes": round(frame.nbytes / 1e6, 2),
+              "shared_memory": percentiles(shm), "pickled_pipe": percentiles(piped)}
+    result["speedup_p50"] = round(result["pickled_pipe"]["p50_us"] / result["shared_memory"]["p50_us"], 2)
+    return result
+
+
+def check_boxes(client: inference_server.InferenceClient, stub: StubYOLO, frame: np.ndarray, socket_path: str):
+    """Boxes must match the stub's exactly, and map back to frame coordinates after a downscale"""
+    expected = stub._boxes(0)
+    raw, names, _ = client.infer(frame, detector_module.DEFAULT_MODEL_PATH, 640, 0.0, 0.5, preprocess=False)
+    assert names == stub.names, "class names differ"
+    assert np.array_equal(raw, expected), "boxes differ"
+    small = inference_server.InferenceClient(socket_path, slots=1, slot_bytes=frame.nbytes // 4)
+    try:
+        scaled, _, _ = small.infer(frame, detector_module.DEFAULT_MODEL_PATH, 640, 0.0, 0.5, preprocess=False)
+    finally:
+        small.close()
+    # Stub kutuları frame boyutundan bağımsızdır; istemci onları küçültme oranıyla büyütür
+    scale = (frame.nbytes // 4) ** 0.5 / frame.nbytes ** 0.5
+    assert np.allclose(scaled[:, :4] * scale, expected[:, :4], rtol=0.02), "downscaled boxes not mapped back"
+
+
+class FixedStub(StubYOLO):
+    """Returns the same boxes on every call, so replies can be checked"""
+
+    def _boxes(self, index: int) -> np.ndarray:
+        return super()._boxes(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="640x480,1280x720,1920x1080")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    # Stub hesap yapmaz; inference süreci tek thread ile başlasın
+    os.environ.setdefault("THREADS_INFERENCE", "1")
+    stub = FixedStub()
+    # Fork edilen inference süreci bu modeli paylaşılan model olarak devralır
+    detector_module._shared_models[detector_module.DEFAULT_MODEL_PATH] = (stub, threading.Lock())
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="vs-transport-"), "inference.sock")
+    server = start_inference_worker(socket_path)
+    pipe_pid, pipe = start_pipe_worker(stub)
+    client = inference_server.InferenceClient(socket_path, slots=1)
+    results = []
+    try:
+        for size in args.sizes.split(","):
+            width, height = (int(v) for v in size.lower().split("x"))
+            frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+            check_boxes(client, stub, frame, socket_path)
+            result = measure(client, pipe, frame, args.frames)
+            results.append(result)
+            print(f"{size}: shared memory p50 {result['shared_memory']['p50_us']} us, "
+                  f"pickled pipe p50 {result['pickled_pipe']['p50_us']} us ({result['speedup_p50']}x)", file=sys.stderr)
+    finally:
+        client.close()
+        pipe.close()
+        os.kill(server, signal.SIGTERM)
+        os.waitpid(server, 0)
+        os.waitpid(pipe_pid, 0)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""HTTP/websocket load generator for the live and upload APIs.
+
+Simulates N cameras sending synthetic JPEG frames at a fixed rate and
+reports latency percentiles, achieved throughput, dropped frames and
+errors. With several concurrency levels it prints a capacity curve and the
+level at which the node saturates.
+
+    python benchmarks/stub_server.py --port 8000 --latency-ms 20 &
+    python benchmarks/load_generator.py --mode feed --concurrency 1,2,4,8 --fps 10
+    python benchmarks/load_generator.py --mode frame --concurrency 4 --resolution 1280x720
+    python benchmarks/load_generator.py --mode upload --concurrency 2 --wait-analysis
+
+``--start-server`` launches ``stub_server.py`` itself for the duration of
+the run.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import tempfile
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import cv2
+import httpx
+import websockets
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import SyntheticScene
+
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+
+class LevelStats:
+    """Counters for one concurrency level"""
+
+    def __init__(self):
+        self.sent = 0
+        self.completed = 0
+        self.dropped = 0
+        self.errors: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.server_latencies: List[float] = []
+        self.bytes_sent = 0
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, elapsed: float, offered_fps: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        server = sorted(self.server_latencies)
+        errors = sum(self.errors.values())
+        return {
+            "duration_seconds": round(elapsed, 2),
+            "offered_fps": round(offered_fps, 2),
+            "achieved_fps": round(self.completed / elapsed, 2) if elapsed else 0.0,
+            "frames_sent": self.sent,
+            "frames_completed": self.completed,
+            "frames_dropped": self.dropped,
+            "drop_rate": round(self.dropped / self.sent, 4) if self.sent else 0.0,
+            "errors": self.errors,
+            "error_rate": round(errors / max(1, self.sent), 4),
+            "latency_ms": {
+                "p50": percentile(ordered, 0.50),
+                "p95": percentile(ordered, 0.95),
+                "p99": percentile(ordered, 0.99),
+                "max": round(ordered[-1], 2) if ordered else None
+            },
+            "server_latency_ms": {"p50": percentile(server, 0.50), "p95": percentile(server, 0.95)},
+            "mbit_per_second": round(self.bytes_sent * 8 / elapsed / 1e6, 2) if elapsed else 0.0
+        }
+
+
+def encode_frames(width: int, height: int, count: int = 30, quality: int = 80) -> List[bytes]:
+    """Pre-encoded JPEGs so the generator's own CPU use stays out of the measurement"""
+    scene = SyntheticScene(width, height)
+    return [
+        cv2.imencode(".jpg", scene.frame(i), [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+        for i in range(count)
+    ]
+
+
+async def feed_camera(args, camera: int, frames: List[bytes], stats: LevelStats, deadline: float):
+    """One websocket camera: frames go out on a fixed clock whatever the replies do.
+
+    The server keeps only the newest frame, so each reply answers the
+    oldest outstanding frame after skipping the ones it reports as dropped
+    or skipped; client latency is measured against that frame's send time.
+    """
+    url = f"{args.ws_url}/api/feed/load-{camera}-{os.getpid()}"
+    interval = 1.0 / args.fps
+    outstanding: deque = deque()
+    seen = {"dropped": 0, "skipped": 0, "rate_limited": 0}
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=10) as ws:
+            async def reader():
+                async for message in ws:
+                    reply = json.loads(message)
+                    dropped = reply.get("total_dropped_frames", 0)
+                    skipped = reply.get("skipped_frames", 0)
+                    limited = reply.get("rate_limited_frames", 0)
+                    lost = (dropped - seen["dropped"]) + (skipped - seen["skipped"]) + (limited - seen["rate_limited"])
+                    seen.update(dropped=dropped, skipped=skipped, rate_limited=limited)
+                    stats.dropped += lost
+                    for _ in range(min(lost, len(outstanding))):
+                        outstanding.popleft()
+                    if outstanding:
+                        stats.latencies.append((time.perf_counter() - outstanding.popleft()) * 1000)
+                    stats.server_latencies.append(reply.get("latency_ms", 0.0))
+                    stats.completed += 1
+
+            reader_task = asyncio.create_task(reader())
+            next_send = time.perf_counter()
+            index = camera
+            while time.perf_counter() < deadline and not reader_task.done():
+                frame = frames[index % len(frames)]
+                index += 1
+                outstanding.append(time.perf_counter())
+                await ws.send(frame)
+                stats.sent += 1
+                stats.bytes_sent += len(frame)
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            # Son yanıtlar için kısa bir süre bekle
+            await asyncio.sleep(min(1.0, args.drain_seconds))
+            reader_task.cancel()
+            if reader_task.done() and not reader_task.cancelled() and reader_task.exception():
+                raise reader_task.exception()
+    except websockets.ConnectionClosed as e:
+        stats.error(f"ws_closed_{e.code}" if getattr(e, "code", None) else "ws_closed")
+    except (OSError, asyncio.TimeoutError, websockets.InvalidStatus) as e:
+        stats.error(f"connect_{type(e).__name__}")
+
+
+async def frame_camera(args, camera: int, client: httpx.AsyncClient, frames: List[bytes],
+                       stats: LevelStats, deadline: float):
+    """One camera on POST /frame; a frame whose send slot passed while waiting counts as dropped"""
+    interval = 1.0 / args.fps
+    token = None
+    next_send = time.perf_counter()
+    index = camera
+    while time.perf_counter() < deadline:
+        frame = frames[index % len(frames)]
+        index += 1
+        headers = {"Content-Type": "image/jpeg"}
+        if token:
+            headers["X-Session-Token"] = token
+        started = time.perf_counter()
+        stats.sent += 1
+        stats.bytes_sent += len(frame)
+        try:
+            response = await client.post(f"{args.url}/api/frame", content=frame, headers=headers)
+            latency = (time.perf_counter() - started) * 1000
+            if response.status_code == 200 and "error" not in response.json():
+                token = response.json().get("session_token", token)
+                stats.completed += 1
+                stats.latencies.append(latency)
+                # Server-Timing: app;dur=<ms>
+                timing = response.headers.get("Server-Timing", "")
+                if "dur=" in timing:
+                    stats.server_latencies.append(float(timing.split("dur=", 1)[1].split(",")[0]))
+            else:
+                if response.status_code == 410:
+                    token = None
+                stats.error(f"http_{response.status_code}")
+        except httpx.HTTPError as e:
+            stats.error(type(e).__name__)
+        next_send += interval
+        now = time.perf_counter()
+        if now > next_send:
+            missed = int((now - next_send) / interval)
+            stats.dropped += missed
+            next_send += missed * interval
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+
+async def upload_client(args, client: httpx.AsyncClient, video: bytes, stats: LevelStats,
+                        deadline: float, analysis_times: List[float]):
+    """Upload the synthetic video back to back; optionally wait for each analysis to finish"""
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        stats.sent += 1
+        try:
+            response = await client.post(
+                f"{args.url}/api/video/upload",
+                files={"video": ("load.mp4", video, "video/mp4")}
+            )
+        except httpx.HTTPError as e:
+            stats.error(type(e).__name__)
+            continue
+        if response.status_code != 200:
+            stats.error(f"http_{response.status_code}")
+            continue
+        stats.completed += 1
+        stats.bytes_sent += len(video)
+        stats.latencies.append((time.perf_counter() - started) * 1000)
+        if not args.wait_analysis:
+            continue
+        video_id = response.json()["id"]
+        while True:
+            job = (await client.get(f"{args.url}/api/video/jobs/{video_id}")).json()
+            if job.get("status") not in ("queued", "running"):
+                break
+            await asyncio.sleep(0.25)
+        if job.get("status") == "completed":
+            analysis_times.append((time.perf_counter() - started) * 1000)
+        else:
+            stats.error(f"analysis_{job.get('status')}")
+
+
+async def run_level(args, concurrency: int, payload) -> Dict[str, Any]:
+    stats = LevelStats()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    analysis_times: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency + 4)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        if args.mode == "feed":
+            tasks = [feed_camera(args, i, payload, stats, deadline) for i in range(concurrency)]
+        elif args.mode == "frame":
+            tasks = [frame_camera(args, i, client, payload, stats, deadline) for i in range(concurrency)]
+        else:
+            tasks = [upload_client(args, client, payload, stats, deadline, analysis_times) for _ in range(concurrency)]
+        await asyncio.gather(*tasks)
+        load = None
+        try:
+            load = (await client.get(f"{args.url}/api/load")).json()
+        except Exception:
+            pass
+    elapsed = min(time.perf_counter() - started, args.duration)
+    offered = concurrency * args.fps if args.mode != "upload" else 0.0
+    report = {"concurrency": concurrency, **stats.report(elapsed, offered)}
+    if args.mode == "upload" and args.wait_analysis:
+        ordered = sorted(analysis_times)
+        report["analysis_ms"] = {"p50": percentile(ordered, 0.5), "p95": percentile(ordered, 0.95)}
+    if load is not None:
+        report["server_degradation_level"] = load.get("level_name")
+    return report
+
+
+def is_saturated(args, level: Dict[str, Any]) -> bool:
+    """Throughput below 90% of offered load, errors above 1% or p95 over the SLO"""
+    if level["error_rate"] > 0.01:
+        return True
+    p95 = level["latency_ms"]["p95"]
+    if p95 is not None and p95 > args.slo_ms:
+        return True
+    return args.mode != "upload" and level["achieved_fps"] < 0.9 * level["offered_fps"]
+
+
+def start_server(args) -> subprocess.Popen:
+    workdir = tempfile.mkdtemp(prefix="vs-load-")
+    port = args.url.rsplit(":", 1)[-1].strip("/")
+    server = subprocess.Popen([
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_server.py"),
+        "--port", port, "--latency-ms", str(args.stub_latency_ms), "--workdir", workdir
+    ])
+    for _ in range(100):
+        try:
+            if httpx.get(f"{args.url}/health/ready", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Stub server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mode", choices=("feed", "frame", "upload"), default="feed")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated camera/client counts")
+    parser.add_argument("--fps", type=float, default=10.0, help="Frames per second per camera")
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--video-seconds", type=float, default=5.0, help="Length of the uploaded video")
+    parser.add_argument("--wait-analysis", action="store_true", help="Upload mode: wait for each analysis")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p95 latency that counts as saturated")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--drain-seconds", type=float, default=1.0)
+    parser.add_argument("--start-server", action="store_true", help="Launch stub_server.py for this run")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    args.ws_url = args.url.replace("http", "ws", 1)
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    if args.mode == "upload":
+        path = SyntheticScene(width, height).write_video(
+            os.path.join(tempfile.mkdtemp(prefix="vs-load-"), "load.mp4"), int(args.video_seconds * 30)
+        )
+        with open(path, "rb") as f:
+            payload = f.read()
+    else:
+        payload = encode_frames(width, height)
+
+    server = start_server(args) if args.start_server else None
+    levels = []
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            level = asyncio.run(run_level(args, concurrency, payload))
+            level["saturated"] = is_saturated(args, level)
+            levels.append(level)
+            latency = level["latency_ms"]
+            print(
+                f"concurrency={concurrency:<4} achieved={level['achieved_fps']:>8.2f}/s "
+                f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms "
+                f"dropped={level['drop_rate']:.1%} errors={level['error_rate']:.1%}"
+                f"{'  SATURATED' if level['saturated'] else ''}",
+                flush=True
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    saturation = next((level["concurrency"] for level in levels if level["saturated"]), None)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "levels": levels,
+        "saturation_concurrency": saturation,
+        "max_unsaturated_concurrency": max(
+            (level["concurrency"] for level in levels if not level["saturated"]), default=None
+        )
+    }
+    print(json.dumps({k: report[k] for k in ("saturation_concurrency", "max_unsaturated_concurrency")}))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
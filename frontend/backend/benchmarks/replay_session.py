@@ -0,0 +1,215 @@
+"""Replay a recorded live camera session through the live processing path.
+
+Recordings are ``.vsrec`` files written by ``websocket_endpoint`` when
+``LIVE_RECORDING`` is enabled (see ``utils/session_recording.py``). Frames
+are fed with their recorded timing through the same code the websocket
+uses: the per-client rate limiter, ``LatestFrameSlot`` (so frames that
+arrive while inference is busy are dropped exactly as live), the capacity
+controller's degradation levels and ``process_in_session``.
+
+``--speed 1`` replays in real time, ``--speed 4`` four times faster, and
+``--speed max`` processes every frame back to back with no pacing, rate
+limiting or drops (pure pipeline cost). Per-frame traces go to ``--trace``
+as JSON lines; the summary to ``--output``.
+
+    python benchmarks/replay_session.py recordings/cam1-20260101-120000-ab12.vsrec --trace trace.jsonl
+    python benchmarks/replay_session.py cam1.vsrec --speed max --stub-latency-ms 20
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.session_recording import SessionRecording
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+
+    return {"mean": round(sum(ordered) / len(ordered), 2), "p50": pick(0.5), "p95": pick(0.95),
+            "p99": pick(0.99), "max": round(ordered[-1], 2)}
+
+
+class Replay:
+    """Feeds one recording into a fresh live session and collects per-frame traces"""
+
+    def __init__(self, live, recording: SessionRecording, limit: Optional[int] = None):
+        self.live = live
+        self.recording = recording
+        self.limit = limit
+        self.session = live.sessions.create(recording.meta.get("client_id", "replay"), "replay")
+        self.trace: List[Dict[str, Any]] = []
+        self.seen = 0
+
+    def _frames(self):
+        for index, (offset, data) in enumerate(self.recording.frames()):
+            if self.limit is not None and index >= self.limit:
+                return
+            yield index, offset, data
+
+    def _skip(self, index: int, offset: float) -> bool:
+        """Frame-stride skipping of the current degradation level, as in the websocket loop"""
+        self.seen += 1
+        if self.seen % self.live.capacity.profile["frame_stride"]:
+            self.trace.append({"frame": index, "offset_s": round(offset, 4), "status": "skipped"})
+            return True
+        return False
+
+    def _record(self, index: int, offset: float, received_at: float, started_at: float,
+                dropped: int, results: Dict[str, Any]):
+        finished_at = time.perf_counter()
+        self.trace.append({
+            "frame": index,
+            "offset_s": round(offset, 4),
+            "status": "processed",
+            "queue_ms": round((started_at - received_at) * 1000, 3),
+            "inference_ms": round((finished_at - started_at) * 1000, 3),
+            "latency_ms": round((finished_at - received_at) * 1000, 3),
+            "dropped_before": dropped,
+            "detections": len(results["detections"]),
+            "suspicious": len(results["suspicious_interactions"]),
+            "degradation_level": self.live.capacity.profile["name"]
+        })
+
+    def run_unpaced(self):
+        """Every frame, back to back, on the calling thread"""
+        for index, offset, data in self._frames():
+            received_at = time.perf_counter()
+            if self._skip(index, offset):
+                continue
+            started_at = time.perf_counter()
+            results = self.live.process_in_session(self.session, data, received_at)
+            self._record(index, offset, received_at, started_at, 0, results)
+
+    async def run_paced(self, speed: float, rate_limiter=None):
+        """Recorded arrival times scaled by ``speed``, through rate limiter and latest-frame slot"""
+        from utils.frame_buffer import LatestFrameSlot
+
+        loop = asyncio.get_running_loop()
+        slot = LatestFrameSlot()
+        pending_frames: Dict[float, tuple] = {}
+
+        async def feed():
+            start = time.perf_counter()
+            try:
+                for index, offset, data in self._frames():
+                    delay = start + offset / speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    received_at = time.perf_counter()
+                    if rate_limiter is not None and not rate_limiter.try_acquire("replay"):
+                        self.trace.append({"frame": index, "offset_s": round(offset, 4), "status": "rate_limited"})
+                        continue
+                    pending_frames[received_at] = (index, offset)
+                    slot.put(data, received_at)
+            finally:
+                slot.close()
+
+        feeder = asyncio.create_task(feed())
+        while True:
+            pending = await slot.get()
+            if pending is None:
+                break
+            frame_data, received_at, dropped = pending
+            index, offset = pending_frames.pop(received_at)
+            # Slot'ta yerine yenisi konan frame'ler işlenmeden düşer
+            for stale in [t for t in pending_frames if t < received_at]:
+                stale_index, stale_offset = pending_frames.pop(stale)
+                self.trace.append({"frame": stale_index, "offset_s": round(stale_offset, 4), "status": "dropped"})
+            if self._skip(index, offset):
+                continue
+            started_at = time.perf_counter()
+            results = await loop.run_in_executor(
+                self.live.inference_executor, self.live.process_in_session, self.session, frame_data, received_at
+            )
+            self._record(index, offset, received_at, started_at, dropped, results)
+        await feeder
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        processed = [t for t in self.trace if t["status"] == "processed"]
+        statuses: Dict[str, int] = {}
+        levels: Dict[str, int] = {}
+        for entry in self.trace:
+            statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+        for entry in processed:
+            levels[entry["degradation_level"]] = levels.get(entry["degradation_level"], 0) + 1
+        return {
+            "recording": self.recording.path,
+            "meta": self.recording.meta,
+            "frames": len(self.trace),
+            "statuses": statuses,
+            "elapsed_s": round(elapsed, 3),
+            "processed_fps": round(len(processed) / elapsed, 2) if elapsed else 0.0,
+            "queue_ms": percentiles([t["queue_ms"] for t in processed]),
+            "inference_ms": percentiles([t["inference_ms"] for t in processed]),
+            "latency_ms": percentiles([t["latency_ms"] for t in processed]),
+            "degradation_levels": levels
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help=".vsrec file written by the live websocket endpoint")
+    parser.add_argument("--speed", default="1", help="Playback speed factor, or 'max' for no pacing")
+    parser.add_argument("--limit", type=int, help="Replay only the first N recorded frames")
+    parser.add_argument("--no-rate-limit", action="store_true", help="Skip the per-client rate limiter")
+    parser.add_argument("--stub-latency-ms", type=float, default=None,
+                        help="Use StubYOLO with this latency instead of the real model")
+    parser.add_argument("--trace", help="Write per-frame traces as JSON lines to this file")
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+    if speed < 0:
+        parser.error("--speed must be positive or 'max'")
+    recording = SessionRecording(args.recording)
+    # Replay hiçbir şey yüklemez; uygulama import'u bulut ayarı istemesin
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+
+    if args.stub_latency_ms is not None:
+        from benchmarks.synthetic import StubYOLO
+        from models import detector
+        detector._shared_models[detector.DEFAULT_MODEL_PATH] = (StubYOLO(latency_ms=args.stub_latency_ms), threading.Lock())
+
+    from routes import live_analysis
+    from utils.admission import ClientRateLimiter
+
+    replay = Replay(live_analysis, recording, args.limit)
+    started = time.perf_counter()
+    try:
+        if speed == 0:
+            replay.run_unpaced()
+        else:
+            # Kayıttaki istemci limitleri kullanılır; sunucu ayarı sonradan değişmiş olabilir
+            rate_limiter = None if args.no_rate_limit else ClientRateLimiter(
+                rate=recording.meta.get("client_fps", live_analysis.LIVE_CLIENT_FPS),
+                burst=recording.meta.get("client_burst", live_analysis.LIVE_CLIENT_BURST)
+            )
+            asyncio.run(replay.run_paced(speed, rate_limiter))
+    finally:
+        live_analysis.sessions.close(replay.session)
+    summary = replay.summary(time.perf_counter() - started)
+    summary["speed"] = args.speed
+
+    if args.trace:
+        with open(args.trace, "w") as f:
+            for entry in sorted(replay.trace, key=lambda t: t["frame"]):
+                f.write(json.dumps(entry) + "\n")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare the old and new serialization paths for large analysis results.
+
+Old path: results list kept in memory, NumPy values converted by hand,
+``json.dumps`` in ``save_results``, ``json.loads`` in ``get_results`` and a
+second ``json.dumps`` in ``JSONResponse``.
+
+New path: frames spooled to NDJSON as they are produced, the analysis
+document streamed to disk, and the stored bytes served as-is.
+
+    python benchmarks/serialization_bench.py --minutes 60 --fps 30
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.serialization import dumps, iter_json_document, orjson
+
+
+def make_frame(index: int, rng: np.random.Generator, detections_per_frame: int) -> dict:
+    detections = []
+    for track_id in range(detections_per_frame):
+        x1, y1 = rng.uniform(0, 1200, 2).astype(np.float32)
+        detections.append({
+            "bbox": [np.float32(x1), np.float32(y1), np.float32(x1 + 80), np.float32(y1 + 160)],
+            "class_name": "person",
+            "confidence": np.float32(rng.uniform(0.45, 0.99)),
+            "track_id": np.int64(track_id),
+            "anomaly_score": np.float64(rng.uniform(0, 1))
+        })
+    return {
+        "frame_number": index,
+        "detections": detections,
+        "suspicious_interactions": [],
+        "confidence": np.float64(rng.uniform(0.45, 0.99))
+    }
+
+
+def to_native(value):
+    # Eski yolda NumPy değerleri elle dönüştürülüyordu
+    if isinstance(value, dict):
+        return {k: to_native(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_native(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def old_path(frame_count: int, detections_per_frame: int) -> int:
+    rng = np.random.default_rng(0)
+    results = [make_frame(i, rng, detections_per_frame) for i in range(frame_count)]
+    analysis_data = {"summary": {"processedFrames": frame_count}, "frames": to_native(results)}
+    stored = json.dumps(analysis_data).encode()          # save_results
+    loaded = json.loads(stored)                          # get_results
+    response_body = json.dumps(loaded).encode()          # JSONResponse
+    return len(response_body)
+
+
+def new_path(frame_count: int, detections_per_frame: int, workdir: str) -> int:
+    rng = np.random.default_rng(0)
+    spool_path = os.path.join(workdir, "frames.ndjson")
+    document_path = os.path.join(workdir, "analysis.json")
+    with open(spool_path, "wb") as spool:
+        for i in range(frame_count):
+            spool.write(dumps(make_frame(i, rng, detections_per_frame)) + b"\n")
+
+    def spooled():
+        with open(spool_path, "rb") as spool:
+            for line in spool:
+                yield line.rstrip(b"\n")
+
+    with open(document_path, "wb") as document:
+        for chunk in iter_json_document({"summary": {"processedFrames": frame_count}}, "frames", spooled(), raw=True):
+            document.write(chunk)
+    # Route, cache'deki byte'ları yeniden serialize etmeden döner
+    return os.path.getsize(document_path)
+
+
+def measure(func, *args) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(elapsed, 3), "peak_mb": round(peak / 1e6, 3), "output_mb": round(size / 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--detections", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    frame_count = int(args.minutes * 60 * args.fps)
+    with tempfile.TemporaryDirectory() as workdir:
+        report = {
+            "frames": frame_count,
+            "encoder": "orjson" if orjson is not None else "json",
+            "old": measure(old_path, frame_count, args.detections),
+            "new": measure(new_path, frame_count, args.detections, workdir)
+        }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Run the API with ``StubYOLO`` in place of the model and local storage.
+
+Used as the target for ``load_generator.py``: the whole request path runs
+for real except inference, whose cost is set with ``--latency-ms``.
+
+    python benchmarks/stub_server.py --port 8000 --latency-ms 25
+"""
+import os
+import sys
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated inference time per frame")
+    parser.add_argument("--detections", type=int, default=6, help="Boxes returned per frame")
+    parser.add_argument("--workdir", default=None, help="Directory for uploads and local storage")
+    args = parser.parse_args()
+
+    # Model ve ayarlar uygulama import edilmeden önce sabitlenmeli
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+    # Process modundaki worker'lar stub'ı görmez; analizler thread'lerde çalışır
+    os.environ.setdefault("ANALYSIS_WORKER_MODE", "thread")
+    os.environ["RAW_DETECTION_CACHE"] = "false"
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        os.chdir(args.workdir)
+
+    import uvicorn
+    from benchmarks.synthetic import StubYOLO
+    from models import detector
+
+    stub = StubYOLO(latency_ms=args.latency_ms, detections=args.detections)
+    detector._shared_models[detector.DEFAULT_MODEL_PATH] = (stub, threading.Lock())
+
+    import main as app_module
+    uvicorn.run(app_module.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
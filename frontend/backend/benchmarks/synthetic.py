@@ -0,0 +1,139 @@
+"""Offline test inputs for the benchmarks: synthetic scenes and a stub YOLO model.
+
+``SyntheticScene`` renders objects moving across a textured background and
+keeps their ground-truth boxes per frame. ``StubYOLO`` stands in for the
+ultralytics model: it returns the scene's ground truth with jitter, plus
+low-confidence false positives, after a configurable latency. Neither
+needs network access or model weights.
+"""
+import time
+import threading
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import torch
+
+CLASS_NAMES = {0: "person", 1: "car", 2: "backpack"}
+
+
+class SyntheticScene:
+    """Objects moving with constant velocity, bouncing off the frame edges"""
+
+    def __init__(self, width: int = 640, height: int = 480, objects: int = 6, seed: int = 0):
+        self.width = width
+        self.height = height
+        rng = np.random.default_rng(seed)
+        sizes = rng.uniform([30, 60], [90, 160], (objects, 2))
+        self.sizes = sizes.astype(np.float32)
+        self.start = rng.uniform([0, 0], [width - sizes[:, 0].max(), height - sizes[:, 1].max()], (objects, 2))
+        self.velocity = rng.uniform(-6, 6, (objects, 2))
+        self.classes = rng.integers(0, len(CLASS_NAMES), objects)
+        self.colors = [tuple(int(c) for c in rng.integers(40, 255, 3)) for _ in range(objects)]
+        self.background = cv2.add(
+            np.full((height, width, 3), 90, np.uint8),
+            rng.integers(0, 40, (height, width, 3), dtype=np.uint8)
+        )
+
+    def ground_truth(self, index: int) -> np.ndarray:
+        """``(objects, 5)`` array of x1, y1, x2, y2, class for frame ``index``"""
+        span = np.array([self.width, self.height]) - self.sizes
+        position = self.start + self.velocity * index
+        # Kenarlardan sekme: 0..span aralığında üçgen dalga
+        position = np.abs((position + span) % (2 * span) - span)
+        boxes = np.concatenate([position, position + self.sizes], axis=1)
+        return np.concatenate([boxes, self.classes[:, None]], axis=1).astype(np.float32)
+
+    def frame(self, index: int) -> np.ndarray:
+        frame = self.background.copy()
+        for (x1, y1, x2, y2, _), color in zip(self.ground_truth(index), self.colors):
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, -1)
+        return frame
+
+    def write_video(self, path: str, frames: int, fps: float = 30.0) -> str:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (self.width, self.height))
+        for index in range(frames):
+            writer.write(self.frame(index))
+        writer.release()
+        return path
+
+
+class _StubBoxes:
+    def __init__(self, data: torch.Tensor):
+        self.data = data
+
+
+class _StubResult:
+    def __init__(self, data: torch.Tensor, names: Dict[int, str]):
+        self.boxes = _StubBoxes(data)
+        self.names = names
+
+
+class StubYOLO:
+    """Drop-in for the ultralytics model call used by ``ObjectDetector``.
+
+    Each call returns detections for the next frame of ``scene`` (calls are
+    assumed to follow frame order; use ``reset`` between runs). Without a
+    scene it returns ``detections`` random boxes per call.
+    """
+
+    device = "cpu"
+
+    def __init__(self, scene: Optional[SyntheticScene] = None, latency_ms: float = 0.0,
+                 detections: int = 6, false_positives: int = 4, jitter: float = 2.0, seed: int = 0):
+        self.scene = scene
+        self.latency_ms = latency_ms
+        self.detections = detections
+        self.false_positives = false_positives
+        self.jitter = jitter
+        self.seed = seed
+        self.names = CLASS_NAMES
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        self.calls = 0
+
+    def _boxes(self, index: int) -> np.ndarray:
+        rng = np.random.default_rng(self.seed + index)
+        if self.scene is not None:
+            truth = self.scene.ground_truth(index)
+            width, height = self.scene.width, self.scene.height
+        else:
+            width, height = 640, 480
+            corner = rng.uniform([0, 0], [width - 100, height - 100], (self.detections, 2))
+            truth = np.concatenate([corner, corner + rng.uniform(30, 100, (self.detections, 2)),
+                                    rng.integers(0, len(CLASS_NAMES), (self.detections, 1))], axis=1)
+        boxes = truth[:, :4] + rng.normal(0, self.jitter, (len(truth), 4))
+        confidence = rng.uniform(0.5, 0.95, len(truth))
+        corner = rng.uniform([0, 0], [width - 60, height - 60], (self.false_positives, 2))
+        noise = np.concatenate([corner, corner + 40], axis=1)
+        rows = np.concatenate([
+            np.concatenate([boxes, confidence[:, None], truth[:, 4:5]], axis=1),
+            np.concatenate([noise, rng.uniform(0.05, 0.4, (self.false_positives, 1)),
+                            rng.integers(0, len(CLASS_NAMES), (self.false_positives, 1))], axis=1)
+        ]).astype(np.float32)
+        return rows[np.argsort(-rows[:, 4], kind="stable")]
+
+    def __call__(self, frame, conf: float = 0.25, iou: float = 0.7, imgsz: int = 640,
+                 device: str = "cpu", verbose: bool = False) -> List[_StubResult]:
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        rows = self._boxes(index)
+        rows = rows[rows[:, 4] > np.float32(conf)]
+        return [_StubResult(torch.from_numpy(rows), self.names)]
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of ``(N, 4)`` and ``(M, 4)`` xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection)
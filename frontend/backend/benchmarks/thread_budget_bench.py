@@ -0,0 +1,160 @@
+"""Aggregate throughput with library-default thread pools against the thread budget.
+
+Spawns ``--workers`` API-role processes running live-style inference in a
+loop and ``--analysis-per-worker`` niced analysis processes per worker,
+like an API deployment whose analysis pools are busy. Every process
+loads the model, warms up, then all run frames for ``--seconds`` at the
+same time. Each configuration runs in fresh interpreters: ``default``
+(``THREAD_BUDGET=off``, every pool sized to the core count) and
+``budget`` (``utils/thread_budget.py``). ``--default-threads N`` sets the
+default configuration's pools to N threads, which reproduces the
+defaults of an N-core host on a smaller machine. ``--plan`` only prints
+the budget's plan for the given host sizes, which needs no cores.
+
+    python benchmarks/thread_budget_bench.py --workers 4 --analysis-per-worker 1
+    python benchmarks/thread_budget_bench.py --configs budget --seconds 30 --output budget.json
+    python benchmarks/thread_budget_bench.py --workers 2 --default-threads 8
+    python benchmarks/thread_budget_bench.py --plan 4,8,16,32 --workers 4 --analysis-per-worker 2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def native_threads() -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("Threads:"))
+
+
+def run_process(role: str, seconds: float, input_size: int, default_threads: int, barrier, results):
+    sys.path.insert(0, BACKEND_DIR)
+    from benchmarks.synthetic import SyntheticScene
+    from models.detector import ObjectDetector
+    from utils.job_scheduler import ANALYSIS_WORKER_NICE, _worker_init
+    from utils.metrics import StageRecorder
+    from utils.thread_budget import apply_role
+
+    if role == "analysis":
+        # Analiz havuzunun süreç başlangıcı: nice + bütçe
+        _worker_init(ANALYSIS_WORKER_NICE)
+    else:
+        apply_role(role)
+    if default_threads:
+        import cv2
+        import torch
+        torch.set_num_threads(default_threads)
+        cv2.setNumThreads(default_threads)
+    detector = ObjectDetector()
+    detector.set_model_profile(input_size)
+    detector.stages = StageRecorder("bench", "bench")
+    scene = SyntheticScene(640, 480)
+    frames = [scene.frame(index) for index in range(30)]
+    detector.process_video_frame(frames[0])
+    barrier.wait()
+    latencies: List[float] = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        detector.process_video_frame(frames[len(latencies) % len(frames)])
+        latencies.append(time.perf_counter() - started)
+    results.put({"role": role, "frames": len(latencies), "threads": native_threads(),
+                 "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+                 "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1)})
+
+
+def measure(config: str, workers: int, analysis_per_worker: int, seconds: float, input_size: int,
+            default_threads: int = 0) -> Dict[str, Any]:
+    # Spawn edilen süreçler bütçeyi ortamdan hesaplar; serve.py'nin verdiği değişkenler
+    os.environ["THREAD_BUDGET"] = "off" if config == "default" else "auto"
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    os.environ["ANALYSIS_WORKERS"] = str(analysis_per_worker)
+    os.environ["ANALYSIS_WORKER_MODE"] = "process"
+    context = multiprocessing.get_context("spawn")
+    roles = ["api"] * workers + ["analysis"] * (workers * analysis_per_worker)
+    barrier = context.Barrier(len(roles))
+    results = context.Queue()
+    threads = default_threads if config == "default" else 0
+    processes = [context.Process(target=run_process, args=(role, seconds, input_size, threads, barrier, results))
+                 for role in roles]
+    for process in processes:
+        process.start()
+    per_process = [results.get(timeout=600) for _ in processes]
+    for process in processes:
+        process.join()
+    summary: Dict[str, Any] = {"config": config, "processes": per_process,
+                               "threads_total": sum(p["threads"] for p in per_process)}
+    for role in ("api", "analysis"):
+        rows = [p for p in per_process if p["role"] == role]
+        if rows:
+            summary[f"{role}_fps"] = round(sum(p["frames"] for p in rows) / seconds, 2)
+            summary[f"{role}_p95_ms"] = max(p["p95_ms"] for p in rows)
+    summary["total_fps"] = round(sum(p["frames"] for p in per_process) / seconds, 2)
+    return summary
+
+
+def plan(cpu_counts: List[int], workers: int, analysis_per_worker: int, inference_workers: int) -> List[Dict[str, Any]]:
+    """Threads the budget plans per role for each host size, against library defaults (core count per process)"""
+    from utils.thread_budget import ThreadBudget
+
+    os.environ["ANALYSIS_WORKER_MODE"] = "process"
+    rows = []
+    for cpus in cpu_counts:
+        budget = ThreadBudget(cpus=list(range(cpus)), api_workers=workers, analysis_workers=analysis_per_worker,
+                              inference_workers=inference_workers, enabled=True)
+        processes = workers * (1 + analysis_per_worker) + inference_workers
+        rows.append({
+            "cpus": cpus, "processes": processes, "shares": budget.shares,
+            "threads": {role: budget.role(role).threads for role in budget.shares},
+            "planned_threads": budget.planned_threads(), "default_threads": processes * cpus
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(2, (os.cpu_count() or 1) // 4))
+    parser.add_argument("--analysis-per-worker", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--input-size", type=int, default=640)
+    parser.add_argument("--default-threads", type=int, default=0,
+                        help="Threads per pool in the default configuration (default: the library's, i.e. core count)")
+    parser.add_argument("--configs", default="default,budget", help="Comma-separated: default, budget")
+    parser.add_argument("--plan", help="Comma-separated CPU counts: print the plan for each instead of measuring")
+    parser.add_argument("--inference-workers", type=int, default=0, help="Inference processes (--plan only)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.plan:
+        rows = plan([int(c) for c in args.plan.split(",")], args.workers, args.analysis_per_worker, args.inference_workers)
+        for row in rows:
+            print(f"{row['cpus']} CPUs, {row['processes']} processes: {row['planned_threads']} threads planned "
+                  f"({row['threads']}), {row['default_threads']} with library defaults", file=sys.stderr)
+        print(json.dumps(rows, indent=2))
+        return
+
+    results = []
+    for config in args.configs.split(","):
+        result = measure(config.strip(), args.workers, args.analysis_per_worker, args.seconds, args.input_size,
+                         args.default_threads)
+        results.append(result)
+        print(f"{result['config']}: {result['total_fps']} frames/s total (api {result.get('api_fps')}, "
+              f"analysis {result.get('analysis_fps')}), api p95 {result.get('api_p95_ms')} ms, "
+              f"{result['threads_total']} threads", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
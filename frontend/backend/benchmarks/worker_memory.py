@@ -0,0 +1,150 @@
+"""Memory per API worker: ``uvicorn --workers N`` against the preload-fork ``serve.py``.
+
+Starts each server with local storage, waits for readiness, sends a few
+frames so the workers have run inference, waits for memory to settle and
+reads ``/proc/<pid>/smaps_rollup`` of the supervisor and every worker.
+RSS counts shared pages in every process that maps them; PSS splits them
+between the sharers, so the PSS sum is the real footprint of the server.
+Linux only.
+
+    python benchmarks/worker_memory.py --workers 4
+    python benchmarks/worker_memory.py --workers 2 --modes preload --output mem.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import tempfile
+from typing import Any, Dict, List
+
+import cv2
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import SyntheticScene
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    fields: Dict[str, float] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1)
+    }
+
+
+def worker_pids(parent: int) -> List[int]:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        # multiprocessing'in resource tracker'ı worker değildir
+        if ppid == parent and b"resource_tracker" not in cmdline:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def command(mode: str, port: int, workers: int) -> List[str]:
+    if mode == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR, "--port", str(port),
+                "--workers", str(workers), "--log-level", "warning"]
+    return [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning"]
+
+
+def measure(mode: str, workers: int, frame: bytes, frames: int, timeout: float) -> Dict[str, Any]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, STORAGE_BACKEND="local")
+    server = subprocess.Popen(command(mode, port, workers), cwd=tempfile.mkdtemp(prefix="vs-mem-"), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.perf_counter() + timeout
+        with httpx.Client() as client:
+            while True:
+                try:
+                    if client.get(f"{url}/health/ready", timeout=1).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"{mode} server did not become ready")
+                time.sleep(0.2)
+        # Her frame yeni bağlantıyla gider; kernel bağlantıları worker'lara dağıtır
+        for _ in range(frames):
+            httpx.post(f"{url}/api/frame", content=frame, headers={"content-type": "image/jpeg"}, timeout=60)
+        # Geç açılan worker'lar da yüklensin diye toplam RSS durulana kadar beklenir
+        previous, stable = 0.0, 0
+        while stable < 3 and time.perf_counter() < deadline:
+            time.sleep(1.0)
+            pids = worker_pids(server.pid)
+            total = sum(memory_mb(pid)["rss_mb"] for pid in pids)
+            stable = stable + 1 if len(pids) == workers and abs(total - previous) < 0.01 * total else 0
+            previous = total
+        supervisor = memory_mb(server.pid)
+        per_worker = [{"pid": pid, **memory_mb(pid)} for pid in worker_pids(server.pid)]
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return {
+        "mode": mode,
+        "workers": len(per_worker),
+        "supervisor": supervisor,
+        "per_worker": per_worker,
+        "worker_mean": {key: round(sum(w[key] for w in per_worker) / len(per_worker), 1)
+                        for key in ("rss_mb", "pss_mb", "shared_mb", "private_mb")},
+        "total_pss_mb": round(supervisor["pss_mb"] + sum(w["pss_mb"] for w in per_worker), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default="uvicorn,preload", help="Comma-separated: uvicorn, preload")
+    parser.add_argument("--frames", type=int, default=None, help="Frames sent before measuring (default 3 per worker)")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    frame = cv2.imencode(".jpg", SyntheticScene(640, 480).frame(0))[1].tobytes()
+    frames = args.frames if args.frames is not None else 3 * args.workers
+    results = []
+    for mode in args.modes.split(","):
+        result = measure(mode.strip(), args.workers, frame, frames, args.timeout)
+        results.append(result)
+        mean = result["worker_mean"]
+        print(f"{result['mode']}: {result['workers']} workers, per worker RSS {mean['rss_mb']} MB, "
+              f"PSS {mean['pss_mb']} MB, private {mean['private_mb']} MB; supervisor PSS "
+              f"{result['supervisor']['pss_mb']} MB; total PSS {result['total_pss_mb']} MB", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
 import os, base64
 import logging
 import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+
+IMPORT_STARTED = time.perf_counter()
 
 key_b64 = os.getenv("GCP_SERVICE_ACCOUNT_KEY")
 if key_b64:
@@ -10,13 +16,54 @@ if key_b64:
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from routes import video_analysis, live_analysis
+from fastapi.responses import JSONResponse, Response
+from routes import video_analysis, live_analysis, local_storage, admin
+from utils.serialization import FastJSONResponse
+from utils.readiness import MODEL_WARMUP, MODEL_WARMUP_RUNS, startup
+from utils.admission import LIVE_LIGHT_MODEL_PATH
+from utils.frame_ingest import MODEL_INPUT_SIZE
+from utils import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+def _warm_up_step(model_path: str, input_size: int):
+    async def step():
+        # Ağır import ve ilk inference event loop dışında; liveness bu sırada cevap verir
+        from models.detector import warm_up
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, warm_up, model_path, input_size, MODEL_WARMUP_RUNS)
+    return step
+
+
+async def _connect_storage():
+    await video_analysis.storage.connect()
+    return {"bucket": video_analysis.storage.bucket_name}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect storage and load/warm the models in the background; /health/ready turns 200 when done"""
+    from models.detector import DEFAULT_MODEL_PATH
+    from utils.inference_server import close_client
+    from utils.thread_budget import applied_role, apply_role, get_budget
+    # serve.py worker'ları rolünü fork sonrası uygular; doğrudan uvicorn ile başlatılınca burada
+    budget = apply_role("api") if applied_role() is None else get_budget().role("api")
+    to_thread.current_default_thread_limiter().total_tokens = budget.executors["sync_handlers"]
+    steps = [("storage", _connect_storage)]
+    if MODEL_WARMUP:
+        steps.append(("model", _warm_up_step(DEFAULT_MODEL_PATH, MODEL_INPUT_SIZE)))
+        if LIVE_LIGHT_MODEL_PATH:
+            # Hafif model ilk aşırı yükte değil, açılışta yüklenir
+            steps.append(("light_model", _warm_up_step(LIVE_LIGHT_MODEL_PATH, 320)))
+    task = asyncio.create_task(startup.run(steps))
+    yield
+    task.cancel()
+    close_client()
+
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # CORS ayarlarını güncelle
 origins = [
@@ -48,13 +95,18 @@ async def check_file_size(request: Request, call_next):
                 )
     return await call_next(request)
 
-# Rate limiting için basit bir middleware
+# İstek süresi route şablonu başına histograma yazılır; istemci için Server-Timing header'ı eklenir
 @app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
+async def record_request_metrics(request: Request, call_next):
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
+    process_time = time.perf_counter() - start_time
+    # Eşleşmeyen yollar tek etikette toplanır, rastgele URL'ler seri üretmez
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.labels(
+        request.method, route.path if route is not None else "unmatched", str(response.status_code)
+    ).observe(process_time)
+    response.headers["Server-Timing"] = f"app;dur={process_time * 1000:.1f}"
     return response
 
 # Error handling middleware
@@ -71,6 +123,8 @@ async def catch_exceptions_middleware(request: Request, call_next):
 
 app.include_router(video_analysis.router, prefix="/api")
 app.include_router(live_analysis.router, prefix="/api")
+app.include_router(local_storage.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -78,4 +132,23 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """Liveness (kept for existing checks); ``ready`` tells whether models are warm"""
+    return {"status": "healthy", "ready": startup.ready}
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and its event loop answers; says nothing about the models"""
+    return {"status": "alive", "uptime_seconds": startup.elapsed()}
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once storage is connected and the models are loaded and warmed up, 503 before or on failure"""
+    return FastJSONResponse(status_code=200 if startup.ready else 503, content=startup.snapshot())
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus exposition: stage latency histograms, frame/drop/cache counters and queue gauges"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+startup.imported(IMPORT_STARTED)
@@ -1,4 +1,11 @@
-from .crime_detection_model import CrimeDetectionModel
 from .video_processor import VideoProcessor
 
-__all__ = ["CrimeDetectionModel", "VideoProcessor"] 
\ No newline at end of file
+__all__ = ["CrimeDetectionModel", "VideoProcessor"]
+
+
+def __getattr__(name):
+    # CrimeDetectionModel torch/ultralytics ile GCS istemcisini çeker; paket import'unda yüklenmez
+    if name == "CrimeDetectionModel":
+        from .crime_detection_model import CrimeDetectionModel
+        return CrimeDetectionModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,15 +2,23 @@ import cv2
 import numpy as np
 from datetime import datetime, timedelta
 import hashlib
-import base64
 import os
 import random
 
 class CrimeVideoAnalyzer:
-    def __init__(self):
+    def __init__(self, evidence_store=None):
         self.temporal_model = None  # load_model('temporal_cnn.h5')
         self.object_detector = None  # load_model('yolov7_crime.h5')
         self.context_analyzer = self._init_context_analyzer()
+        self.evidence_store = evidence_store
+
+    def _get_evidence_store(self):
+        # Kanıt karelerini rapora gömmek yerine bucket'a ayrı blob olarak yaz
+        if self.evidence_store is None:
+            from utils.evidence_store import EvidenceStore
+            from utils.storage import get_storage_connector
+            self.evidence_store = EvidenceStore(get_storage_connector())
+        return self.evidence_store
 
     def _init_context_analyzer(self):
         class DummyContext:
@@ -102,7 +110,8 @@ class CrimeVideoAnalyzer:
                 "intensity": obj["confidence"],
                 "crimeType": obj["type"]
             }
-            for obj in result["dangerous_objects"]
+            # Renk tabanlı tespitlerin bbox'ı yok, haritada gösterilmez
+            for obj in result["dangerous_objects"] if "bbox" in obj
         ]
 
         return {
@@ -127,9 +136,10 @@ class CrimeVideoAnalyzer:
         # Mock: key frame extraction
         cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
         ret, first_frame = cap.read()
-        _, buf = cv2.imencode('.jpg', first_frame) if ret else (None, None)
-        first_frame_b64 = base64.b64encode(buf).decode() if buf is not None else ''
         cap.release()
+        # Key frame rapora base64 olarak değil, içerik hash'i ile referans olarak eklenir
+        first_frame_ref = self._get_evidence_store().save_frame(first_frame) if ret else None
+        first_frame_id = first_frame_ref["frameId"] if first_frame_ref else None
         now = datetime.utcnow()
         # --- Deterministik random için video hash'i seed olarak kullan ---
         video_hash = self._sha256_hash(video_path)
@@ -183,9 +193,10 @@ class CrimeVideoAnalyzer:
                     "enhancedFrames": [{
                         "timestamp": "00:00:00",
                         "enhancementType": "contrast",
-                        "originalFrame": first_frame_b64,
-                        "enhancedFrame": first_frame_b64
-                    }]
+                        "originalFrameId": first_frame_id,
+                        "enhancedFrameId": first_frame_id
+                    }],
+                    "keyframes": [first_frame_ref] if first_frame_ref else []
                 }
             },
             "crimeAnalysis": {
@@ -4,32 +4,23 @@ import logging
 from typing import Dict, Any, Tuple, List
 import numpy as np
 from ultralytics import YOLO
-from utils.gcp_connector import GCPConnector
+from utils.model_store import get_model_store
+
+logger = logging.getLogger(__name__)
+
+CRIME_MODEL_NAME = os.getenv("CRIME_MODEL_NAME", "yolov8x")
 
 class CrimeDetectionModel:
     def __init__(self):
         self.model = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.confidence_threshold = float(os.getenv("MODEL_CONFIDENCE_THRESHOLD", "0.75"))
-        self.gcp = GCPConnector()
 
     def load_model(self) -> Dict[str, Any]:
-        """Load the YOLOv8 model from local path or GCP"""
+        """Load the YOLOv8x weights from the host's model cache, fetching them once per host if missing"""
         try:
-            # First try to load from local path
-            model_path = "yolov8x.pt"  # Using the larger model for better accuracy
-            if not os.path.exists(model_path):
-                # If not found locally, try to download from GCP
-                gcp_status = self.gcp.connect()
-                if gcp_status["status"] == "connected":
-                    download_status = self.gcp.download_file(
-                        "models/yolov8x.pt",
-                        model_path
-                    )
-                    if download_status["status"] != "success":
-                        raise ValueError(f"Failed to download model: {download_status['message']}")
-                else:
-                    raise ValueError(f"GCP connection failed: {gcp_status['message']}")
+            # Using the larger model for better accuracy
+            model_path = get_model_store().fetch(CRIME_MODEL_NAME)
 
             # Load the model
             self.model = YOLO(model_path)
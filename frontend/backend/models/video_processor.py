@@ -1,6 +1,48 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+
 class VideoProcessor:
-    def __init__(self):
-        pass
+    """Runs a detector on consecutive frames of one stream and shapes the results"""
+
+    def __init__(self, model=None):
+        self.model = model
+        self.frame_count = 0
+
+    def process_frame(self, frame: np.ndarray) -> Dict[str, Any]:
+        """Process one frame and return JSON-ready detections"""
+        detections, _ = self.model.process_video_frame(frame)
+        return self._frame_result(detections)
+
+    def process_raw(self, raw: np.ndarray, names: Dict[int, str], raw_iou: Optional[float] = None) -> Dict[str, Any]:
+        """Same as ``process_frame`` but from cached raw model output, without inference"""
+        detections, _ = self.model.process_raw(raw, names, raw_iou=raw_iou)
+        return self._frame_result(detections)
+
+    def _frame_result(self, detections: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.frame_count += 1
+        return {
+            "frame_number": self.frame_count,
+            "detections": detections,
+            "suspicious_interactions": self._find_suspicious_interactions(detections),
+            "confidence": float(np.mean([d["confidence"] for d in detections])) if detections else 0.0
+        }
+
+    def _find_suspicious_interactions(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Tracks that are interacting, erratic or above the anomaly threshold"""
+        threshold = getattr(self.model, "anomaly_threshold", 0.8)
+        suspicious = []
+        for detection in detections:
+            behavior = detection.get("behavior")
+            anomaly_score = detection.get("anomaly_score", 0.0)
+            if behavior in ("interacting", "erratic") or anomaly_score > threshold:
+                suspicious.append({
+                    "track_id": detection["track_id"],
+                    "class_name": detection["class_name"],
+                    "behavior": behavior,
+                    "anomaly_score": float(anomaly_score)
+                })
+        return suspicious
 
     def process(self, video_path: str):
         # Burada video işleme kodunu yazabilirsiniz
@@ -8,4 +50,4 @@ class VideoProcessor:
         return {
             "status": "success",
             "message": f"Video {video_path} processed."
-        } 
\ No newline at end of file
+        }
@@ -1,4 +1,5 @@
 from . import video_analysis
 from . import live_analysis
+from . import local_storage
 
-__all__ = ["video_analysis", "live_analysis"] 
\ No newline at end of file
+__all__ = ["video_analysis", "live_analysis", "local_storage"] 
\ No newline at end of file
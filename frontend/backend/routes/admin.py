@@ -0,0 +1,189 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+import secrets
+import threading
+from routes import live_analysis, video_analysis
+from utils.profiling import PROFILE_POLL_SECONDS, PROFILE_SAMPLE_INTERVAL_MS, ProfileRun, profile_request_path
+from utils.serialization import dumps
+from utils.model_store import get_model_store
+from utils.thread_budget import get_budget
+
+logger = logging.getLogger(__name__)
+
+# Boşsa admin endpoint'leri kapalıdır
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+LIVE_PROFILE_DEFAULT_SECONDS = float(os.getenv("LIVE_PROFILE_DEFAULT_SECONDS", "30"))
+
+PROFILE_FILES = ("profile.json", "profile.folded", "tracemalloc.txt")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+storage = video_analysis.storage
+
+# Canlı oturum profilleri bu süreçte çalışır; son sonuçlar oturum başına tutulur
+live_profiles: Dict[str, List[Dict]] = {}
+
+
+class ProfileRequest(BaseModel):
+    sampling: bool = True
+    tracemalloc: bool = False
+    interval_ms: float = Field(PROFILE_SAMPLE_INTERVAL_MS, ge=1, le=1000)
+    duration_seconds: Optional[float] = Field(None, gt=0)
+
+
+@router.post("/profile/jobs/{video_id}")
+async def profile_job(video_id: str, request: Optional[ProfileRequest] = None):
+    """Ask a queued or running analysis to profile itself.
+
+    The job picks the request up within ``PROFILE_POLL_SECONDS`` wherever
+    it runs and stores the output under ``results/{video_id}/profile/``
+    when it ends (or after ``duration_seconds``).
+    """
+    job = await storage.run(video_analysis.get_job_view, video_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] not in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}; only queued or running jobs can be profiled")
+    request = request or ProfileRequest()
+    await storage.upload_bytes(dumps(request.model_dump()), profile_request_path(video_id), "application/json")
+    return {
+        "status": "requested",
+        "video_id": video_id,
+        "output_prefix": f"results/{video_id}/profile/",
+        "poll_seconds": PROFILE_POLL_SECONDS
+    }
+
+
+@router.get("/profile/jobs/{video_id}")
+async def get_job_profile(video_id: str):
+    """Whether a profiling request is still pending and which outputs exist"""
+    pending = await storage.exists(profile_request_path(video_id))
+    candidates = [f"results/{video_id}/profile/{name}" for name in PROFILE_FILES]
+    candidates.append(f"results/{video_id}/resources.json")
+    found = await asyncio.gather(*(storage.exists(path) for path in candidates))
+    return {
+        "video_id": video_id,
+        "pending": pending,
+        "outputs": [path for path, exists in zip(candidates, found) if exists]
+    }
+
+
+@router.get("/profile/jobs/{video_id}/{name}")
+async def download_job_profile(video_id: str, name: str):
+    """Download one profile output (``resources.json`` or one of the profile files)"""
+    if name == "resources.json":
+        path = f"results/{video_id}/resources.json"
+    elif name in PROFILE_FILES:
+        path = f"results/{video_id}/profile/{name}"
+    else:
+        raise HTTPException(status_code=404, detail="Unknown profile output")
+    if not await storage.exists(path):
+        raise HTTPException(status_code=404, detail="Profile output not found")
+    media_type = "application/json" if name.endswith(".json") else "text/plain"
+    return Response(content=await storage.download_bytes(path), media_type=media_type)
+
+
+def _find_session(session_id: str):
+    session = next((s for s in live_analysis.sessions.sessions() if s.session_id == session_id), None)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Live session not found")
+    return session
+
+
+def _finish_live_profile(session, run: ProfileRun, entry: Dict, stages_before: Dict, frames_before: int):
+    """Runs on a timer thread, so the upload never blocks the event loop"""
+    if session.profile_run is run:
+        session.profile_run = None
+    entry["outputs"] = run.finish({
+        "session_id": session.session_id,
+        "camera": session.name,
+        "frames": session.frames - frames_before,
+        "stage_seconds": session.stages.breakdown(since=stages_before)
+    })
+    entry["status"] = "finished"
+
+
+@router.post("/profile/sessions/{session_id}")
+async def profile_session(session_id: str, request: Optional[ProfileRequest] = None):
+    """Profile the frames of one live session for ``duration_seconds`` (default 30s)"""
+    request = request or ProfileRequest()
+    session = _find_session(session_id)
+    if session.profile_run is not None:
+        raise HTTPException(status_code=409, detail="Session is already being profiled")
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    run = ProfileRun(
+        storage, f"profiles/live/{session_id}/{stamp}",
+        sampling=request.sampling,
+        memory=request.tracemalloc,
+        interval_ms=request.interval_ms,
+        duration_seconds=request.duration_seconds or LIVE_PROFILE_DEFAULT_SECONDS
+    )
+    entry = {"status": "running", "output_prefix": f"{run.output_prefix}/", **run.options}
+    live_profiles.setdefault(session_id, []).append(entry)
+    del live_profiles[session_id][:-5]
+    stages_before, frames_before = session.stages.snapshot(), session.frames
+    session.profile_run = run.start()
+    timer = threading.Timer(
+        run.duration_seconds, _finish_live_profile, (session, run, entry, stages_before, frames_before)
+    )
+    timer.daemon = True
+    timer.start()
+    return {"session_id": session_id, "camera": session.name, **entry}
+
+
+@router.get("/profile/sessions/{session_id}")
+async def get_session_profiles(session_id: str):
+    """Recent profiling runs of a live session and their stored outputs"""
+    if session_id not in live_profiles:
+        _find_session(session_id)
+    return {"session_id": session_id, "profiles": live_profiles.get(session_id, [])}
+
+
+@router.get("/profile/sessions/{session_id}/{stamp}/{name}")
+async def download_session_profile(session_id: str, stamp: str, name: str):
+    """Download one output of a live session profiling run"""
+    if name not in PROFILE_FILES:
+        raise HTTPException(status_code=404, detail="Unknown profile output")
+    path = f"profiles/live/{session_id}/{stamp}/{name}"
+    if not await storage.exists(path):
+        raise HTTPException(status_code=404, detail="Profile output not found")
+    media_type = "application/json" if name.endswith(".json") else "text/plain"
+    return Response(content=await storage.download_bytes(path), media_type=media_type)
+
+@router.get("/threads")
+async def get_thread_budget():
+    """The host's thread budget and the threads this worker actually runs"""
+    native_threads = None
+    try:
+        with open("/proc/self/status") as f:
+            native_threads = next(int(line.split()[1]) for line in f if line.startswith("Threads:"))
+    except (OSError, StopIteration):
+        pass
+    return {
+        "pid": os.getpid(),
+        "python_threads": threading.active_count(),
+        "native_threads": native_threads,
+        "budget": get_budget().snapshot()
+    }
+
+@router.get("/models")
+async def get_model_cache():
+    """Model versions and exported formats in this host's model cache"""
+    model_store = get_model_store()
+    return {"root": model_store.root, "variants": await asyncio.to_thread(model_store.variants)}
@@ -1,17 +1,136 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
-from typing import Dict, List
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Dict, List, Optional
+import os
+import time
 import asyncio
+import logging
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from models.crime_detection_model import CrimeDetectionModel
+from models.detector import ObjectDetector
 from models.video_processor import VideoProcessor
+from utils.frame_buffer import LatestFrameSlot
+from utils.frame_ingest import (
+    FrameBufferPool, FrameValidationError, MODEL_INPUT_SIZE, decode_frame, reduction_factor, scale_detections,
+    validate_frame
+)
+from utils.live_protocol import DeltaEncoder, negotiate
+from utils.live_sessions import LiveSession, LiveSessionManager, SessionLimitError, UnknownSessionError
+from utils.live_broadcast import LiveBroadcaster, SubscriberLimitError
+from utils.admission import CapacityController, ClientRateLimiter, LIVE_CLIENT_FPS, LIVE_CLIENT_BURST
+from utils.session_recording import SessionRecorder, recording_requested
+from utils.metrics import register_gauge, shared_recorder
+from utils.readiness import startup
+from utils.serialization import dumps
+from utils.thread_budget import get_budget
 import base64
 from fastapi.middleware.cors import CORSMiddleware
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
-active_connections: Dict[str, WebSocket] = {}
-video_processors: Dict[str, VideoProcessor] = {}
+
+# Model paylaşımlı; her oturum yalnızca kendi tracker durumunu taşır
+sessions = LiveSessionManager(lambda: VideoProcessor(ObjectDetector()))
+
+SESSION_HEADER = "x-session-token"
+
+# Bir kameranın sonuçları, inference tekrarlanmadan tüm izleyicilere dağıtılır
+broadcaster = LiveBroadcaster()
+
+def publish_results(camera_id: str, frame_number: int, results: Dict, latency_ms: float,
+                    skipped_frames: int = 0, rate_limited_frames: int = 0):
+    """Fan a camera's result out to its viewers (no-op when nobody is watching)"""
+    if not broadcaster.has_subscribers(camera_id):
+        return
+    broadcaster.publish(camera_id, {
+        "camera_id": camera_id,
+        "frame_number": frame_number,
+        "timestamp": datetime.utcnow().isoformat(),
+        "detections": results["detections"],
+        "suspicious_interactions": results["suspicious_interactions"],
+        "latency_ms": latency_ms,
+        "degradation_level": capacity.profile["name"],
+        "degradation_level_index": capacity.level,
+        "skipped_frames": skipped_frames,
+        "rate_limited_frames": rate_limited_frames
+    })
+
+# Decode ve inference event loop dışında çalışır; boyutu thread bütçesinden gelir
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LIVE_INFERENCE_THREADS", "0")) or get_budget().role("api").executors["live_inference"],
+    thread_name_prefix="live-inference"
+)
+
+frame_buffers = FrameBufferPool()
+
+# Aşırı yükte önce kalite düşer, sonra yeni istemciler reddedilir
+capacity = CapacityController()
+rate_limiter = ClientRateLimiter()
+# HTTP 429'lar oturum açılmadan döner; kamera etiketi yerine "http" altında sayılır
+http_stages = shared_recorder("http")
+
+register_gauge("visionsleuth_live_sessions", "Open live sessions by transport", ["kind"], lambda: [
+    ((kind,), sum(1 for s in sessions.sessions() if s.kind == kind)) for kind in ("websocket", "http")
+])
+register_gauge("visionsleuth_live_inference_queue", "Frames waiting for a live inference thread", [], lambda: [
+    ((), inference_executor._work_queue.qsize())
+])
+register_gauge("visionsleuth_live_queue_delay_seconds", "Smoothed live queueing delay", [], lambda: [
+    ((), capacity.get_stats()["queue_delay_ms"] / 1000)
+])
+register_gauge("visionsleuth_live_degradation_level", "Live degradation level (0 = normal)", [], lambda: [
+    ((), capacity.get_stats()["level"])
+])
+register_gauge("visionsleuth_live_viewers", "Viewers subscribed per camera", ["camera"], lambda: [
+    ((camera,), stats["subscribers"]) for camera, stats in broadcaster.get_stats()["cameras"].items()
+])
+
+def decode_and_process(video_processor: VideoProcessor, frame_data, input_size: int = MODEL_INPUT_SIZE,
+                       factor: Optional[int] = None) -> Dict:
+    """Decode a JPEG/PNG frame and run the processor on it (runs on the executor)"""
+    # Model girişi izin veriyorsa JPEG azaltılmış çözünürlükte decode edilir
+    started = time.perf_counter()
+    frame, factor = decode_frame(frame_data, input_size, factor)
+    model = video_processor.model
+    model.stages.observe("decode", model.model_variant, time.perf_counter() - started)
+    results = video_processor.process_frame(frame)
+    results["detections"] = scale_detections(results["detections"], factor)
+    return results
+
+def process_in_session(session: LiveSession, frame_data, received_at: float = None, frame: np.ndarray = None) -> Dict:
+    """Run a frame through the session's tracker at the current degradation profile.
+
+    ``received_at`` feeds the queueing delay to the capacity controller;
+    ``frame`` skips decoding for callers that already hold a decoded image.
+    """
+    started_at = time.perf_counter()
+    if received_at is not None:
+        capacity.observe((started_at - received_at) * 1000)
+        session.stages.observe("queue", session.processor.model.model_variant, started_at - received_at)
+    profile = capacity.profile
+    profile_run = session.profile_run
+    with session.lock:
+        if profile_run is not None:
+            profile_run.enter()
+        try:
+            session.processor.model.set_model_profile(profile["input_size"], profile["model_path"])
+            if frame is None:
+                if session.decode_factor is None:
+                    # Tracker konum ve hızları decode piksellerinde tutar; ölçek seviye değişince değişmemeli.
+                    # En büyük profil girişine göre seçilir, böylece hiçbir seviyede model girişinden küçük kalmaz
+                    session.decode_factor = reduction_factor(*validate_frame(frame_data), MODEL_INPUT_SIZE)
+                results = decode_and_process(session.processor, frame_data, factor=session.decode_factor)
+            else:
+                results = session.processor.process_frame(frame)
+        finally:
+            if profile_run is not None:
+                profile_run.exit()
+        session.record_frame((time.perf_counter() - started_at) * 1000)
+    startup.frame_served()
+    return results
 
 @router.post("/start")
 async def start_live_analysis():
@@ -20,47 +139,316 @@ async def start_live_analysis():
 
 @router.websocket("/feed/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await websocket.accept()
-    active_connections[client_id] = websocket
+    # İstemci "vs-bin-1" alt protokolünü isterse sonuçlar delta kodlu binary gider
+    binary, subprotocol = negotiate(
+        websocket.scope.get("subprotocols", []), websocket.query_params.get("protocol")
+    )
+    await websocket.accept(subprotocol=subprotocol)
+    encoder = DeltaEncoder() if binary else None
+    loop = asyncio.get_running_loop()
+
+    if not capacity.admit_new():
+        await websocket.close(code=1013, reason="Server overloaded, try again later")
+        return
     
-    # Initialize video processor for this connection
-    model = CrimeDetectionModel()
-    video_processor = VideoProcessor(model)
-    video_processors[client_id] = video_processor
+    # Initialize a tracking session for this connection
+    try:
+        session = await loop.run_in_executor(inference_executor, sessions.create, client_id, "websocket")
+    except SessionLimitError as e:
+        await websocket.close(code=1013, reason=str(e)[:120])
+        return
+    session.active += 1
+    video_processor = session.processor
+
+    # Reader sadece en yeni frame'i tutar; inference yavaşsa eski frame'ler atılır
+    slot = LatestFrameSlot()
+    rate_key = f"ws:{client_id}"
+    counters = {"rate_limited": 0, "skipped": 0, "seen": 0}
+
+    # Kayıt, rate limit'ten önce gelen her frame'i varış zamanıyla saklar (replay_session.py ile oynatılır)
+    recorder = None
+    if recording_requested(websocket.query_params):
+        try:
+            recorder = SessionRecorder.for_session(client_id, session.session_id, {
+                "binary": binary,
+                "degradation_level": capacity.profile["name"],
+                "client_fps": LIVE_CLIENT_FPS,
+                "client_burst": LIVE_CLIENT_BURST
+            })
+        except OSError as e:
+            logger.error(f"Could not start recording for {client_id}: {e}")
+
+    async def receive_frames():
+        try:
+            while True:
+                frame_data = await websocket.receive_bytes()
+                received_at = time.perf_counter()
+                if recorder is not None:
+                    recorder.add(frame_data, received_at)
+                # İstemci kendi hızını aşarsa frame kuyruğa hiç girmez
+                if not rate_limiter.try_acquire(rate_key):
+                    counters["rate_limited"] += 1
+                    session.stages.dropped("rate_limited")
+                    continue
+                slot.put(frame_data, received_at)
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive_frames())
     
     try:
         while True:
-            # Receive frame as bytes
-            frame_data = await websocket.receive_bytes()
-            
-            # Convert bytes to numpy array
-            frame_array = np.frombuffer(frame_data, dtype=np.uint8)
-            frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
+            pending = await slot.get()
+            if pending is None:
+                break
+            frame_data, received_at, dropped = pending
+            session.stages.dropped("replaced", dropped)
+            counters["seen"] += 1
+            if counters["seen"] % capacity.profile["frame_stride"]:
+                counters["skipped"] += 1
+                session.stages.dropped("frame_skip")
+                continue
+            started_at = time.perf_counter()
             
-            # Process frame
-            results = video_processor.process_frame(frame)
+            # Decode + process on the executor
+            results = await loop.run_in_executor(
+                inference_executor, process_in_session, session, frame_data, received_at
+            )
+            finished_at = time.perf_counter()
+            publish_results(
+                client_id, video_processor.frame_count, results, (finished_at - received_at) * 1000,
+                counters["skipped"], counters["rate_limited"]
+            )
+
+            encoding_started = time.perf_counter()
+            if encoder is not None:
+                message = encoder.encode(
+                    video_processor.frame_count,
+                    results["detections"],
+                    {s["track_id"] for s in results["suspicious_interactions"]},
+                    latency_ms=(encoding_started - received_at) * 1000,
+                    dropped_frames=dropped,
+                    degradation_level=capacity.level,
+                    skipped_frames=counters["skipped"],
+                    rate_limited_frames=counters["rate_limited"]
+                )
+                session.stages.observe(
+                    "serialization", video_processor.model.model_variant, time.perf_counter() - encoding_started
+                )
+                await websocket.send_bytes(message)
+                continue
             
             # Send results back to client
-            await websocket.send_json({
+            message = dumps({
                 "frame_number": video_processor.frame_count,
                 "timestamp": datetime.utcnow().isoformat(),
                 "detections": results["detections"],
-                "suspicious_interactions": results["suspicious_interactions"]
+                "suspicious_interactions": results["suspicious_interactions"],
+                "dropped_frames": dropped,
+                "total_dropped_frames": slot.total_dropped,
+                "queue_ms": (started_at - received_at) * 1000,
+                "inference_ms": (finished_at - started_at) * 1000,
+                "latency_ms": (time.perf_counter() - received_at) * 1000,
+                "rate_limited_frames": counters["rate_limited"],
+                "skipped_frames": counters["skipped"],
+                "degradation_level": capacity.profile["name"]
             })
+            session.stages.observe(
+                "serialization", video_processor.model.model_variant, time.perf_counter() - encoding_started
+            )
+            await websocket.send_text(message.decode())
+
+        # Reader bittiyse nedenini yüzeye çıkar (disconnect ya da hata)
+        await receiver
             
     except WebSocketDisconnect:
-        # Cleanup on disconnect
-        if client_id in active_connections:
-            del active_connections[client_id]
-        if client_id in video_processors:
-            del video_processors[client_id]
+        pass
     except Exception as e:
-        print(f"Error processing frame: {str(e)}")
-        if client_id in active_connections:
-            await websocket.close(code=1001, reason=str(e))
+        logger.error(f"Error processing frame: {str(e)}")
+        try:
+            await websocket.close(code=1011, reason=str(e)[:120])
+        except RuntimeError:
+            pass  # Bağlantı zaten kapanmış
+    finally:
+        # Cleanup on disconnect or error
+        receiver.cancel()
+        session.active -= 1
+        sessions.close(session)
+        if recorder is not None:
+            await loop.run_in_executor(None, recorder.close)
+
+async def _get_frame_session(token: str, request: Request) -> LiveSession:
+    """Resume the tracking session named by ``token``; without a token, the camera's or client address's session"""
+    if token:
+        session = sessions.get(token)
+        if session is None:
+            # Süresi dolmuş ya da başka worker'ın token'ı; sessizce yeni oturum açmak tracker'ı sıfırlardı
+            raise UnknownSessionError("Unknown or expired session token; send the frame without a token to start a new session")
+        return session
+    camera = request.query_params.get("camera")
+    host = request.client.host if request.client else None
+    key = f"camera:{camera}" if camera else f"host:{host or 'anonymous'}"
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        inference_executor, sessions.get_or_create_keyed, key, camera or host, "http"
+    )
+
+def _unknown_session_response(error: UnknownSessionError) -> JSONResponse:
+    return JSONResponse(status_code=410, content={"detections": [], "error": str(error), "session_token": None})
+
+async def _run_in_session(session: LiveSession, frame_data, frame: np.ndarray = None) -> Dict:
+    loop = asyncio.get_running_loop()
+    session.active += 1
+    try:
+        return await loop.run_in_executor(
+            inference_executor, process_in_session, session, frame_data, time.perf_counter(), frame
+        )
+    finally:
+        session.active -= 1
+
+def _check_admission(request: Request, token: str):
+    """Return a 429 response when the client is over its rate or the server refuses new sessions"""
+    profile = capacity.profile
+    client_key = token or (request.client.host if request.client else "anonymous")
+    # Frame atlama kademesinde her istek stride kadar token harcar
+    if not rate_limiter.try_acquire(client_key, cost=profile["frame_stride"]):
+        http_stages.dropped("rate_limited")
+        retry_after = rate_limiter.retry_after(client_key, profile["frame_stride"])
+        return JSONResponse(
+            status_code=429,
+            content={"detections": [], "error": "Frame rate limit exceeded", "degradation_level": profile["name"]},
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999))), "X-Degradation-Level": profile["name"]}
+        )
+    if sessions.get(token) is None and not capacity.admit_new():
+        return JSONResponse(
+            status_code=429,
+            content={"detections": [], "error": "Server overloaded, try again later", "degradation_level": profile["name"]},
+            headers={"Retry-After": "5", "X-Degradation-Level": profile["name"]}
+        )
+    return None
+
+async def _process_binary_frame(request: Request, session: LiveSession) -> Dict:
+    """Binary ingestion: raw JPEG/PNG body or a multipart ``image`` field"""
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("image") or form.get("frame")
+        if upload is None:
+            raise FrameValidationError("No image field in multipart body")
+        frame_data = await upload.read()
+        return await _run_in_session(session, frame_data)
+
+    buffer = frame_buffers.acquire()
+    try:
+        frame_data = await frame_buffers.read_request(request, buffer)
+        return await _run_in_session(session, frame_data)
+    finally:
+        frame_buffers.release(buffer)
+
+@router.websocket("/watch/{camera_id}")
+async def watch_endpoint(websocket: WebSocket, camera_id: str):
+    """Receive a camera's detections and alerts without sending frames"""
+    binary, subprotocol = negotiate(
+        websocket.scope.get("subprotocols", []), websocket.query_params.get("protocol")
+    )
+    await websocket.accept(subprotocol=subprotocol)
+    try:
+        subscriber = broadcaster.subscribe(camera_id, binary)
+    except SubscriberLimitError as e:
+        await websocket.close(code=1013, reason=str(e)[:120])
+        return
+
+    async def watch_disconnect():
+        # İzleyici frame göndermez; sadece kapanışı yakala
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            subscriber.close()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            message = await subscriber.get()
+            if message is None:
+                break
+            if subscriber.encoder is None:
+                await websocket.send_text(message["encoded"].decode())
+                continue
+            payload = message["payload"]
+            dropped, subscriber.dropped_since_last = subscriber.dropped_since_last, 0
+            await websocket.send_bytes(subscriber.encoder.encode(
+                payload["frame_number"],
+                payload["detections"],
+                {s["track_id"] for s in payload["suspicious_interactions"]},
+                latency_ms=payload["latency_ms"],
+                dropped_frames=dropped,
+                degradation_level=payload["degradation_level_index"],
+                skipped_frames=payload["skipped_frames"],
+                rate_limited_frames=payload["rate_limited_frames"]
+            ))
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+@router.get("/watch")
+async def watch_stats():
+    """Viewers, delivered and dropped results per camera"""
+    return broadcaster.get_stats()
+
+@router.get("/load")
+async def load_status():
+    """Current degradation level, smoothed queueing delay and rejection counters"""
+    return {
+        **capacity.get_stats(),
+        "rate_limited": rate_limiter.rejected,
+        "sessions": len(sessions.sessions())
+    }
+
+@router.get("/sessions")
+async def list_sessions():
+    """List live sessions with per-session fps, latency and tracker size"""
+    sessions.evict_idle()
+    return sessions.get_stats()
 
 @router.post("/frame")
-async def live_analysis_frame(request: Request):
+async def live_analysis_frame(request: Request, response: Response):
+    content_type = request.headers.get("content-type", "")
+    # Aynı token ile gelen frame'ler aynı tracker'da işlenir
+    token = request.headers.get(SESSION_HEADER) or request.query_params.get("session")
+    rejection = _check_admission(request, token)
+    if rejection is not None:
+        return rejection
+    response.headers["X-Degradation-Level"] = capacity.profile["name"]
+    if not content_type.startswith("application/json"):
+        try:
+            session = await _get_frame_session(token, request)
+            results = await _process_binary_frame(request, session)
+            if request.query_params.get("camera"):
+                publish_results(
+                    request.query_params["camera"], session.processor.frame_count, results, session.last_latency_ms
+                )
+        except SessionLimitError as e:
+            return JSONResponse(status_code=503, content={"detections": [], "error": str(e)}, headers={"Retry-After": "5"})
+        except UnknownSessionError as e:
+            return _unknown_session_response(e)
+        except FrameValidationError as e:
+            status_code = 413 if "too large" in str(e) else 400
+            return JSONResponse(status_code=status_code, content={"detections": [], "error": str(e)})
+        except Exception as e:
+            logger.error(f"Model error: {str(e)}")
+            return {"detections": [], "error": f"Model error: {str(e)}"}
+        return {
+            "detections": results["detections"],
+            "suspicious_interactions": results.get("suspicious_interactions", []),
+            "session_token": session.token,
+            "degradation_level": capacity.profile["name"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
     try:
         data = await request.json()
         image_b64 = data.get("image")
@@ -76,13 +464,17 @@ async def live_analysis_frame(request: Request):
             print("Image decode error:", e)
             return {"detections": [], "error": f"Image decode error: {str(e)}"}
 
-        # Model ve video processor örneği oluştur
-        model = CrimeDetectionModel()
-        video_processor = VideoProcessor(model)
+        # Oturumun video processor'ını kullan (token yoksa kameranın ya da istemcinin oturumu)
+        try:
+            session = await _get_frame_session(token or data.get("session_token"), request)
+        except SessionLimitError as e:
+            return JSONResponse(status_code=503, content={"detections": [], "error": str(e)}, headers={"Retry-After": "5"})
+        except UnknownSessionError as e:
+            return _unknown_session_response(e)
 
         # Frame'i analiz et
         try:
-            results = video_processor.process_frame(frame)
+            results = await _run_in_session(session, None, frame)
         except Exception as e:
             print("Model error:", e)
             return {"detections": [], "error": f"Model error: {str(e)}"}
@@ -90,6 +482,8 @@ async def live_analysis_frame(request: Request):
         return {
             "detections": results["detections"],
             "suspicious_interactions": results.get("suspicious_interactions", []),
+            "session_token": session.token,
+            "degradation_level": capacity.profile["name"],
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from utils.storage import LocalStorageBackend, get_storage_backend
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _local_backend() -> LocalStorageBackend:
+    backend = get_storage_backend()
+    if not isinstance(backend, LocalStorageBackend):
+        raise HTTPException(status_code=404, detail="Local storage backend is not enabled")
+    return backend
+
+
+def _check_signature(backend: LocalStorageBackend, request: Request, blob_name: str):
+    params = request.query_params
+    try:
+        expires = int(params.get("expires", "0"))
+    except ValueError:
+        expires = 0
+    method = params.get("method", "")
+    if method != request.method or not backend.sync.verify_signature(method, blob_name, expires, params.get("signature")):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+
+@router.get("/local-storage/{blob_name:path}")
+async def local_storage_get(blob_name: str, request: Request):
+    """Serve a blob through a signed URL (stand-in for a GCS signed GET)"""
+    backend = _local_backend()
+    _check_signature(backend, request, blob_name)
+    if not await backend.exists(blob_name):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return Response(content=await backend.download_bytes(blob_name))
+
+
+@router.post("/local-storage/{blob_name:path}")
+async def local_storage_start_resumable(blob_name: str, request: Request):
+    """Start a resumable upload (stand-in for the GCS ``x-goog-resumable: start`` POST)"""
+    backend = _local_backend()
+    _check_signature(backend, request, blob_name)
+    if request.headers.get("x-goog-resumable") != "start":
+        raise HTTPException(status_code=400, detail="Missing x-goog-resumable: start header")
+    session_url = await backend.run(backend.sync.start_resumable_session, blob_name)
+    return Response(status_code=201, headers={"Location": session_url})
+
+
+@router.put("/local-storage/.resumable/{session_id}")
+async def local_storage_put_chunk(session_id: str, request: Request):
+    """Receive a chunk of a resumable upload"""
+    backend = _local_backend()
+    _check_signature(backend, request, f".resumable/{session_id}")
+    data = await request.body()
+    try:
+        status = await backend.run(
+            backend.sync.write_resumable_chunk, session_id, data, request.headers.get("content-range")
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if status["complete"]:
+        return {"status": "complete", "name": status["path"], "size": status["received"]}
+    # GCS "Resume Incomplete" yanıtı
+    headers = {"Range": f"bytes=0-{status['received'] - 1}"} if status["received"] else {}
+    return Response(status_code=308, headers=headers)
@@ -1,18 +1,32 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 from typing import Dict, List, Optional
 import uuid
-import cv2
+import json
+import base64
 from datetime import datetime
-from models.crime_detection_model import CrimeDetectionModel
-from models.video_processor import VideoProcessor
-from utils.gcp_connector import GCPConnector
+from utils.storage import get_storage_backend
+from utils.evidence_store import EvidenceStore
+from utils.results_cache import ResultsCache
+from utils.job_scheduler import JobScheduler, PRIORITIES
+from utils.raw_detections import rescore_cached, validate_rescore_params
+from utils.work_queue import get_work_queue
+from utils.upload_sessions import UploadSessionStore, verify_push_request
+from utils.metrics import register_gauge
+from utils.serialization import FastJSONResponse, NDJSON_MEDIA_TYPE, dumps, ndjson_lines_to_array
+from services.video_analysis import UPLOAD_DIR, get_raw_cache, process_uploaded_video, process_video
+from utils.thread_budget import apply_role, get_budget
 import logging
 import numpy as np
 import time
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Logging ayarları
 logging.basicConfig(
@@ -21,111 +35,255 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# GCP connector'ı başlat
-try:
-    bucket_name = os.getenv('GCP_BUCKET_NAME')
-    if not bucket_name:
-        raise ValueError("GCP_BUCKET_NAME environment variable is not set")
-    
-    gcp = GCPConnector(bucket_name=bucket_name)
-    logger.info(f"GCPConnector initialized with bucket: {bucket_name}")
-except Exception as e:
-    logger.error(f"Failed to initialize GCPConnector: {str(e)}")
-    raise
+# Storage backend'i (GCS ya da STORAGE_BACKEND=local ile yerel disk); bağlantı ilk kullanımda kurulur
+storage = get_storage_backend()
+
+evidence_store = EvidenceStore(storage.sync)
+results_cache = ResultsCache()
+raw_cache = get_raw_cache()
+# Oturum kayıtları bucket'ta; callback ya da bildirim hangi worker'a düşerse düşsün bulunur
+upload_sessions = UploadSessionStore(storage)
 
 router = APIRouter()
-UPLOAD_DIR = "uploads"
 analysis_tasks: Dict[str, Dict] = {}
 ALLOWED_EXTENSIONS = {'.mp4', '.mov', '.avi'}
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+UPLOAD_URL_EXPIRATION = 3600  # seconds
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    content_type: str = "application/octet-stream"
+    size: Optional[int] = None
+    priority: str = "normal"
+
+class RescoreRequest(BaseModel):
+    conf_threshold: Optional[float] = None
+    iou_threshold: Optional[float] = None
+    velocity_threshold: Optional[float] = None
+    anomaly_threshold: Optional[float] = None
+    save: bool = False
+
+class RescoreSweepRequest(BaseModel):
+    video_ids: List[str]
+    params: List[Dict[str, float]]
+
+# Varsayılan: bu API worker'ın CPU payı; her worker kendi havuzunu açar
+RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", "0")) or get_budget().role("api").executors["rescore_processes"]
+RESCORE_MAX_SWEEP = int(os.getenv("RESCORE_MAX_SWEEP", "500"))
+_rescore_pool: Optional[ProcessPoolExecutor] = None
+
+# Analizler API sürecinin dışında, sınırlı ve öncelikli bir worker havuzunda çalışır
+scheduler = JobScheduler()
+
+# "distributed": işler paylaşılan kuyruğa yazılır ve worker.py süreçleri tarafından işlenir
+ANALYSIS_QUEUE = os.getenv("ANALYSIS_QUEUE", "local")
+work_queue = get_work_queue() if ANALYSIS_QUEUE == "distributed" else None
+
+def _job_gauge_samples():
+    stats = work_queue.get_stats() if work_queue is not None else scheduler.get_stats()
+    running = stats["counts"].get("running", 0) if work_queue is not None else stats["running"]
+    return [(("queued",), stats["queue_depth"]), (("running",), running)]
+
+register_gauge("visionsleuth_analysis_jobs", "Video analysis jobs by state", ["state"], _job_gauge_samples)
+register_gauge("visionsleuth_analysis_oldest_queued_seconds", "Wait of the oldest queued analysis job", [], lambda: [
+    ((), (work_queue.get_stats() if work_queue is not None else scheduler.get_stats())["oldest_queued_seconds"])
+])
+register_gauge("visionsleuth_analysis_results_cache_bytes", "Bytes held by the analysis results cache", [], lambda: [
+    ((), results_cache.get_stats()["bytes"])
+])
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def process_video(video_id: str, video_path: str, gcp_path: str):
+def _on_analysis_done(job):
+    """Scheduler callback: record the outcome of an analysis job"""
+    task = analysis_tasks.get(job.job_id)
+    if task is None:
+        return
+    if job.status == "completed":
+        task.update({"status": "completed", **job.result})
+    else:
+        task.update({"status": job.status, "error": job.error})
+    # Kuyruktayken iptal edilen iş dosyasına hiç dokunmamıştır
+    local_path = task.pop("local_path", None)
+    if local_path and os.path.exists(local_path):
+        os.remove(local_path)
+
+def enqueue_analysis(video_id: str, gcp_path: str, func, *args, priority: str = "normal",
+                     local_path: Optional[str] = None):
+    """Register an analysis task and queue it on the scheduler or the distributed queue"""
+    if work_queue is not None:
+        # Worker'lar videoyu storage'dan indirir; yerel kopya bu node'da kalmaz
+        work_queue.enqueue(
+            video_id, "process_uploaded_video", {"video_id": video_id, "gcp_path": gcp_path}, priority=priority
+        )
+        if local_path and os.path.exists(local_path):
+            os.remove(local_path)
+        return
+    analysis_tasks[video_id] = {
+        "status": "queued",
+        "priority": priority,
+        "timestamp": datetime.utcnow().isoformat(),
+        "video_path": gcp_path,
+        "results_path": None,
+        "error": None,
+        "summary": None,
+        "model_performance": None,
+        "local_path": local_path
+    }
+    scheduler.submit(video_id, func, *args, priority=priority, callback=_on_analysis_done)
+
+def _queue_job_view(job: Dict) -> Dict:
+    """Shape a work queue row like ``Job.to_dict`` so clients see one format"""
+    started, finished = job["started_at"], job["finished_at"]
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "submitted_at": job["enqueued_at"],
+        "started_at": started,
+        "finished_at": finished,
+        "wait_seconds": (started - job["enqueued_at"]) if started else None,
+        "run_seconds": (finished - started) if finished and started else None,
+        "error": job["error"],
+        "attempts": job["attempts"],
+        "worker_id": job["worker_id"]
+    }
+
+def get_job_view(video_id: str) -> Optional[Dict]:
+    if work_queue is not None:
+        job = work_queue.get(video_id)
+        return _queue_job_view(job) if job is not None else None
+    job = scheduler.get(video_id)
+    return job.to_dict() if job is not None else None
+
+def _validate_priority(priority: str):
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid priority. Allowed: {', '.join(PRIORITIES)}"
+        )
+
+async def complete_upload_session(video_id: str) -> Dict:
+    """Verify a direct upload landed in storage and enqueue its analysis"""
+    found = await upload_sessions.get(video_id) if upload_sessions.video_id_for(video_id) == video_id else None
+    if found is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    session, generation = found
+    if session["status"] == "completed":
+        return {"status": "success", "id": video_id, "message": "Analysis already started"}
+
+    metadata = await storage.get_metadata(session["gcp_path"])
+    if metadata is None:
+        raise HTTPException(status_code=409, detail="Upload has not been received yet")
+    if metadata["size"] is not None and metadata["size"] > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail="File too large. Maximum size is 500MB")
+
+    if not await upload_sessions.claim(video_id, session, generation, status="completed"):
+        # İstemci callback'i ile bucket bildirimi yarıştı; analizi diğeri başlattı
+        return {"status": "success", "id": video_id, "message": "Analysis already started"}
     try:
-        # Initialize model and processor
-        model = CrimeDetectionModel()
-        processor = VideoProcessor(model)
-        
-        # Open video file
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise Exception("Could not open video file")
-        
-        # Video özelliklerini al
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps if fps > 0 else 0
-        video_format = os.path.splitext(video_path)[1][1:].upper()
-        
-        results = []
-        processed_frames = 0
-        start_time = time.time()
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Process frame
-            frame_results = processor.process_frame(frame)
-            results.append(frame_results)
-            processed_frames += 1
-            
-        cap.release()
-        
-        # Performans metriklerini hesapla
-        inference_time = (time.time() - start_time) * 1000 / processed_frames  # ms per frame
-        
-        # Sonuçları hazırla
-        analysis_data = {
-            "video_path": gcp_path,
-            "timestamp": datetime.utcnow().isoformat(),
-            "summary": {
-                "duration": duration,
-                "totalFrames": total_frames,
-                "processedFrames": processed_frames,
-                "videoSize": os.path.getsize(video_path),
-                "format": video_format
-            },
-            "frames": results,
-            "model_performance": {
-                "inference_time": inference_time,
-                "frames_processed": processed_frames,
-                "average_confidence": sum(r.get("confidence", 0) for r in results) / len(results) if results else 0
-            }
-        }
-        
-        # Save results to GCP
-        results_path = gcp.save_results(video_id, analysis_data)
-        
-        # Update task status
-        analysis_tasks[video_id].update({
-            "status": "completed",
-            "results_path": results_path,
-            "summary": analysis_data["summary"],
-            "model_performance": analysis_data["model_performance"]
-        })
-        
-        # Cleanup local file
-        os.remove(video_path)
-        
+        await storage.run(
+            enqueue_analysis, video_id, session["gcp_path"], process_uploaded_video, video_id, session["gcp_path"],
+            priority=session.get("priority", "normal")
+        )
+    except Exception:
+        # Kuyruğa eklenemeyen oturum tekrar tamamlanabilsin
+        await storage.upload_bytes(dumps(session), upload_sessions.path(video_id), "application/json")
+        raise
+    logger.info(f"Direct upload completed, analysis queued: {session['gcp_path']}")
+    return {"status": "success", "id": video_id, "message": "Upload confirmed, analysis started"}
+
+@router.post("/video/upload-session")
+async def create_upload_session(body: UploadSessionRequest):
+    """Issue a signed resumable-upload URL so the client uploads straight to the bucket"""
+    file_ext = os.path.splitext(body.filename)[1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    if body.size is not None and body.size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail="File too large. Maximum size is 500MB"
+        )
+    _validate_priority(body.priority)
+
+    video_id = str(uuid.uuid4())
+    gcp_path = f"videos/{datetime.utcnow().strftime('%Y/%m/%d')}/{video_id}{file_ext}"
+    try:
+        upload = await storage.create_resumable_upload_url(
+            gcp_path, body.content_type, expiration=UPLOAD_URL_EXPIRATION
+        )
     except Exception as e:
-        analysis_tasks[video_id]["status"] = "failed"
-        analysis_tasks[video_id]["error"] = str(e)
-        if os.path.exists(video_path):
-            os.remove(video_path)
+        logger.error(f"Error creating upload session: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to create upload session: {str(e)}"
+        )
+
+    await upload_sessions.create(video_id, {
+        "status": "pending",
+        "gcp_path": gcp_path,
+        "priority": body.priority,
+        "created": datetime.utcnow().isoformat()
+    })
+    return {
+        "id": video_id,
+        "upload": upload,
+        "video_path": gcp_path,
+        "expires_in": UPLOAD_URL_EXPIRATION,
+        "complete_url": f"/api/video/upload-session/{video_id}/complete"
+    }
+
+@router.post("/video/upload-session/{video_id}/complete")
+async def confirm_upload_session(video_id: str):
+    """Client callback once the direct upload finished"""
+    return await complete_upload_session(video_id)
+
+@router.post("/video/upload-notification")
+async def upload_notification(request: Request):
+    """Pub/Sub push endpoint for GCS ``OBJECT_FINALIZE`` notifications.
+
+    Requests must carry the subscription's OIDC token (``UPLOAD_NOTIFICATION_AUDIENCE``)
+    or the shared ``?token=`` (``UPLOAD_NOTIFICATION_TOKEN``).
+    """
+    rejection = await asyncio.to_thread(
+        verify_push_request, request.headers.get("authorization"), request.query_params.get("token")
+    )
+    if rejection is not None:
+        logger.warning(f"Rejected upload notification: {rejection}")
+        raise HTTPException(status_code=403, detail=rejection)
+    envelope = await request.json()
+    message = envelope.get("message", {})
+    attributes = message.get("attributes", {})
+    if attributes.get("eventType") != "OBJECT_FINALIZE":
+        return {"status": "ignored"}
+
+    object_id = attributes.get("objectId")
+    if not object_id and message.get("data"):
+        object_id = json.loads(base64.b64decode(message["data"])).get("name")
+
+    video_id = upload_sessions.video_id_for(object_id)
+    found = await upload_sessions.get(video_id) if video_id else None
+    if found is None or found[0]["gcp_path"] != object_id:
+        # Doğrudan yükleme oturumuna ait olmayan nesne; Pub/Sub'ın tekrar denememesi için 200 dön
+        return {"status": "ignored"}
+    return await complete_upload_session(video_id)
 
 @router.post("/video/upload")
 async def upload_video(
-    background_tasks: BackgroundTasks,
-    video: UploadFile = File(...)
+    video: UploadFile = File(...),
+    priority: str = "normal"
 ):
     start_time = time.time()
     temp_path = None
     
     try:
+        _validate_priority(priority)
+
         # Dosya uzantısı kontrolü
         file_ext = os.path.splitext(video.filename)[1].lower()
         if file_ext not in ALLOWED_EXTENSIONS:
@@ -134,51 +292,48 @@ async def upload_video(
                 detail=f"Invalid file type. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
             )
 
-        # Dosya boyutu kontrolü
-        content = await video.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413,
-                detail="File too large. Maximum size is 500MB"
-            )
-
         # Video işleme
         video_id = str(uuid.uuid4())
         temp_path = os.path.join(UPLOAD_DIR, f"{video_id}{file_ext}")
+
+        # Geçici dosyaya parça parça kaydet; dosyanın tamamı bellekte tutulmaz
+        received = 0
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = await video.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                # Dosya boyutu kontrolü
+                if received > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail="File too large. Maximum size is 500MB"
+                    )
+                await storage.run(buffer.write, chunk)
         
         try:
-            # Geçici dosyaya kaydet
-            with open(temp_path, "wb") as buffer:
-                buffer.write(content)
-            
             logger.info(f"Video saved temporarily: {temp_path}")
             
             try:
                 # GCP'ye yükleme
-                gcp_path = gcp.upload_video(temp_path)
+                gcp_path = await storage.upload_video(temp_path)
                 logger.info(f"Video uploaded to GCP: {gcp_path}")
                 
-                # Analiz task'ını başlat
-                analysis_tasks[video_id] = {
-                    "status": "processing",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "video_path": gcp_path,
-                    "results_path": None,
-                    "error": None,
-                    "summary": None,
-                    "model_performance": None
-                }
-                
-                # Background task'ı başlat
-                background_tasks.add_task(process_video, video_id, temp_path, gcp_path)
+                # Analizi scheduler kuyruğuna ekle; SQLite kuyruğuna yazmak bloklayıcı olduğundan thread'de
+                await storage.run(
+                    enqueue_analysis, video_id, gcp_path, process_video, video_id, temp_path, gcp_path,
+                    priority=priority, local_path=temp_path
+                )
                 
                 process_time = time.time() - start_time
                 logger.info(f"Upload completed in {process_time:.2f} seconds")
                 
-                return JSONResponse({
+                return FastJSONResponse({
                     "status": "success",
                     "id": video_id,
-                    "message": "Video upload successful, analysis started",
+                    "message": "Video upload successful, analysis queued",
+                    "job": get_job_view(video_id),
                     "process_time": process_time
                 })
                 
@@ -201,6 +356,8 @@ async def upload_video(
             )
             
     except HTTPException as he:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
         raise he
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
@@ -211,16 +368,66 @@ async def upload_video(
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+@router.get("/video/jobs")
+async def get_job_stats():
+    """Queue depth, running jobs and wait/run time percentiles of the analysis scheduler"""
+    if work_queue is not None:
+        return await storage.run(work_queue.get_stats)
+    return scheduler.get_stats()
+
+@router.get("/video/jobs/{video_id}")
+async def get_job_status(video_id: str):
+    job = await storage.run(get_job_view, video_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    queue = work_queue if work_queue is not None else scheduler
+    return {**job, "queue_position": await storage.run(queue.queue_position, video_id)}
+
+@router.delete("/video/jobs/{video_id}")
+async def cancel_job(video_id: str):
+    """Cancel a queued analysis, or ask a running one to stop at its next checkpoint"""
+    queue = work_queue if work_queue is not None else scheduler
+    if not await storage.run(queue.cancel, video_id):
+        raise HTTPException(status_code=409, detail="Job is not queued or running")
+    return {"status": "cancelling", "job": await storage.run(get_job_view, video_id)}
+
+@router.post("/video/jobs/{video_id}/retry")
+async def retry_job(video_id: str, priority: Optional[str] = None):
+    """Requeue a failed analysis; it resumes from its last checkpoint"""
+    job = await storage.run(get_job_view, video_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "failed":
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    priority = priority or job["priority"]
+    _validate_priority(priority)
+    if work_queue is not None:
+        gcp_path = (await storage.run(work_queue.get, video_id))["payload"]["gcp_path"]
+    else:
+        gcp_path = analysis_tasks[video_id]["video_path"]
+    # Yerel kopya silinmiş olabilir; video storage'dan tekrar indirilir
+    await storage.run(
+        enqueue_analysis, video_id, gcp_path, process_uploaded_video, video_id, gcp_path, priority=priority
+    )
+    return {"status": "queued", "job": await storage.run(get_job_view, video_id)}
+
 @router.get("/video/analysis/{video_id}")
-async def get_analysis_results(video_id: str):
+async def get_analysis_results(video_id: str, request: Request):
     try:
         # Analysis results path'ini oluştur
         results_path = f"results/{video_id}/analysis.json"
         
         try:
-            # GCP'den sonuçları al
-            results = gcp.get_results(results_path)
-            return JSONResponse(results)
+            # Sonuçları cache'den al; blob değişmediyse tekrar indirilmez
+            body, etag = await results_cache.get(
+                storage, results_path, request.headers.get("if-none-match")
+            )
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if body is None:
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
         except Exception as e:
             logger.error(f"Error getting analysis results: {str(e)}")
             raise HTTPException(
@@ -228,6 +435,8 @@ async def get_analysis_results(video_id: str):
                 detail=f"Failed to get analysis results: {str(e)}"
             )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in get_analysis_results: {str(e)}")
         raise HTTPException(
@@ -235,6 +444,149 @@ async def get_analysis_results(video_id: str):
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+def _get_rescore_pool() -> ProcessPoolExecutor:
+    # Yeniden puanlama CPU'ya bağlı; sweep'ler süreç havuzunda paralel çalışır
+    global _rescore_pool
+    if _rescore_pool is None:
+        _rescore_pool = ProcessPoolExecutor(
+            max_workers=RESCORE_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+            initializer=apply_role, initargs=("rescore",)
+        )
+    return _rescore_pool
+
+async def _fetch_raw_cache(video_id: str) -> str:
+    key = await storage.run(raw_cache.key_for_video, video_id)
+    path = await storage.run(raw_cache.fetch, key) if key else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="No cached raw detections for this video")
+    return path
+
+@router.post("/video/analysis/{video_id}/rescore")
+async def rescore_analysis(video_id: str, body: RescoreRequest):
+    """Re-run thresholding, tracking, behaviour and anomaly analysis from cached raw detections"""
+    try:
+        params = validate_rescore_params(body.model_dump(exclude={"save"}))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cache_file = await _fetch_raw_cache(video_id)
+    output_path = results_path = None
+    if body.save:
+        tag = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+        output_path = os.path.join(UPLOAD_DIR, f"{video_id}.rescore-{tag}.ndjson")
+        results_path = f"results/{video_id}/rescored/{tag}.ndjson"
+    loop = asyncio.get_running_loop()
+    try:
+        summary = await loop.run_in_executor(_get_rescore_pool(), rescore_cached, cache_file, params, output_path)
+        if output_path:
+            await storage.upload_file(output_path, results_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+    return {"video_id": video_id, **summary, "results_path": results_path}
+
+@router.post("/video/rescore/sweep")
+async def rescore_sweep(body: RescoreSweepRequest):
+    """Score every video against every parameter set in parallel; returns one summary per pair"""
+    if len(body.video_ids) * len(body.params) > RESCORE_MAX_SWEEP:
+        raise HTTPException(status_code=400, detail=f"Sweep too large. Maximum is {RESCORE_MAX_SWEEP} runs")
+    try:
+        param_sets = [validate_rescore_params(params) for params in body.params]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cache_files = {video_id: await _fetch_raw_cache(video_id) for video_id in set(body.video_ids)}
+
+    loop = asyncio.get_running_loop()
+    pool = _get_rescore_pool()
+    runs = [(video_id, params) for video_id in body.video_ids for params in param_sets]
+    started = time.time()
+    outcomes = await asyncio.gather(
+        *(loop.run_in_executor(pool, rescore_cached, cache_files[video_id], params) for video_id, params in runs),
+        return_exceptions=True
+    )
+    results = []
+    for (video_id, params), outcome in zip(runs, outcomes):
+        if isinstance(outcome, Exception):
+            results.append({"video_id": video_id, "params": params, "error": str(outcome)})
+        else:
+            results.append({"video_id": video_id, **outcome})
+    return FastJSONResponse({
+        "runs": len(runs),
+        "workers": RESCORE_WORKERS,
+        "elapsed_seconds": round(time.time() - started, 3),
+        "results": results
+    })
+
+@router.get("/video/analysis/{video_id}/frames")
+async def stream_analysis_frames(video_id: str, format: str = "ndjson"):
+    """Stream per-frame results as NDJSON (default) or as a JSON array"""
+    if format not in ("ndjson", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'json'")
+    frames_path = f"results/{video_id}/frames.ndjson"
+    try:
+        if await storage.get_metadata(frames_path) is None:
+            raise HTTPException(status_code=404, detail="Frame results not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting frame results: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get frame results: {str(e)}"
+        )
+    chunks = storage.iter_bytes(frames_path)
+    if format == "json":
+        return StreamingResponse(ndjson_lines_to_array(chunks), media_type="application/json")
+    return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE)
+
+@router.get("/video/analysis-cache/stats")
+async def get_results_cache_stats():
+    """Results cache hit ratio and bytes saved"""
+    return results_cache.get_stats()
+
+@router.get("/video/evidence/{frame_id}")
+async def get_evidence_frame(frame_id: str, size: Optional[int] = None):
+    """Serve a stored evidence frame, or a lazily generated thumbnail of it"""
+    try:
+        if size is not None:
+            content = await storage.run(evidence_store.get_thumbnail, frame_id, size)
+            media_type = "image/jpeg"
+        else:
+            content, media_type = await storage.run(evidence_store.get_frame, frame_id)
+        # Frame'ler içerik adresli olduğu için süresiz cache'lenebilir
+        return Response(
+            content=content,
+            media_type=media_type,
+            headers={"Cache-Control": "public, max-age=31536000, immutable"}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting evidence frame: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get evidence frame: {str(e)}"
+        )
+
+@router.get("/video/evidence/{frame_id}/url")
+async def get_evidence_frame_url(frame_id: str, size: Optional[int] = None):
+    """Return a signed URL so clients can fetch evidence directly from the bucket"""
+    try:
+        return {"frameId": frame_id, "size": size, "url": await storage.run(evidence_store.signed_url, frame_id, size)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating evidence URL: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate evidence URL: {str(e)}"
+        )
+
 @router.get("/video/academic-analysis/{video_id}")
 async def get_academic_analysis(video_id: str):
     try:
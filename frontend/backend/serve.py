@@ -0,0 +1,347 @@
+"""Preload-then-fork API server.
+
+``uvicorn --workers N`` spawns N fresh interpreters, and each one imports
+torch and loads its own copy of the model weights, so memory grows with
+every worker. This supervisor imports the app and loads and warms the
+models once, binds the listening socket, then forks the workers. They
+inherit the weights (and the fused layers built by the warm-up
+inference) as copy-on-write pages that stay shared because inference
+only reads them.
+
+Fork safety: the supervisor runs its warm-up with torch on one intra-op
+thread, one inter-op thread and OpenCV threading off, so no thread pool
+exists at fork time (a pool inherited mid-state is what deadlocks torch
+and OpenCV in forked children). Each worker then sizes its own pools
+from the thread budget (``utils/thread_budget.py``) for its role.
+``gc.freeze()``
+before forking keeps the collector from writing into inherited objects.
+Storage clients are created after the fork, in each worker.
+
+    python serve.py --host 0.0.0.0 --port 8000 --workers 4
+
+With ``--inference-workers N`` the supervisor also forks N inference
+processes (see ``utils/inference_server.py``) that inherit the same
+preloaded weights. API workers then only decode, track and analyse, and
+send frames to them through shared memory; ``--inference-cpus`` pins the
+inference processes to their own cores. ``--workers 0`` runs the
+inference pool alone, for API servers started elsewhere with
+``INFERENCE_SOCKET`` pointing at it.
+
+    python serve.py --workers 4 --inference-workers 2 --inference-cpus 2-3
+
+With more than one API worker, analysis jobs go to the SQLite work queue
+(``ANALYSIS_QUEUE=distributed`` unless set otherwise) instead of each
+worker's in-memory scheduler, so any worker can report, cancel or retry
+any job. The supervisor then forks ``--queue-workers`` consumers (as many
+as the per-worker analysis pools had in total) that run ``worker.py``'s
+loop on the preloaded weights.
+
+Workers that die are re-forked from the preloaded supervisor; SIGTERM or
+SIGINT shuts all workers down gracefully: API workers first, then queue
+workers (a running job is requeued), then the inference processes.
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("serve")
+
+# Art arda bu kadar hızlı ölen worker yeniden başlatılmadan önce beklenir
+RESTART_WINDOW_SECONDS = 10.0
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(warm: bool):
+    """Import the app and load/warm the models with every thread pool kept off"""
+    import cv2
+    import torch
+    from utils.thread_budget import record_library_defaults
+
+    record_library_defaults()
+    torch.set_num_threads(1)
+    torch.set_num_interop_threads(1)
+    cv2.setNumThreads(0)
+
+    import main
+    from models.detector import DEFAULT_MODEL_PATH, load_shared_model, warm_up
+    from utils.admission import LIVE_LIGHT_MODEL_PATH
+    from utils.frame_ingest import MODEL_INPUT_SIZE
+
+    started = time.perf_counter()
+    for model_path, input_size in [(DEFAULT_MODEL_PATH, MODEL_INPUT_SIZE), (LIVE_LIGHT_MODEL_PATH, 320)]:
+        if not model_path:
+            continue
+        if warm:
+            logger.info(f"Preloaded {warm_up(model_path, input_size)}")
+        else:
+            load_shared_model(model_path)
+    logger.info(f"Models preloaded in {time.perf_counter() - started:.2f}s, RSS {_rss_mb(os.getpid()):.0f} MB")
+    return main.app
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def run_child(target, *target_args):
+    """Body of a forked process; never returns"""
+    status = 0
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        # Fork sonrası her worker kendi RNG durumuyla başlar
+        random.seed()
+        import numpy as np
+        np.random.seed()
+        target(*target_args)
+    except BaseException as e:
+        logger.error(f"Worker {os.getpid()} failed: {str(e)}")
+        status = 1
+    finally:
+        logging.shutdown()
+        os._exit(status)
+
+
+def run_worker(app, sock: socket.socket, args):
+    from utils.thread_budget import apply_role
+    apply_role("api")
+
+    import uvicorn
+    config = uvicorn.Config(
+        app, log_level=args.log_level, timeout_keep_alive=args.timeout_keep_alive,
+        proxy_headers=args.proxy_headers, forwarded_allow_ips=args.forwarded_allow_ips
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def run_inference_worker(listener: socket.socket, index: int):
+    from utils import inference_server
+    inference_server.run_worker(listener, index)
+
+
+def run_queue_worker(args, index: int):
+    from utils.job_scheduler import ANALYSIS_WORKER_NICE, _worker_init
+    from utils.work_queue import get_work_queue
+    from worker import Worker
+
+    # Scheduler havuzundaki analiz süreçleriyle aynı: düşük öncelik + analysis bütçesi
+    _worker_init(ANALYSIS_WORKER_NICE)
+    worker = Worker(get_work_queue(), f"{socket.gethostname()}-{os.getpid()}-q{index}", args.queue_lease, 2.0)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+class Supervisor:
+    def __init__(self, app, sock: Optional[socket.socket], args, inference_sock: Optional[socket.socket] = None):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.inference_sock = inference_sock
+        # pid -> (role, index, started)
+        self.workers: Dict[int, Tuple[str, int, float]] = {}
+        self.stopping = False
+
+    def spawn(self, role: str = "api", index: int = 0):
+        pid = os.fork()
+        if pid == 0:
+            if role == "inference":
+                if self.sock is not None:
+                    self.sock.close()
+                run_child(run_inference_worker, self.inference_sock, index)
+            elif role == "queue":
+                if self.sock is not None:
+                    self.sock.close()
+                run_child(run_queue_worker, self.args, index)
+            else:
+                if self.inference_sock is not None:
+                    self.inference_sock.close()
+                run_child(run_worker, self.app, self.sock, self.args)
+        self.workers[pid] = (role, index, time.time())
+        logger.info(f"Started {role} worker {pid}")
+
+    def stop(self, signum, _frame):
+        if not self.stopping:
+            logger.info(f"Received {signal.Signals(signum).name}, stopping {len(self.workers)} workers")
+        self.stopping = True
+
+    def _reap(self) -> bool:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return False
+        if pid == 0:
+            return False
+        entry = self.workers.pop(pid, None)
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid)
+        if entry is not None and not self.stopping:
+            role, index, started = entry
+            logger.warning(f"{role.capitalize()} worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            if time.time() - started < RESTART_WINDOW_SECONDS:
+                time.sleep(1.0)
+            self.spawn(role, index)
+        return True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        # Devralınan nesneler kalıcı nesilde kalır; child'larda GC onlara yazıp sayfaları kopyalamaz
+        gc.freeze()
+        # API worker'lar ilk frame'lerini gönderdiğinde inference süreçleri hazır olsun
+        for index in range(self.args.inference_workers):
+            self.spawn("inference", index)
+        for index in range(self.args.workers):
+            self.spawn("api", index)
+        for index in range(self.args.queue_workers):
+            self.spawn("queue", index)
+        while not self.stopping:
+            if not self._reap():
+                time.sleep(0.5)
+        self.shutdown()
+
+    def _stop_role(self, role: str):
+        pids = [pid for pid, entry in self.workers.items() if entry[0] == role]
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + self.args.graceful_timeout
+        while any(pid in self.workers for pid in pids) and time.time() < deadline:
+            if not self._reap():
+                time.sleep(0.1)
+        for pid in pids:
+            if pid not in self.workers:
+                continue
+            logger.warning(f"Worker {pid} did not stop in {self.args.graceful_timeout}s, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(self):
+        # Çalışan istekler inference'a ihtiyaç duyabilir; önce API worker'lar durur
+        self._stop_role("api")
+        self._stop_role("queue")
+        self._stop_role("inference")
+        while self._reap():
+            pass
+        for sock in (self.sock, self.inference_sock):
+            if sock is not None:
+                sock.close()
+        if self.inference_sock is not None and os.path.exists(self.args.inference_socket):
+            os.unlink(self.args.inference_socket)
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch/OpenCV threads in each worker, sets THREADS_API (default: from the thread budget)")
+    parser.add_argument("--inference-workers", type=int, default=int(os.getenv("INFERENCE_WORKERS", "0")),
+                        help="Dedicated inference processes fed through shared memory (default: inference in each worker)")
+    parser.add_argument("--inference-socket", default=None,
+                        help="Unix socket of the inference pool (default: $INFERENCE_SOCKET or a temporary path)")
+    parser.add_argument("--inference-cpus", default=None,
+                        help="CPUs the inference processes are pinned to, split between them, e.g. 2-3; sets CPUS_INFERENCE")
+    parser.add_argument("--inference-threads", type=int, default=None,
+                        help="torch/OpenCV threads in each inference process, sets THREADS_INFERENCE")
+    parser.add_argument("--queue-workers", type=int,
+                        default=int(os.environ["QUEUE_WORKERS"]) if os.getenv("QUEUE_WORKERS") else None,
+                        help="Analysis queue consumers to fork (default: workers x ANALYSIS_WORKERS when the "
+                             "analysis queue is distributed, else 0)")
+    parser.add_argument("--queue-lease", type=float, default=float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "60")),
+                        help="Lease length in seconds for the queue workers' jobs")
+    parser.add_argument("--no-warmup", action="store_true", help="Load the weights but skip the warm-up inference")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--timeout-keep-alive", type=int, default=5)
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--proxy-headers", action="store_true")
+    parser.add_argument("--forwarded-allow-ips", default=None)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    args.inference_workers = max(0, args.inference_workers)
+    args.workers = max(0 if args.inference_workers else 1, args.workers)
+    # Bütçe ortamdan okunur; fork edilen ve spawn edilen tüm süreçler aynı planı hesaplar
+    os.environ["WEB_CONCURRENCY"] = str(max(1, args.workers))
+    os.environ["INFERENCE_WORKERS"] = str(args.inference_workers)
+    for name, value in (("THREADS_API", args.threads_per_worker), ("THREADS_INFERENCE", args.inference_threads),
+                        ("CPUS_INFERENCE", args.inference_cpus)):
+        if value is not None:
+            os.environ[name] = str(value)
+    if args.workers > 1:
+        # Süreç başına scheduler'da iş durumu yalnızca işi alan worker'da olurdu; ortak kuyruk hepsinde görünür
+        os.environ.setdefault("ANALYSIS_QUEUE", "distributed")
+    if args.queue_workers is None:
+        distributed = os.environ.get("ANALYSIS_QUEUE") == "distributed"
+        args.queue_workers = max(1, args.workers) * int(os.getenv("ANALYSIS_WORKERS", "2")) if distributed else 0
+
+    if not hasattr(os, "fork"):
+        import uvicorn
+        logger.warning("os.fork is not available, falling back to uvicorn workers (no weight sharing, "
+                       "in-process inference)")
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers,
+                    timeout_keep_alive=args.timeout_keep_alive, log_level=args.log_level)
+        return
+
+    # /metrics her worker'da tüm worker'ların sayaçlarını göstersin; prometheus_client import'undan önce
+    if args.workers + args.inference_workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="vs-metrics-")
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from utils.inference_server import INFERENCE_SOCKET_ENV, bind_listener
+    inference_sock = None
+    if args.inference_workers:
+        args.inference_socket = (args.inference_socket or os.environ.get(INFERENCE_SOCKET_ENV)
+                                 or os.path.join(tempfile.mkdtemp(prefix="vs-inference-"), "inference.sock"))
+        # Ağırlıklar supervisor'da yerel yüklenmeli; soket adresi ancak fork'tan önce verilir
+        os.environ.pop(INFERENCE_SOCKET_ENV, None)
+    app = preload(warm=not args.no_warmup)
+    from utils.thread_budget import get_budget
+    budget = get_budget()
+    if budget.enabled and budget.planned_threads() > len(budget.cpus):
+        # Her süreç en az bir thread ister; süreç sayısı CPU sayısını aşıyor
+        logger.warning(f"{budget.planned_threads()} threads planned on {len(budget.cpus)} CPUs; "
+                       f"lower --workers or ANALYSIS_WORKERS")
+    if args.inference_workers:
+        inference_sock = bind_listener(args.inference_socket)
+        os.environ[INFERENCE_SOCKET_ENV] = args.inference_socket
+        inference = budget.role("inference")
+        logger.info(f"Inference on {args.inference_workers} processes at {args.inference_socket}, "
+                    f"{inference.threads or 'default'} threads each" + (f", CPUs {inference.cpus}" if inference.cpus else ""))
+    sock = bind_socket(args.host, args.port, args.backlog) if args.workers else None
+    if sock is not None:
+        logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers, "
+                    f"{budget.role('api').threads or 'default'} threads each")
+    Supervisor(app, sock, args, inference_sock).run()
+
+
+if __name__ == "__main__":
+    main()
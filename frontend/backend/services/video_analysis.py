@@ -0,0 +1,302 @@
+"""Video analysis pipeline run by the scheduler's pool processes and by ``worker.py``.
+
+Importing this module has no side effects: nothing connects, no pool or
+queue is created and no directory is made until a job runs. Pool
+processes spawned by ``JobScheduler`` unpickle the job function from here,
+so they import the pipeline only, not the API routes and their set-up.
+"""
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cv2
+from models.detector import ObjectDetector
+from models.video_processor import VideoProcessor
+from utils.storage import get_storage_backend
+from utils.job_scheduler import JobCancelled, check_cancelled
+from utils.checkpoints import AnalysisCheckpoint
+from utils.raw_detections import (
+    RAW_CONF_FLOOR, RAW_DETECTION_CACHE, RawDetectionCache, RawDetectionRecorder, file_sha256, model_version
+)
+from utils.metrics import StageRecorder, cache_lookup
+from utils.profiling import JobProfiler, ResourceMonitor
+from utils.serialization import dumps, iter_json_document
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads"
+CANCEL_CHECK_INTERVAL = 30  # frames
+
+# Bağlantı ilk storage çağrısında kurulur
+storage = get_storage_backend()
+_raw_cache: Optional[RawDetectionCache] = None
+
+
+def get_raw_cache() -> RawDetectionCache:
+    global _raw_cache
+    if _raw_cache is None:
+        _raw_cache = RawDetectionCache(storage)
+    return _raw_cache
+
+
+def process_video(video_id: str, video_path: str, gcp_path: str, cancel_event=None) -> Dict:
+    """Analyse a local video file and upload its results (runs on a scheduler worker).
+
+    Returns the fields merged into ``analysis_tasks``; the video file and the
+    frames spool are removed whatever the outcome. Progress is checkpointed
+    to storage every ``ANALYSIS_CHECKPOINT_FRAMES`` frames, and a rerun for
+    the same video resumes from the last checkpoint with identical output.
+    Raw model outputs are cached per video and model version; when the same
+    video was analysed before, tracking and analysis are replayed from that
+    cache instead of running the model again.
+
+    CPU time, peak RSS, frames/sec over time and the per-stage time
+    breakdown are recorded for every run; an admin profiling request adds
+    a sampling profile and tracemalloc report under ``results/{id}/profile``.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    frames_spool_path = os.path.join(UPLOAD_DIR, f"{video_id}.frames.ndjson")
+    checkpoint = AnalysisCheckpoint(storage, video_id)
+    processed_frames = 0
+    monitor = ResourceMonitor(lambda: processed_frames)
+    monitor.start()
+    job_stages = StageRecorder("batch", "batch")
+    profiler = JobProfiler(storage, video_id)
+    try:
+        # Initialize model and processor
+        model = ObjectDetector()
+        model.stages = job_stages
+        processor = VideoProcessor(model)
+        
+        # Open video file
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise Exception("Could not open video file")
+        
+        # Video özelliklerini al
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        duration = total_frames / fps if fps > 0 else 0
+        video_format = os.path.splitext(video_path)[1][1:].upper()
+        
+        confidence_sum = 0.0
+        elapsed_before = 0.0
+        spool_mode = "wb"
+
+        # Aynı video ve model için ham tespitler varsa model hiç çalıştırılmaz
+        cache_key = cached = recorder = None
+        if RAW_DETECTION_CACHE and model_version(model.model_path):
+            try:
+                cache_key = get_raw_cache().make_key(
+                    file_sha256(video_path), model_version(model.model_path), model.input_size
+                )
+                cached = get_raw_cache().load(cache_key)
+                cache_lookup("raw_detections", "hit" if cached is not None else "miss")
+            except Exception as e:
+                logger.error(f"Raw detection cache unavailable: {str(e)}")
+                cache_key = None
+
+        # Önceki denemenin checkpoint'i varsa kaldığı frame'den devam et
+        fingerprint = {"total_frames": total_frames, "size": os.path.getsize(video_path)}
+        state = checkpoint.load(fingerprint)
+        if state is not None:
+            checkpoint.restore_spool(state, frames_spool_path)
+            model.set_state(state["detector"])
+            processor.frame_count = state["frame_count"]
+            processed_frames = state["processed_frames"]
+            confidence_sum = state["confidence_sum"]
+            elapsed_before = state["elapsed_seconds"]
+            spool_mode = "ab"
+            monitor.reset_progress()
+            if cached is None:
+                # grab() decode eder ama modeli çalıştırmaz; seek'ten farklı olarak frame kaymaz
+                for _ in range(processed_frames):
+                    if not cap.grab():
+                        break
+            logger.info(f"Resuming analysis of {video_id} at frame {processed_frames}/{total_frames}")
+        elif cache_key is not None and cached is None:
+            # Devam eden bir analizin önceki frame'leri kayıtlı değil; sadece baştan başlayan analiz kaydeder
+            recorder = RawDetectionRecorder(expected_frames=total_frames)
+            model.raw_conf_floor = RAW_CONF_FLOOR
+
+        start_time = time.time()
+        
+        # Frame sonuçları bellekte biriktirilmez, NDJSON olarak diske yazılır
+        with open(frames_spool_path, spool_mode) as spool:
+            while True:
+                if cached is not None:
+                    if processed_frames >= len(cached):
+                        break
+                    if processed_frames % CANCEL_CHECK_INTERVAL == 0:
+                        check_cancelled(cancel_event)
+                        profiler.poll()
+                    frame_results = processor.process_raw(
+                        cached.frame(processed_frames), cached.names, raw_iou=cached.meta["iou_threshold"]
+                    )
+                else:
+                    decode_started = time.perf_counter()
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    model.stages.observe("decode", model.model_variant, time.perf_counter() - decode_started)
+                    if processed_frames % CANCEL_CHECK_INTERVAL == 0:
+                        check_cancelled(cancel_event)
+                        profiler.poll()
+                        
+                    # Process frame
+                    model.last_raw = None
+                    frame_results = processor.process_frame(frame)
+                    if recorder is not None:
+                        recorder.append(model.last_raw)
+                encoding_started = time.perf_counter()
+                line = dumps(frame_results) + b"\n"
+                model.stages.observe("serialization", model.model_variant, time.perf_counter() - encoding_started)
+                spool.write(line)
+                confidence_sum += frame_results.get("confidence", 0)
+                processed_frames += 1
+
+                if cached is None and checkpoint.due(processed_frames):
+                    checkpoint.save(spool, {
+                        "fingerprint": fingerprint,
+                        "processed_frames": processed_frames,
+                        "frame_count": processor.frame_count,
+                        "confidence_sum": confidence_sum,
+                        "elapsed_seconds": elapsed_before + time.time() - start_time,
+                        "detector": model.get_state()
+                    })
+            
+        cap.release()
+
+        if recorder is not None and model.frame_errors == 0 and processed_frames:
+            try:
+                recorder.names = dict(model.model.names)
+                get_raw_cache().save(cache_key, recorder.build({
+                    "conf_floor": RAW_CONF_FLOOR,
+                    "iou_threshold": model.iou_threshold,
+                    "input_size": model.input_size,
+                    "model_version": model_version(model.model_path),
+                    "frames": processed_frames
+                }))
+            except Exception as e:
+                logger.error(f"Could not cache raw detections for {video_id}: {str(e)}")
+                cache_key = None
+        elif recorder is not None:
+            # Hata veren frame'ler yeniden oynatılamaz; eksik önbellek yazılmaz
+            cache_key = None
+        if cache_key is not None and (cached is not None or recorder is not None):
+            try:
+                get_raw_cache().link(video_id, cache_key)
+            except Exception as e:
+                logger.error(f"Could not link raw detections for {video_id}: {str(e)}")
+        
+        # Performans metriklerini hesapla
+        elapsed = elapsed_before + time.time() - start_time
+        inference_time = elapsed * 1000 / processed_frames if processed_frames else 0  # ms per frame
+        resources = monitor.stop()
+        resources["stage_seconds"] = job_stages.breakdown()
+        resources["timeline_path"] = save_resource_timeline(video_id, resources, monitor.timeline)
+        
+        # Sonuçları hazırla
+        analysis_data = {
+            "video_path": gcp_path,
+            "timestamp": datetime.utcnow().isoformat(),
+            "summary": {
+                "duration": duration,
+                "totalFrames": total_frames,
+                "processedFrames": processed_frames,
+                "videoSize": os.path.getsize(video_path),
+                "format": video_format
+            },
+            "model_performance": {
+                "inference_time": inference_time,
+                "frames_processed": processed_frames,
+                "average_confidence": confidence_sum / processed_frames if processed_frames else 0,
+                "raw_cache_hit": cached is not None,
+                "resources": resources
+            }
+        }
+        
+        # Save results to GCP (worker içinde, bu yüzden blocking çağrı)
+        results_path = save_results_streaming(video_id, analysis_data, frames_spool_path)
+        checkpoint.clear()
+        
+        return {
+            "results_path": results_path,
+            "summary": analysis_data["summary"],
+            "model_performance": analysis_data["model_performance"]
+        }
+
+    except JobCancelled:
+        # İptal edilen analiz yeniden başlatılmaz; checkpoint'e gerek kalmaz
+        checkpoint.clear()
+        raise
+        
+    finally:
+        # Başarısız ya da iptal edilen işlerin profili de yazılır; yavaş videolar çoğunlukla bunlardır
+        monitor.stop()
+        profiler.finish({"video_id": video_id, "frames": processed_frames, "stage_seconds": job_stages.breakdown()})
+        job_stages.close()
+        # Cleanup local files
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        if os.path.exists(frames_spool_path):
+            os.remove(frames_spool_path)
+
+
+def save_resource_timeline(video_id: str, summary: Dict, timeline: List[Dict]) -> Optional[str]:
+    """Upload the job's resource samples next to its results; returns the path or None on failure"""
+    path = f"results/{video_id}/resources.json"
+    try:
+        storage.call_blocking(
+            "upload_bytes", dumps({"summary": summary, "timeline": timeline}), path, "application/json"
+        )
+        return path
+    except Exception as e:
+        logger.error(f"Could not save resource timeline for {video_id}: {str(e)}")
+        return None
+
+
+def save_results_streaming(video_id: str, analysis_data: Dict, frames_spool_path: str) -> str:
+    """Upload the analysis document and its frames without materialising them in memory.
+
+    ``analysis.json`` keeps its original shape (``frames`` included) and is
+    written to disk chunk by chunk; ``frames.ndjson`` is uploaded as well so
+    the frames endpoint can stream it straight from storage.
+    """
+    results_dir = f"results/{video_id}"
+    document_path = f"{frames_spool_path}.analysis.json"
+
+    def spooled_frames():
+        with open(frames_spool_path, "rb") as spool:
+            for line in spool:
+                yield line.rstrip(b"\n")
+
+    try:
+        with open(document_path, "wb") as document:
+            for chunk in iter_json_document(analysis_data, "frames", spooled_frames(), raw=True):
+                document.write(chunk)
+        storage.call_blocking("upload_file", frames_spool_path, f"{results_dir}/frames.ndjson")
+        storage.call_blocking("upload_file", document_path, f"{results_dir}/analysis.json")
+    finally:
+        if os.path.exists(document_path):
+            os.remove(document_path)
+    logger.info(f"Results saved: {results_dir}/analysis.json")
+    return f"{results_dir}/analysis.json"
+
+
+def process_uploaded_video(video_id: str, gcp_path: str, cancel_event=None) -> Dict:
+    """Fetch a directly uploaded video from storage and analyse it"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    file_ext = os.path.splitext(gcp_path)[1].lower()
+    temp_path = os.path.join(UPLOAD_DIR, f"{video_id}{file_ext}")
+    try:
+        check_cancelled(cancel_event)
+        storage.call_blocking("download_file", gcp_path, temp_path)
+    except Exception as e:
+        logger.error(f"Error downloading uploaded video: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return process_video(video_id, temp_path, gcp_path, cancel_event)
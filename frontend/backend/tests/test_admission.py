@@ -0,0 +1,127 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import admission
+from utils.admission import DEGRADATION_LEVELS, CapacityController, ClientRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Kova dolumu ve seviye geçişleri gerçek zamanı beklemeden ilerletilir
+    monkeypatch.setattr(admission, "time", clock)
+    return clock
+
+
+def test_token_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    assert all(bucket.try_acquire() for _ in range(5))
+    assert not bucket.try_acquire()
+    assert bucket.retry_after() == pytest.approx(0.1)
+    clock.now += 0.25
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    # Uzun beklemeden sonra en fazla burst kadar birikir
+    clock.now += 60
+    assert sum(bucket.try_acquire() for _ in range(10)) == 5
+
+
+def test_token_bucket_cost(clock):
+    bucket = TokenBucket(rate=1, burst=3)
+    assert bucket.try_acquire(cost=3)
+    assert not bucket.try_acquire(cost=3)
+    assert bucket.retry_after(cost=3) == pytest.approx(3.0)
+
+
+def test_rate_limiter_is_per_client_and_counts_rejections(clock):
+    limiter = ClientRateLimiter(rate=1, burst=2)
+    assert limiter.try_acquire("a") and limiter.try_acquire("a")
+    assert not limiter.try_acquire("a")
+    assert limiter.try_acquire("b")
+    assert limiter.rejected == 1
+    assert limiter.retry_after("a") == pytest.approx(1.0)
+    assert limiter.retry_after("unknown") == 0.0
+
+
+def test_rate_limiter_evicts_least_recently_seen_client(clock):
+    limiter = ClientRateLimiter(rate=1, burst=1, max_clients=2)
+    limiter.try_acquire("a")
+    limiter.try_acquire("b")
+    limiter.try_acquire("a")
+    limiter.try_acquire("c")
+    # "b" en eski; kovası atıldığı için yeni ve dolu kovayla başlar, "a" ise boş kalır
+    assert limiter.try_acquire("b")
+    assert not limiter.try_acquire("c")
+
+
+def make_controller():
+    return CapacityController(slo_ms=100, alpha=1.0, step_up_seconds=1.0, step_down_seconds=5.0)
+
+
+def test_capacity_steps_up_one_level_per_interval(clock):
+    controller = make_controller()
+    controller.observe(500)
+    assert controller.level == 0
+    for expected in range(1, len(DEGRADATION_LEVELS)):
+        clock.now += 1.0
+        controller.observe(500)
+        assert controller.level == expected
+        # Aynı aralıkta ikinci gözlem seviyeyi tekrar artırmaz
+        controller.observe(500)
+        assert controller.level == expected
+    clock.now += 1.0
+    controller.observe(500)
+    assert controller.profile["name"] == "reject"
+    assert controller.stats["level_changes"] == len(DEGRADATION_LEVELS) - 1
+
+
+def test_capacity_hysteresis(clock):
+    controller = make_controller()
+    clock.now += 1.0
+    controller.observe(500)
+    assert controller.level == 1
+    # Seviye değiştikten sonra düşük gecikme bile step_down_seconds dolmadan seviyeyi azaltmaz
+    clock.now += 1.0
+    controller.observe(10)
+    clock.now += 3.0
+    controller.observe(10)
+    assert controller.level == 1
+    clock.now += 1.0
+    controller.observe(10)
+    assert controller.level == 0
+    clock.now += 1.0
+    controller.observe(500)
+    assert controller.level == 1
+    # SLO ile yarısı arasındaki gecikme seviyeyi ne artırır ne azaltır
+    for _ in range(10):
+        clock.now += 10
+        controller.observe(75)
+    assert controller.level == 1
+
+
+def test_reject_level_refuses_new_clients_and_resets_when_idle(clock):
+    controller = make_controller()
+    for _ in range(len(DEGRADATION_LEVELS)):
+        clock.now += 1.0
+        controller.observe(500)
+    assert controller.profile["name"] == "reject"
+    assert not controller.admit_new()
+    assert controller.stats["rejected"] == 1
+    # Frame gelmiyorsa kuyruk boştur; seviye kendiliğinden normale döner
+    clock.now += 6.0
+    assert controller.admit_new()
+    assert controller.level == 0
+    assert controller.get_stats()["level_name"] == "normal"
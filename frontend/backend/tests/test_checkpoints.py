@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import StubYOLO, SyntheticScene
+from models.detector import ObjectDetector
+from utils.checkpoints import AnalysisCheckpoint, _decode_state, _encode_state
+from utils.local_storage import LocalStorageConnector
+from utils.serialization import dumps, loads
+from utils.storage import LocalStorageBackend
+
+
+def run(detector, frames):
+    return [detector.process_raw(detector.model._boxes(index), detector.model.names) for index in frames]
+
+
+def test_state_round_trip_keeps_types():
+    state = {1: {"positions": [(1.5, np.float32(2.25))]}, "scores": [np.float64(0.4), np.int64(3)], "n": 7}
+    restored = _decode_state(loads(dumps(_encode_state(state))))
+    assert restored == state
+    assert isinstance(restored[1]["positions"][0], tuple)
+    assert type(restored[1]["positions"][0][1]) is np.float32
+    assert type(restored["scores"][1]) is np.int64
+
+
+def test_resumed_detector_matches_uninterrupted_run(tmp_path):
+    scene = SyntheticScene(640, 480)
+    uninterrupted = run(ObjectDetector(model=StubYOLO(scene)), range(60))
+
+    storage = LocalStorageBackend(LocalStorageConnector(str(tmp_path / "bucket")))
+    checkpoint = AnalysisCheckpoint(storage, "video")
+    first = ObjectDetector(model=StubYOLO(scene))
+    run(first, range(30))
+    with open(tmp_path / "frames.ndjson", "wb") as spool:
+        spool.write(b"{}\n")
+        checkpoint.save(spool, {"fingerprint": {"size": 1}, "processed_frames": 30, "detector": first.get_state()})
+
+    state = AnalysisCheckpoint(storage, "video").load({"size": 1})
+    resumed = ObjectDetector(model=StubYOLO(scene))
+    resumed.set_state(state["detector"])
+    assert dumps(run(resumed, range(30, 60))) == dumps(uninterrupted[30:])
+
+
+def test_stale_checkpoint_is_discarded(tmp_path):
+    storage = LocalStorageBackend(LocalStorageConnector(str(tmp_path / "bucket")))
+    checkpoint = AnalysisCheckpoint(storage, "video")
+    with open(tmp_path / "frames.ndjson", "wb") as spool:
+        checkpoint.save(spool, {"fingerprint": {"size": 1}, "processed_frames": 1, "detector": {}})
+    assert checkpoint.load({"size": 2}) is None
+    assert not storage.call_blocking("blob_exists", checkpoint.state_path)
@@ -0,0 +1,47 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frame_ingest import FrameBufferPool, FrameValidationError
+
+
+class FakeRequest:
+    def __init__(self, body: bytes, content_length=None, chunk_size: int = 3):
+        self.headers = {} if content_length is None else {"content-length": content_length}
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+def read(pool, request):
+    buffer = pool.acquire()
+    return bytes(asyncio.run(pool.read_request(request, buffer)))
+
+
+def test_body_is_read_into_buffer():
+    pool = FrameBufferPool(buffer_size=16)
+    assert read(pool, FakeRequest(b"0123456789", "10")) == b"0123456789"
+    assert read(pool, FakeRequest(b"abc")) == b"abc"
+
+
+@pytest.mark.parametrize("content_length", ["abc", "10.5", "1e3", " "])
+def test_malformed_content_length_is_a_validation_error(content_length):
+    # ValueError route'un genel handler'ına düşüp 200 "Model error" dönerdi; 400 olmalı
+    with pytest.raises(FrameValidationError, match="Invalid Content-Length"):
+        read(FrameBufferPool(buffer_size=16), FakeRequest(b"0123", content_length))
+
+
+def test_oversized_body_is_rejected():
+    pool = FrameBufferPool(buffer_size=8)
+    with pytest.raises(FrameValidationError, match="too large"):
+        read(pool, FakeRequest(b"x" * 9, "9"))
+    # Başlıkta yalan söyleyen istemci de akış sırasında durdurulur
+    with pytest.raises(FrameValidationError, match="too large"):
+        read(pool, FakeRequest(b"x" * 9, "4"))
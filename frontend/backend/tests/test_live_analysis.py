@@ -0,0 +1,61 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes import live_analysis
+from utils.admission import DEGRADATION_LEVELS
+from utils.live_sessions import LiveSession
+
+
+class StubModel:
+    model_variant = "stub"
+
+    def __init__(self):
+        self.stages = None
+        self.profiles = []
+
+    def set_model_profile(self, input_size, model_path=None):
+        self.profiles.append(input_size)
+
+
+class StubProcessor:
+    def __init__(self):
+        self.model = StubModel()
+        self.shapes = []
+
+    def process_frame(self, frame):
+        self.shapes.append(frame.shape)
+        return {"detections": [{"bbox": [10, 20, 30, 40]}]}
+
+
+class FixedCapacity:
+    def __init__(self):
+        self.profile = DEGRADATION_LEVELS[0]
+
+    def observe(self, queue_ms):
+        pass
+
+
+def test_decode_scale_is_fixed_across_degradation_levels(monkeypatch):
+    capacity = FixedCapacity()
+    monkeypatch.setattr(live_analysis, "capacity", capacity)
+    processor = StubProcessor()
+    session = LiveSession(processor, "lobby", "http")
+    _, jpeg = cv2.imencode(".jpg", np.zeros((960, 1280, 3), np.uint8))
+    data = jpeg.tobytes()
+
+    boxes = []
+    for level in DEGRADATION_LEVELS + DEGRADATION_LEVELS[::-1]:
+        capacity.profile = level
+        boxes.append(live_analysis.process_in_session(session, data)["detections"][0]["bbox"])
+    session.stages.close()
+
+    # Model girişi seviyeyle küçülür ama tracker'ın gördüğü frame ölçeği değişmez
+    assert set(processor.model.profiles) == {level["input_size"] for level in DEGRADATION_LEVELS}
+    assert session.decode_factor == 2
+    assert set(processor.shapes) == {(480, 640, 3)}
+    assert all(box == [20, 40, 60, 80] for box in boxes)
@@ -0,0 +1,70 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.live_protocol import DeltaDecoder, DeltaEncoder
+
+
+def detection(track_id, x, y=50, class_name="person", confidence=0.9):
+    return {"track_id": track_id, "class_name": class_name, "bbox": [x, y, x + 40, y + 80],
+            "confidence": confidence, "anomaly_score": 0.0, "behavior": "moving"}
+
+
+def round_trip(frames, **encoder_args):
+    encoder, decoder = DeltaEncoder(**encoder_args), DeltaDecoder()
+    decoded = None
+    for frame_number, detections in enumerate(frames):
+        decoded = decoder.decode(encoder.encode(frame_number, detections))
+    return {d["track_id"]: d for d in decoded["detections"]}
+
+
+def test_slow_motion_accumulates_between_keyframes():
+    # 2 px/frame hiçbir frame'de eşiği aşmaz; çözülen konum sunucudan en fazla eşik kadar sapmalı
+    frames = [[detection(1, 100 + 2 * i)] for i in range(29)]
+    tracks = round_trip(frames, keyframe_interval=1000, move_threshold=2)
+    assert abs(tracks[1]["bbox"][0] - frames[-1][0]["bbox"][0]) <= 2
+
+
+def test_decoder_matches_encoder_every_frame():
+    encoder, decoder = DeltaEncoder(keyframe_interval=10, move_threshold=3), DeltaDecoder()
+    for i in range(60):
+        detections = [detection(1, 100 + i), detection(2, 300 - 0.5 * i, class_name="car")]
+        if 20 <= i < 30:
+            detections.append(detection(3, 500, confidence=0.5 + i / 100))
+        tracks = {d["track_id"]: d for d in decoder.decode(encoder.encode(i, detections))["detections"]}
+        assert set(tracks) == {d["track_id"] for d in detections}
+        for d in detections:
+            assert abs(tracks[d["track_id"]]["bbox"][0] - int(d["bbox"][0])) <= 3
+            assert tracks[d["track_id"]]["class_name"] == d["class_name"]
+            assert abs(tracks[d["track_id"]]["confidence"] - d["confidence"]) <= 0.06
+
+
+def test_removed_track_is_sent_again_when_it_returns():
+    frames = [[detection(1, 100), detection(2, 200)], [detection(1, 100)], [detection(1, 100), detection(2, 201)]]
+    tracks = round_trip(frames, keyframe_interval=1000)
+    assert set(tracks) == {1, 2}
+    assert tracks[2]["bbox"][0] == 201
+
+
+def test_unchanged_tracks_are_not_resent():
+    encoder = DeltaEncoder(keyframe_interval=1000)
+    first = encoder.encode(0, [detection(1, 100)])
+    second = encoder.encode(1, [detection(1, 101)])
+    assert len(second) < len(first)
+
+
+def test_header_carries_degradation_level_and_counters():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoded = decoder.decode(encoder.encode(
+        7, [detection(1, 100)], latency_ms=12.5, dropped_frames=2,
+        degradation_level=3, skipped_frames=70000, rate_limited_frames=5
+    ))
+    assert decoded["frame_number"] == 7
+    assert decoded["latency_ms"] == 12.5
+    assert decoded["dropped_frames"] == 2
+    assert decoded["degradation_level"] == 3
+    # Toplamlar uint32; 16 bite sığmayan değerler de kaybolmaz
+    assert decoded["skipped_frames"] == 70000
+    assert decoded["rate_limited_frames"] == 5
+    assert [d["track_id"] for d in decoded["detections"]] == [1]
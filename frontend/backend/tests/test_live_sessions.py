@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.live_sessions import LiveSessionManager, SessionLimitError
+
+
+def make_manager(**kwargs):
+    return LiveSessionManager(lambda: object(), **kwargs)
+
+
+def test_tokenless_requests_share_one_session_per_key():
+    manager = make_manager(max_sessions=4)
+    sessions = [manager.get_or_create_keyed("host:10.0.0.1", "10.0.0.1") for _ in range(26)]
+    assert len({s.token for s in sessions}) == 1
+    assert manager.get_or_create_keyed("camera:lobby", "lobby") is not sessions[0]
+    assert manager.get_stats()["active"] == 2
+
+
+def test_closed_keyed_session_is_replaced():
+    manager = make_manager()
+    first = manager.get_or_create_keyed("camera:lobby")
+    manager.close(first)
+    second = manager.get_or_create_keyed("camera:lobby")
+    assert second is not first
+    assert manager.get(first.token) is None
+    assert manager.get(second.token) is second
+
+
+def test_idle_keyed_session_is_evicted():
+    manager = make_manager(idle_timeout=0.0)
+    first = manager.get_or_create_keyed("camera:lobby")
+    first.last_seen -= 1
+    assert manager.evict_idle() == 1
+    assert manager.get_or_create_keyed("camera:lobby") is not first
+
+
+def test_limit_still_applies_to_tokened_sessions():
+    manager = make_manager(max_sessions=2)
+    manager.create("a")
+    manager.get_or_create_keyed("camera:b")
+    with pytest.raises(SessionLimitError):
+        manager.create("c")
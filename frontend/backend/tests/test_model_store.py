@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import hashlib
+import multiprocessing
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import model_store as model_store_module
+from utils.model_store import ModelCacheError, ModelStore
+
+WEIGHTS = b"weights v1" * 100
+OTHER = b"weights v2" * 100
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class StubSource:
+    """Writes the next queued payload; records every call"""
+
+    def __init__(self, *payloads):
+        self.payloads = list(payloads)
+        self.calls = 0
+
+    def __call__(self, name, destination):
+        self.calls += 1
+        data = self.payloads[min(self.calls, len(self.payloads)) - 1]
+        with open(destination, "wb") as f:
+            f.write(data)
+
+
+def installed_files(root):
+    """Files under the cache other than the manifest and lock files"""
+    found = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name == "manifest.json" or name.endswith(".lock"):
+                continue
+            found.append(os.path.relpath(os.path.join(directory, name), root))
+    return found
+
+
+@pytest.fixture(autouse=True)
+def no_pinned_env(monkeypatch):
+    monkeypatch.delenv("MODEL_SHA256_STUB", raising=False)
+
+
+def test_fetch_installs_verified_version(tmp_path):
+    source = StubSource(WEIGHTS)
+    store = ModelStore(str(tmp_path), sources=[("stub", source)])
+    path = store.fetch("stub")
+    assert path == os.path.join(str(tmp_path), "stub", sha256(WEIGHTS)[:16], "stub.pt")
+    with open(path, "rb") as f:
+        assert f.read() == WEIGHTS
+    entry = store.manifest()["models"]["stub"]
+    assert entry["pinned_sha256"] == sha256(WEIGHTS)
+    assert entry["current"] == sha256(WEIGHTS)[:16]
+    assert installed_files(str(tmp_path)) == [os.path.join("stub", sha256(WEIGHTS)[:16], "stub.pt")]
+
+
+def test_checksum_mismatch_raises_and_installs_nothing(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_SHA256_STUB", sha256(OTHER))
+    store = ModelStore(str(tmp_path), sources=[("stub", StubSource(WEIGHTS))])
+    with pytest.raises(ModelCacheError, match="Checksum mismatch"):
+        store.fetch("stub")
+    # Doğrulanmayan dosya ne sürüm dizinine ne de manifeste girer; geçici dizin de kalmaz
+    assert installed_files(str(tmp_path)) == []
+    assert [d for d in os.listdir(tmp_path) if d.startswith(".stub-")] == []
+    assert store.manifest()["models"] == {}
+    assert store.cached("stub") is None
+
+
+def test_redownload_is_checked_against_pinned_sha256(tmp_path):
+    source = StubSource(WEIGHTS, OTHER, WEIGHTS)
+    store = ModelStore(str(tmp_path), sources=[("stub", source)])
+    path = store.fetch("stub")
+    os.remove(path)
+
+    # Aynı ad altında farklı içerik gelirse ilk indirilen sürüme sabitlenmiş checksum reddeder
+    with pytest.raises(ModelCacheError, match=sha256(WEIGHTS)):
+        store.fetch("stub")
+    assert store.cached("stub") is None
+    assert store.fetch("stub") == path
+    assert source.calls == 3
+    assert store.manifest()["models"]["stub"]["pinned_sha256"] == sha256(WEIGHTS)
+
+
+def test_size_mismatch_triggers_refetch(tmp_path):
+    source = StubSource(WEIGHTS)
+    store = ModelStore(str(tmp_path), sources=[("stub", source)])
+    path = store.fetch("stub")
+    with open(path, "ab") as f:
+        f.write(b"truncated download or disk corruption")
+
+    assert store.cached("stub") is None
+    assert store.fetch("stub") == path
+    assert source.calls == 2
+    with open(path, "rb") as f:
+        assert f.read() == WEIGHTS
+
+
+def test_second_fetch_does_no_io(tmp_path, monkeypatch):
+    source = StubSource(WEIGHTS)
+    store = ModelStore(str(tmp_path), sources=[("stub", source)])
+    path = store.fetch("stub")
+
+    def no_hashing(path):
+        raise AssertionError("warm fetch must not re-hash the weights")
+
+    def no_lock(path, timeout=None):
+        raise AssertionError("warm fetch must not take the download lock")
+
+    monkeypatch.setattr(model_store_module, "file_sha256", no_hashing)
+    monkeypatch.setattr(model_store_module, "file_lock", no_lock)
+    assert store.fetch("stub") == path
+    assert ModelStore(str(tmp_path), sources=[("stub", source)]).fetch("stub") == path
+    assert source.calls == 1
+
+
+def _slow_source(calls_path):
+    def fetch(name, destination):
+        with open(calls_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        # Diğer süreç bu sırada kilidi beklemeli
+        time.sleep(0.5)
+        with open(destination, "wb") as f:
+            f.write(WEIGHTS)
+    return fetch
+
+
+def _fetch_in_process(root, calls_path, results):
+    store = ModelStore(root, sources=[("slow", _slow_source(calls_path))])
+    results.put(store.fetch("stub"))
+
+
+@pytest.mark.skipif(model_store_module.fcntl is None, reason="needs flock")
+def test_processes_share_one_download(tmp_path):
+    calls_path = str(tmp_path / "calls.txt")
+    root = str(tmp_path / "cache")
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_fetch_in_process, args=(root, calls_path, results)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    paths = [results.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    assert len(set(paths)) == 1
+    with open(calls_path) as f:
+        assert len(f.read().split()) == 1
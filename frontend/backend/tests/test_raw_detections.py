@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.raw_detections import RawDetectionRecorder, RawDetections
+
+
+def make_frames(count, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for index in range(count):
+        # Boş frame'ler (None ve sıfır kutu) da kayıtta yer tutar
+        if index % 7 == 3:
+            frames.append(None)
+            continue
+        frames.append(rng.random((int(rng.integers(0, 9)), 6), dtype=np.float32))
+    return frames
+
+
+def test_recorder_grows_past_initial_capacity(tmp_path):
+    frames = make_frames(200)
+    recorder = RawDetectionRecorder(expected_frames=1, initial_boxes=2)
+    for raw in frames:
+        recorder.append(raw)
+    recorder.names = {0: "person"}
+    detections = recorder.build({"frames": len(frames)})
+
+    assert len(recorder) == len(detections) == len(frames)
+    for index, raw in enumerate(frames):
+        expected = raw if raw is not None else np.zeros((0, 6), np.float32)
+        np.testing.assert_array_equal(detections.frame(index), expected)
+
+    path = tmp_path / "raw.npz"
+    path.write_bytes(detections.to_bytes())
+    loaded = RawDetections.load(str(path))
+    assert loaded.names == {0: "person"}
+    np.testing.assert_array_equal(loaded.boxes, detections.boxes)
+    np.testing.assert_array_equal(loaded.offsets, detections.offsets)
+
+
+def test_empty_recorder_builds_empty_detections():
+    detections = RawDetectionRecorder().build({})
+    assert len(detections) == 0
+    assert detections.boxes.shape == (0, 6)
+    assert detections.boxes.dtype == np.float32
@@ -0,0 +1,66 @@
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.readiness import StartupState
+
+
+def flaky_step(failures, details=None):
+    calls = {"n": 0}
+
+    async def step():
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise ConnectionError(f"transient failure {calls['n']}")
+        return details
+
+    return step, calls
+
+
+def test_transient_failure_is_retried_until_ready():
+    state = StartupState(retry_initial=0.001, retry_max=0.004)
+    storage, storage_calls = flaky_step(3, {"bucket": "test"})
+    model, model_calls = flaky_step(0)
+    asyncio.run(state.run([("storage", storage), ("model", model)]))
+
+    assert state.ready
+    assert state.ready_seconds is not None
+    assert storage_calls["n"] == 4
+    assert model_calls["n"] == 1
+    assert state.steps["storage"]["status"] == "done"
+    assert state.steps["storage"]["attempts"] == 4
+    assert state.steps["storage"]["bucket"] == "test"
+
+
+def test_step_reports_retrying_while_it_fails():
+    state = StartupState(retry_initial=0.05, retry_max=0.05)
+    step, _ = flaky_step(10 ** 6)
+
+    async def probe():
+        task = asyncio.create_task(state.run([("storage", step)]))
+        await asyncio.sleep(0.12)
+        snapshot = state.snapshot()
+        task.cancel()
+        return snapshot
+
+    snapshot = asyncio.run(probe())
+    # Geçici hata hazır olmayı geciktirir ama süreci kalıcı olarak "failed" yapmaz
+    assert snapshot["status"] == "starting"
+    assert snapshot["steps"]["storage"]["status"] == "retrying"
+    assert snapshot["steps"]["storage"]["attempts"] >= 2
+    assert "transient failure" in snapshot["steps"]["storage"]["error"]
+
+
+def test_max_attempts_makes_failure_final():
+    state = StartupState(retry_initial=0.001, retry_max=0.001, max_attempts=2)
+    step, calls = flaky_step(5)
+    later, later_calls = flaky_step(0)
+    asyncio.run(state.run([("storage", step), ("model", later)]))
+
+    assert state.status == "failed"
+    assert calls["n"] == 2
+    assert later_calls["n"] == 0
+    assert state.steps["storage"]["status"] == "failed"
+    assert state.steps["storage"]["attempts"] == 2
@@ -0,0 +1,70 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.local_storage import LocalStorageConnector
+from utils.results_cache import ResultsCache
+from utils.storage import LocalStorageBackend, PreconditionFailedError
+
+PATH = "results/video/analysis.json"
+
+
+class RacingStorage:
+    """Rewrites the blob between ``get_metadata`` and ``download_bytes`` for the first ``races`` downloads"""
+
+    def __init__(self, storage, races):
+        self.storage = storage
+        self.races = races
+        self.downloads = 0
+
+    async def get_metadata(self, path):
+        return await self.storage.get_metadata(path)
+
+    async def download_bytes(self, path, **kwargs):
+        self.downloads += 1
+        if self.downloads <= self.races:
+            await self.storage.upload_bytes(f'{{"version": {self.downloads + 1}}}'.encode(), path, "application/json")
+        return await self.storage.download_bytes(path, **kwargs)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorageBackend(LocalStorageConnector(str(tmp_path)))
+    asyncio.run(storage.upload_bytes(b'{"version": 1}', PATH, "application/json"))
+    return storage
+
+
+def test_concurrent_write_is_not_cached_under_old_etag(storage):
+    cache = ResultsCache()
+    racing = RacingStorage(storage, races=1)
+    body, etag = asyncio.run(cache.get(racing, PATH))
+    metadata = asyncio.run(storage.get_metadata(PATH))
+    # Dönen gövde ve ETag aynı generation'a ait olmalı
+    assert body == b'{"version": 2}'
+    assert etag == cache.make_etag(metadata["generation"])
+    assert racing.downloads == 2
+
+    cached, cached_etag = asyncio.run(cache.get(storage, PATH))
+    assert cached == b'{"version": 2}'
+    assert cached_etag == etag
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_persistent_races_give_up(storage):
+    cache = ResultsCache()
+    with pytest.raises(PreconditionFailedError):
+        asyncio.run(cache.get(RacingStorage(storage, races=10), PATH))
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_not_modified_and_missing(storage):
+    cache = ResultsCache()
+    body, etag = asyncio.run(cache.get(storage, PATH))
+    assert body == b'{"version": 1}'
+    assert asyncio.run(cache.get(storage, PATH, if_none_match=etag)) == (None, etag)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(cache.get(storage, "results/missing/analysis.json"))
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import job_scheduler
+from utils.thread_budget import ThreadBudget
+
+
+@pytest.fixture(autouse=True)
+def process_mode(monkeypatch):
+    monkeypatch.setattr(job_scheduler, "ANALYSIS_WORKER_MODE", "process")
+    for role in ("API", "INFERENCE", "ANALYSIS", "RESCORE"):
+        for prefix in ("CPUS_", "THREADS_", "THREAD_WEIGHT_"):
+            monkeypatch.delenv(prefix + role, raising=False)
+
+
+def budget(cpus, api, analysis, inference=0):
+    return ThreadBudget(cpus=list(range(cpus)), api_workers=api, analysis_workers=analysis,
+                        inference_workers=inference, enabled=True)
+
+
+def test_roles_share_the_cpus_instead_of_each_taking_all():
+    plan = budget(8, api=4, analysis=1)
+    assert plan.shares == {"api": 4, "analysis": 4}
+    assert plan.planned_threads() == 8
+
+
+@pytest.mark.parametrize("cpus", [1, 2, 4, 8, 16, 32, 64])
+@pytest.mark.parametrize("api,analysis,inference", [(1, 1, 0), (2, 1, 0), (4, 2, 0), (4, 1, 2), (2, 2, 4), (4, 0, 0)])
+def test_plan_never_exceeds_cpus_when_processes_fit(cpus, api, analysis, inference):
+    plan = budget(cpus, api, analysis, inference)
+    processes = api + api * analysis + inference
+    if processes <= cpus:
+        assert plan.planned_threads() <= cpus
+        assert not plan.snapshot()["oversubscribed"]
+    else:
+        # Her süreç en az bir thread alır; fazlası planlanmaz
+        assert plan.planned_threads() == processes
+        assert plan.snapshot()["oversubscribed"]
+
+
+def test_reviewed_configuration_is_flagged():
+    # 8 CPU, 4 API worker, worker başına 2 analiz süreci: 12 süreç
+    plan = budget(8, api=4, analysis=2)
+    assert all(plan.role(role).threads == 1 for role in ("api", "analysis"))
+    assert plan.snapshot()["oversubscribed"]
+
+
+def test_inference_processes_take_the_spare_cpus():
+    plan = budget(16, api=4, analysis=1, inference=2)
+    assert plan.role("api").threads == 1
+    assert plan.shares["inference"] + plan.shares["analysis"] + plan.shares["api"] == 16
+    assert plan.role("inference").threads > plan.role("analysis").threads
+
+
+def test_pinned_role_keeps_its_cpus(monkeypatch):
+    monkeypatch.setenv("CPUS_INFERENCE", "0-5")
+    plan = budget(8, api=2, analysis=0, inference=2)
+    assert plan.role("inference").threads == 3
+    assert plan.role("inference").cpus_for(1) == [3, 4, 5]
+    assert plan.shares["api"] == 2
+
+
+def test_weights_shift_spare_cpus(monkeypatch):
+    monkeypatch.setenv("THREAD_WEIGHT_ANALYSIS", "3")
+    plan = budget(16, api=2, analysis=1)
+    assert plan.shares == {"api": 5, "analysis": 11}
+    assert plan.planned_threads() <= 16
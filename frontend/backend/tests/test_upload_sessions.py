@@ -0,0 +1,63 @@
+import os
+import sys
+import uuid
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import upload_sessions as upload_sessions_module
+from utils.local_storage import LocalStorageConnector
+from utils.storage import LocalStorageBackend, PreconditionFailedError
+from utils.upload_sessions import UploadSessionStore, verify_push_request
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadSessionStore(LocalStorageBackend(LocalStorageConnector(str(tmp_path))))
+
+
+def test_record_is_shared_through_storage(store, tmp_path):
+    video_id = str(uuid.uuid4())
+    asyncio.run(store.create(video_id, {"status": "pending", "gcp_path": f"videos/{video_id}.mp4"}))
+    # Başka bir worker aynı bucket'ı kendi bağlantısıyla okur
+    other = UploadSessionStore(LocalStorageBackend(LocalStorageConnector(str(tmp_path))))
+    record, _ = asyncio.run(other.get(video_id))
+    assert record["gcp_path"] == f"videos/{video_id}.mp4"
+    with pytest.raises(PreconditionFailedError):
+        asyncio.run(other.create(video_id, {"status": "pending"}))
+
+
+def test_only_one_claim_wins(store):
+    video_id = str(uuid.uuid4())
+
+    async def race():
+        await store.create(video_id, {"status": "pending"})
+        # Callback ile bildirim aynı generation'ı okur, ikisi de tamamlamaya çalışır
+        reads = [await store.get(video_id) for _ in range(2)]
+        return [await store.claim(video_id, record, generation, status="completed") for record, generation in reads]
+
+    assert asyncio.run(race()) == [True, False]
+    assert asyncio.run(store.get(video_id))[0]["status"] == "completed"
+
+
+def test_missing_session(store):
+    assert asyncio.run(store.get(str(uuid.uuid4()))) is None
+
+
+def test_video_id_for_object_paths():
+    video_id = str(uuid.uuid4())
+    assert UploadSessionStore.video_id_for(f"videos/2026/10/19/{video_id}.mp4") == video_id
+    assert UploadSessionStore.video_id_for("results/abc/analysis.json") is None
+    assert UploadSessionStore.video_id_for(None) is None
+
+
+def test_push_requires_configured_secret(monkeypatch):
+    monkeypatch.setattr(upload_sessions_module, "UPLOAD_NOTIFICATION_TOKEN", None)
+    monkeypatch.setattr(upload_sessions_module, "UPLOAD_NOTIFICATION_AUDIENCE", None)
+    assert verify_push_request(None, None) is not None
+    monkeypatch.setattr(upload_sessions_module, "UPLOAD_NOTIFICATION_TOKEN", "s3cret")
+    assert verify_push_request(None, "s3cret") is None
+    assert verify_push_request(None, "wrong") is not None
+    assert verify_push_request("Bearer x", None) is not None
@@ -0,0 +1,175 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import worker as worker_module
+from utils import work_queue as work_queue_module
+from utils.job_scheduler import JobCancelled
+from utils.work_queue import SQLiteWorkQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Kira süreleri gerçek zamanı beklemeden ilerletilir
+    monkeypatch.setattr(work_queue_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / "queue.db"))
+
+
+def test_expired_lease_requeues_job(queue, clock):
+    queue.enqueue("job", "task", {"n": 1})
+    assert queue.claim("w1", lease_seconds=10)["id"] == "job"
+    assert queue.claim("w2", lease_seconds=10) is None
+
+    clock.now += 11
+    job = queue.claim("w2", lease_seconds=10)
+    assert job["id"] == "job"
+    assert job["worker_id"] == "w2"
+    assert job["attempts"] == 2
+    # Kirasını kaybeden worker işi artık güncelleyemez
+    assert not queue.heartbeat("job", "w1")
+    assert not queue.complete("job", "w1", {"ok": True})
+    assert queue.complete("job", "w2", {"ok": True})
+    assert queue.get("job")["result"] == {"ok": True}
+
+
+def test_heartbeat_extends_lease(queue, clock):
+    queue.enqueue("job", "task", {})
+    queue.claim("w1", lease_seconds=10)
+    clock.now += 8
+    assert queue.heartbeat("job", "w1", lease_seconds=10)
+    clock.now += 8
+    assert queue.claim("w2", lease_seconds=10) is None
+    assert queue.get("job")["worker_id"] == "w1"
+
+
+def test_expired_lease_fails_after_max_attempts(queue, clock):
+    queue.enqueue("job", "task", {}, max_attempts=2)
+    for _ in range(2):
+        assert queue.claim("w1", lease_seconds=10)["id"] == "job"
+        clock.now += 11
+    assert queue.claim("w1", lease_seconds=10) is None
+    job = queue.get("job")
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert "Lease expired after 2 attempts" in job["error"]
+
+
+def test_fail_retries_until_max_attempts(queue, clock):
+    queue.enqueue("job", "task", {}, max_attempts=3)
+    for attempt in range(1, 4):
+        job = queue.claim("w1")
+        assert job["attempts"] == attempt
+        assert queue.fail("job", "w1", f"error {attempt}", retry=True)
+    job = queue.get("job")
+    assert job["status"] == "failed"
+    assert job["error"] == "error 3"
+    assert queue.claim("w1") is None
+
+
+def test_fail_without_retry_is_final(queue, clock):
+    queue.enqueue("job", "task", {}, max_attempts=3)
+    queue.claim("w1")
+    assert queue.fail("job", "w1", "bad input", retry=False)
+    assert queue.get("job")["status"] == "failed"
+    assert not queue.fail("job", "w1", "again")
+
+
+def test_cancel_queued_job(queue, clock):
+    queue.enqueue("job", "task", {})
+    assert queue.cancel("job")
+    assert queue.get("job")["status"] == "cancelled"
+    assert queue.claim("w1") is None
+    assert not queue.cancel("job")
+    # İptal edilen iş aynı id ile yeniden kuyruğa alınabilir
+    assert queue.enqueue("job", "task", {})["status"] == "queued"
+
+
+def test_cancel_running_job(queue, clock):
+    queue.enqueue("job", "task", {})
+    queue.claim("w1")
+    assert queue.cancel("job")
+    assert queue.get("job")["status"] == "running"
+    assert queue.is_cancel_requested("job")
+    # Worker durduğunda yeniden deneme istese bile iş iptal edilmiş sayılır
+    assert queue.fail("job", "w1", "Job cancelled", retry=True)
+    assert queue.get("job")["status"] == "cancelled"
+
+
+def test_cancel_requested_job_with_expired_lease_is_cancelled(queue, clock):
+    queue.enqueue("job", "task", {})
+    queue.claim("w1", lease_seconds=10)
+    queue.cancel("job")
+    clock.now += 11
+    assert queue.claim("w2") is None
+    assert queue.get("job")["status"] == "cancelled"
+
+
+def test_enqueue_rejects_active_job(queue, clock):
+    queue.enqueue("job", "task", {})
+    with pytest.raises(ValueError):
+        queue.enqueue("job", "task", {})
+
+
+def make_worker(queue, monkeypatch, task):
+    monkeypatch.setattr(worker_module, "load_tasks", lambda: {"task": task})
+    return worker_module.Worker(queue, "w1", lease_seconds=0.3, poll_interval=0.01)
+
+
+def test_worker_stops_cancelled_job(queue, monkeypatch):
+    started = threading.Event()
+
+    def task(cancel_event):
+        started.set()
+        if cancel_event.wait(10):
+            raise JobCancelled()
+        return {"ok": True}
+
+    worker = make_worker(queue, monkeypatch, task)
+    queue.enqueue("job", "task", {})
+    thread = threading.Thread(target=worker.run, kwargs={"once": True})
+    thread.start()
+    assert started.wait(5)
+    queue.cancel("job")
+    thread.join(5)
+    assert not thread.is_alive()
+    assert queue.get("job")["status"] == "cancelled"
+
+
+def test_worker_requeues_job_on_shutdown(queue, monkeypatch):
+    started = threading.Event()
+
+    def task(cancel_event):
+        started.set()
+        if cancel_event.wait(10):
+            raise JobCancelled()
+        return {"ok": True}
+
+    worker = make_worker(queue, monkeypatch, task)
+    queue.enqueue("job", "task", {})
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    assert started.wait(5)
+    worker.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    job = queue.get("job")
+    assert job["status"] == "queued"
+    assert job["error"] == "Worker shut down"
@@ -0,0 +1,160 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from utils.frame_ingest import MODEL_INPUT_SIZE
+
+logger = logging.getLogger(__name__)
+
+LIVE_CLIENT_FPS = float(os.getenv("LIVE_CLIENT_FPS", "10"))
+LIVE_CLIENT_BURST = float(os.getenv("LIVE_CLIENT_BURST", "20"))
+LIVE_QUEUE_SLO_MS = float(os.getenv("LIVE_QUEUE_SLO_MS", "250"))
+LIVE_LIGHT_MODEL_PATH = os.getenv("LIVE_LIGHT_MODEL_PATH")
+
+# Sırayla uygulanan kademeler: önce çözünürlük, sonra hafif model, sonra frame atlama, en son red
+DEGRADATION_LEVELS: List[Dict[str, Any]] = [
+    {"name": "normal", "input_size": MODEL_INPUT_SIZE, "model_path": None, "frame_stride": 1, "admit_new": True},
+    {"name": "reduced_resolution", "input_size": 416, "model_path": None, "frame_stride": 1, "admit_new": True},
+    {"name": "light_model", "input_size": 320, "model_path": LIVE_LIGHT_MODEL_PATH, "frame_stride": 1, "admit_new": True},
+    {"name": "frame_skip", "input_size": 320, "model_path": LIVE_LIGHT_MODEL_PATH, "frame_stride": 3, "admit_new": True},
+    {"name": "reject", "input_size": 320, "model_path": LIVE_LIGHT_MODEL_PATH, "frame_stride": 3, "admit_new": False},
+]
+
+
+class TokenBucket:
+    """Classic token bucket; ``rate`` tokens per second up to ``burst``"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def retry_after(self, cost: float = 1.0) -> float:
+        return max(0.0, (cost - self.tokens) / self.rate) if self.rate > 0 else 60.0
+
+
+class ClientRateLimiter:
+    """Per-client token buckets, bounded to the most recently seen clients"""
+
+    def __init__(self, rate: float = LIVE_CLIENT_FPS, burst: float = LIVE_CLIENT_BURST, max_clients: int = 4096):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def try_acquire(self, client_key: str, cost: float = 1.0) -> bool:
+        with self._lock:
+            bucket = self._buckets.get(client_key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[client_key] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_key)
+            allowed = bucket.try_acquire(cost)
+            if not allowed:
+                self.rejected += 1
+            return allowed
+
+    def retry_after(self, client_key: str, cost: float = 1.0) -> float:
+        with self._lock:
+            bucket = self._buckets.get(client_key)
+            return bucket.retry_after(cost) if bucket is not None else 0.0
+
+
+class CapacityController:
+    """Global degradation level driven by the queueing delay of live frames.
+
+    Every processed frame reports how long it waited before inference
+    started. When the smoothed delay stays above ``slo_ms`` the level steps
+    up (cheaper inference, then fewer frames, then refusing new clients);
+    it steps back down once the delay falls below half the SLO. Step-downs
+    wait longer than step-ups so the level does not oscillate.
+    """
+
+    def __init__(self, slo_ms: float = LIVE_QUEUE_SLO_MS, levels: List[Dict[str, Any]] = None,
+                 alpha: float = 0.2, step_up_seconds: float = 1.0, step_down_seconds: float = 5.0):
+        self.slo_ms = slo_ms
+        self.levels = levels or DEGRADATION_LEVELS
+        self.alpha = alpha
+        self.step_up_seconds = step_up_seconds
+        self.step_down_seconds = step_down_seconds
+        self.level = 0
+        self.queue_delay_ms = 0.0
+        self._changed_at = time.monotonic()
+        self._observed_at = self._changed_at
+        self._lock = threading.Lock()
+        self.stats = {"observed": 0, "level_changes": 0, "rejected": 0}
+
+    @property
+    def profile(self) -> Dict[str, Any]:
+        return self.levels[self.level]
+
+    def observe(self, queue_ms: float):
+        with self._lock:
+            self.stats["observed"] += 1
+            self._observed_at = time.monotonic()
+            self.queue_delay_ms += self.alpha * (queue_ms - self.queue_delay_ms)
+            now = time.monotonic()
+            elapsed = now - self._changed_at
+            if self.queue_delay_ms > self.slo_ms and elapsed >= self.step_up_seconds:
+                new_level = min(self.level + 1, len(self.levels) - 1)
+            elif self.queue_delay_ms < self.slo_ms / 2 and elapsed >= self.step_down_seconds:
+                new_level = max(self.level - 1, 0)
+            else:
+                return
+            if new_level != self.level:
+                logger.warning(
+                    f"Live degradation level {self.levels[self.level]['name']} -> "
+                    f"{self.levels[new_level]['name']} (queue delay {self.queue_delay_ms:.0f}ms)"
+                )
+                self.level = new_level
+                self.stats["level_changes"] += 1
+            self._changed_at = now
+
+    def _reset_if_idle(self):
+        # Hiç frame işlenmiyorsa kuyruk boştur; "reject" seviyesinde takılı kalma
+        with self._lock:
+            if self.level and time.monotonic() - self._observed_at > self.step_down_seconds:
+                logger.info(f"Live degradation level {self.profile['name']} -> normal (idle)")
+                self.level = 0
+                self.queue_delay_ms = 0.0
+                self.stats["level_changes"] += 1
+                self._changed_at = time.monotonic()
+
+    def admit_new(self) -> bool:
+        """Whether a new client may start a session at the current level"""
+        self._reset_if_idle()
+        if self.profile["admit_new"]:
+            return True
+        with self._lock:
+            self.stats["rejected"] += 1
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._reset_if_idle()
+        with self._lock:
+            return {
+                **self.stats,
+                "level": self.level,
+                "level_name": self.profile["name"],
+                "queue_delay_ms": round(self.queue_delay_ms, 2),
+                "slo_ms": self.slo_ms,
+                "profile": self.profile
+            }
@@ -0,0 +1,134 @@
+import os
+import time
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CHECKPOINT_FRAMES = int(os.getenv("ANALYSIS_CHECKPOINT_FRAMES", "900"))
+CHECKPOINT_PREFIX = "checkpoints"
+CHECKPOINT_VERSION = 2
+
+
+def _encode_state(value: Any) -> Any:
+    """Tag what JSON would change: NumPy scalars keep their dtype, tuples and non-string keys their type"""
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _encode_state(item) for key, item in value.items()}
+        return {"__items__": [[_encode_state(key), _encode_state(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [_encode_state(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode_state(item) for item in value]}
+    if isinstance(value, np.generic):
+        # float32.item() float64'e tam çevrilir; geri okunurken aynı bitler elde edilir
+        return {"__numpy__": value.dtype.str, "value": value.item()}
+    return value
+
+
+def _decode_state(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode_state(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__items__" in value:
+        return {_decode_state(key): _decode_state(item) for key, item in value["__items__"]}
+    if "__tuple__" in value:
+        return tuple(_decode_state(item) for item in value["__tuple__"])
+    if "__numpy__" in value:
+        return np.dtype(value["__numpy__"]).type(value["value"])
+    return {key: _decode_state(item) for key, item in value.items()}
+
+
+class AnalysisCheckpoint:
+    """Periodic, resumable progress of one video analysis kept in storage.
+
+    Each checkpoint uploads the frame results written since the previous one
+    as a new segment, then overwrites ``state.json`` with the frame index,
+    counters and the detector's tracker state. Segments are uploaded before
+    the state that references them, so a crash between the two only loses
+    the newest segment. Checkpoints live in storage rather than on the
+    worker's disk so a retry on another node can resume too. The state is
+    JSON with NumPy scalars, tuples and integer keys tagged, so a resumed
+    run sees the same values and types as an uninterrupted one.
+    """
+
+    def __init__(self, storage, video_id: str, interval: int = ANALYSIS_CHECKPOINT_FRAMES):
+        self.storage = storage
+        self.video_id = video_id
+        self.interval = interval
+        self.prefix = f"{CHECKPOINT_PREFIX}/{video_id}"
+        self.segments = 0
+        self._spool_offset = 0
+
+    @property
+    def state_path(self) -> str:
+        return f"{self.prefix}/state.json"
+
+    def segment_path(self, index: int) -> str:
+        return f"{self.prefix}/segment-{index:05d}.ndjson"
+
+    def due(self, processed_frames: int) -> bool:
+        return self.interval > 0 and processed_frames > 0 and processed_frames % self.interval == 0
+
+    def load(self, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the last checkpoint for this video, or None if absent or for different input"""
+        try:
+            if not self.storage.call_blocking("blob_exists", self.state_path):
+                return None
+            state = _decode_state(loads(self.storage.call_blocking("download_bytes", self.state_path)))
+        except Exception as e:
+            logger.error(f"Could not read checkpoint for {self.video_id}, starting over: {str(e)}")
+            return None
+        if state.get("version") != CHECKPOINT_VERSION or state.get("fingerprint") != fingerprint:
+            logger.warning(f"Discarding stale checkpoint for {self.video_id}")
+            self.clear(state.get("segments", 0))
+            return None
+        return state
+
+    def restore_spool(self, state: Dict[str, Any], spool_path: str):
+        """Rebuild the local frames spool from uploaded segments"""
+        part_path = f"{spool_path}.part"
+        with open(spool_path, "wb") as spool:
+            for index in range(state["segments"]):
+                self.storage.call_blocking("download_file", self.segment_path(index), part_path)
+                with open(part_path, "rb") as part:
+                    while True:
+                        chunk = part.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        spool.write(chunk)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        self.segments = state["segments"]
+        self._spool_offset = os.path.getsize(spool_path)
+
+    def save(self, spool, state: Dict[str, Any]):
+        """Upload frames written since the last checkpoint, then the state that covers them"""
+        started = time.time()
+        spool.flush()
+        end = spool.tell()
+        with open(spool.name, "rb") as source:
+            source.seek(self._spool_offset)
+            segment = source.read(end - self._spool_offset)
+        self.storage.call_blocking("upload_bytes", segment, self.segment_path(self.segments), "application/x-ndjson")
+        state = {**state, "version": CHECKPOINT_VERSION, "segments": self.segments + 1}
+        self.storage.call_blocking("upload_bytes", dumps(_encode_state(state)), self.state_path, "application/json")
+        self.segments += 1
+        self._spool_offset = end
+        logger.info(
+            f"Checkpoint {self.segments} for {self.video_id} at frame {state['processed_frames']} "
+            f"({time.time() - started:.2f}s)"
+        )
+
+    def clear(self, segments: Optional[int] = None):
+        """Remove the checkpoint once the analysis finished or was cancelled"""
+        try:
+            self.storage.call_blocking("delete_blob", self.state_path)
+            for index in range(self.segments if segments is None else segments):
+                self.storage.call_blocking("delete_blob", self.segment_path(index))
+        except Exception as e:
+            logger.warning(f"Could not remove checkpoint for {self.video_id}: {str(e)}")
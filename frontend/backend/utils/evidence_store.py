@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_PREFIX = "evidence"
+THUMBNAIL_SIZES = (160, 320, 640)
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "webp": "image/webp"
+}
+_FRAME_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class EvidenceStore:
+    """Content-addressed storage for keyframes and annotated evidence frames.
+
+    Frames are encoded once, stored under their SHA-256 digest and referenced
+    from reports by ID, so identical frames are uploaded a single time.
+    Thumbnails are rendered on first request and kept both in the bucket and
+    in a small in-process LRU.
+    """
+
+    def __init__(self, connector, jpeg_quality: int = 90, thumbnail_cache_size: int = 256):
+        self.connector = connector
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_cache_size = thumbnail_cache_size
+        self._known_ids = set()
+        self._thumbnails: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_id(frame_id: str) -> bool:
+        return bool(_FRAME_ID_RE.match(frame_id or ""))
+
+    @staticmethod
+    def frame_path(frame_id: str, fmt: str = "jpg") -> str:
+        return f"{EVIDENCE_PREFIX}/{frame_id}.{fmt}"
+
+    @staticmethod
+    def thumbnail_path(frame_id: str, size: int) -> str:
+        return f"{EVIDENCE_PREFIX}/thumbnails/{size}/{frame_id}.jpg"
+
+    def encode_frame(self, frame: np.ndarray, fmt: str = "jpg") -> bytes:
+        """Encode a BGR frame as JPEG or WebP"""
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported evidence format: {fmt}")
+        if fmt == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.jpeg_quality]
+        else:
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        ok, buf = cv2.imencode(f".{fmt}", frame, params)
+        if not ok:
+            raise ValueError("Could not encode evidence frame")
+        return buf.tobytes()
+
+    def save_frame(self, frame: np.ndarray, fmt: str = "jpg") -> Dict:
+        """Store a frame (deduplicated by content hash) and return its reference"""
+        data = self.encode_frame(frame, fmt)
+        frame_id = hashlib.sha256(data).hexdigest()
+        path = self.frame_path(frame_id, fmt)
+
+        with self._lock:
+            known = frame_id in self._known_ids
+        if not known:
+            if not self.connector.blob_exists(path):
+                self.connector.upload_bytes(data, path, content_type=CONTENT_TYPES[fmt])
+                logger.info(f"Evidence frame stored: {path}")
+            with self._lock:
+                self._known_ids.add(frame_id)
+
+        height, width = frame.shape[:2]
+        return {
+            "frameId": frame_id,
+            "format": fmt,
+            "width": int(width),
+            "height": int(height),
+            "url": f"/api/video/evidence/{frame_id}"
+        }
+
+    def get_frame(self, frame_id: str) -> Tuple[bytes, str]:
+        """Return the stored bytes and content type of a frame"""
+        if not self.is_valid_id(frame_id):
+            raise ValueError("Invalid evidence frame id")
+        for fmt, content_type in CONTENT_TYPES.items():
+            path = self.frame_path(frame_id, fmt)
+            if self.connector.blob_exists(path):
+                return self.connector.download_bytes(path), content_type
+        raise FileNotFoundError(f"Evidence frame not found: {frame_id}")
+
+    def get_thumbnail(self, frame_id: str, size: int) -> bytes:
+        """Return a JPEG thumbnail, rendering and caching it on first request"""
+        if not self.is_valid_id(frame_id):
+            raise ValueError("Invalid evidence frame id")
+        if size not in THUMBNAIL_SIZES:
+            raise ValueError(f"Unsupported thumbnail size. Allowed sizes: {THUMBNAIL_SIZES}")
+
+        key = (frame_id, size)
+        with self._lock:
+            cached = self._thumbnails.get(key)
+            if cached is not None:
+                self._thumbnails.move_to_end(key)
+                return cached
+
+        path = self.thumbnail_path(frame_id, size)
+        if self.connector.blob_exists(path):
+            data = self.connector.download_bytes(path)
+        else:
+            original, _ = self.get_frame(frame_id)
+            image = cv2.imdecode(np.frombuffer(original, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError("Stored evidence frame could not be decoded")
+            height, width = image.shape[:2]
+            scale = min(1.0, size / float(max(height, width)))
+            if scale < 1.0:
+                image = cv2.resize(
+                    image,
+                    (max(1, int(width * scale)), max(1, int(height * scale))),
+                    interpolation=cv2.INTER_AREA
+                )
+            ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            if not ok:
+                raise ValueError("Could not encode thumbnail")
+            data = buf.tobytes()
+            self.connector.upload_bytes(data, path, content_type="image/jpeg")
+
+        self._remember_thumbnail(key, data)
+        return data
+
+    def signed_url(self, frame_id: str, size: Optional[int] = None, expiration: int = 3600) -> str:
+        """Generate a signed URL for a frame or one of its thumbnails"""
+        if not self.is_valid_id(frame_id):
+            raise ValueError("Invalid evidence frame id")
+        if size is not None:
+            self.get_thumbnail(frame_id, size)
+            return self.connector.generate_signed_url(self.thumbnail_path(frame_id, size), expiration)
+        for fmt in CONTENT_TYPES:
+            path = self.frame_path(frame_id, fmt)
+            if self.connector.blob_exists(path):
+                return self.connector.generate_signed_url(path, expiration)
+        raise FileNotFoundError(f"Evidence frame not found: {frame_id}")
+
+    def _remember_thumbnail(self, key: Tuple[str, int], data: bytes):
+        with self._lock:
+            self._thumbnails[key] = data
+            self._thumbnails.move_to_end(key)
+            while len(self._thumbnails) > self.thumbnail_cache_size:
+                self._thumbnails.popitem(last=False)
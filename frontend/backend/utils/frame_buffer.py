@@ -0,0 +1,50 @@
+import time
+import asyncio
+from typing import Optional, Tuple
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox between a websocket reader and its inference loop.
+
+    Only the newest frame is kept: a frame that arrives while another one
+    is still waiting replaces it and is counted as dropped, so latency stays
+    bounded when inference is slower than the camera.
+    """
+
+    def __init__(self):
+        self._frame: Optional[bytes] = None
+        self._received_at = 0.0
+        self._event = asyncio.Event()
+        self._closed = False
+        self.dropped_since_last = 0
+        self.total_dropped = 0
+        self.total_received = 0
+
+    def put(self, data: bytes, received_at: float = None):
+        if self._frame is not None:
+            self.dropped_since_last += 1
+            self.total_dropped += 1
+        self._frame = data
+        self._received_at = received_at if received_at is not None else time.perf_counter()
+        self.total_received += 1
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def get(self) -> Optional[Tuple[bytes, float, int]]:
+        """Wait for the newest frame; returns ``(data, received_at, dropped)`` or None once closed"""
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        data, received_at, dropped = self._frame, self._received_at, self.dropped_since_last
+        self._frame = None
+        self.dropped_since_last = 0
+        return data, received_at, dropped
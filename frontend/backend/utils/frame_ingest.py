@@ -0,0 +1,140 @@
+import os
+import struct
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+MODEL_INPUT_SIZE = int(os.getenv("MODEL_INPUT_SIZE", "640"))
+MAX_FRAME_BYTES = int(os.getenv("MAX_FRAME_BYTES", str(8 * 1024 * 1024)))
+MAX_FRAME_DIMENSION = int(os.getenv("MAX_FRAME_DIMENSION", "4096"))
+
+_REDUCED_FLAGS = (
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# SOF0..SOF15 (DHT, JPG ve DAC hariç)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class FrameValidationError(ValueError):
+    """Raised when an incoming frame is rejected before decoding"""
+
+
+def image_dimensions(data) -> Tuple[str, int, int]:
+    """Read ``(format, width, height)`` from a JPEG or PNG header without decoding"""
+    view = memoryview(data)
+    if len(view) >= 24 and bytes(view[:8]) == b"\x89PNG\r\n\x1a\n":
+        width, height = struct.unpack(">II", view[16:24])
+        return "png", width, height
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        raise FrameValidationError("Unsupported image format, expected JPEG or PNG")
+
+    offset = 2
+    while offset + 4 <= len(view):
+        if view[offset] != 0xFF:
+            raise FrameValidationError("Corrupt JPEG header")
+        marker = view[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        length = struct.unpack(">H", view[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(view):
+                break
+            height, width = struct.unpack(">HH", view[offset + 5:offset + 9])
+            return "jpeg", width, height
+        offset += 2 + length
+    raise FrameValidationError("JPEG header has no frame size")
+
+
+def reduction_factor(image_format: str, width: int, height: int, input_size: int = MODEL_INPUT_SIZE) -> int:
+    """Largest JPEG DCT downscale that still covers the model input size"""
+    if image_format != "jpeg":
+        return 1
+    for factor, _ in _REDUCED_FLAGS:
+        if max(width, height) // factor >= input_size:
+            return factor
+    return 1
+
+
+def validate_frame(data, max_bytes: int = MAX_FRAME_BYTES, max_dimension: int = MAX_FRAME_DIMENSION) -> Tuple[str, int, int]:
+    """Reject empty, oversized or malformed frames before any decoding work"""
+    if len(data) == 0:
+        raise FrameValidationError("Empty frame")
+    if len(data) > max_bytes:
+        raise FrameValidationError(f"Frame too large. Maximum size is {max_bytes} bytes")
+    image_format, width, height = image_dimensions(data)
+    if width == 0 or height == 0 or max(width, height) > max_dimension:
+        raise FrameValidationError(f"Invalid frame size {width}x{height}")
+    return image_format, width, height
+
+
+def decode_frame(data, input_size: int = MODEL_INPUT_SIZE, factor: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """Validate and decode a frame at the smallest resolution the model can use.
+
+    Returns ``(frame, factor)``; coordinates measured on the decoded frame
+    must be multiplied by ``factor`` to map back to the original image.
+    A given ``factor`` is used as is, so a stream keeps one decode scale.
+    """
+    image_format, width, height = validate_frame(data)
+    if factor is None:
+        factor = reduction_factor(image_format, width, height, input_size)
+    flag = dict(_REDUCED_FLAGS).get(factor, cv2.IMREAD_COLOR)
+    # np.frombuffer kopya yapmaz; buffer doğrudan imdecode'a gider
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if frame is None:
+        raise FrameValidationError("Could not decode frame")
+    return frame, factor
+
+
+def scale_detections(detections: List[dict], factor: int) -> List[dict]:
+    """Map detection boxes from a reduced decode back to original coordinates"""
+    if factor == 1:
+        return detections
+    # Detector geçmişi aynı dict'leri tuttuğu için kopya üzerinde ölçekle
+    return [{**d, "bbox": [int(v * factor) for v in d["bbox"]]} for d in detections]
+
+
+class FrameBufferPool:
+    """Reusable receive buffers so request bodies are read with a single copy"""
+
+    def __init__(self, buffer_size: int = MAX_FRAME_BYTES, max_buffers: int = 16):
+        self.buffer_size = buffer_size
+        self.max_buffers = max_buffers
+        self._free: List[bytearray] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bytearray:
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return bytearray(self.buffer_size)
+
+    def release(self, buffer: bytearray):
+        with self._lock:
+            if len(self._free) < self.max_buffers:
+                self._free.append(buffer)
+
+    async def read_request(self, request, buffer: bytearray) -> memoryview:
+        """Stream a request body into ``buffer`` and return a view of the filled part"""
+        content_length = request.headers.get("content-length")
+        if content_length:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                raise FrameValidationError(f"Invalid Content-Length: {content_length[:32]}")
+            if declared > self.buffer_size:
+                raise FrameValidationError(f"Frame too large. Maximum size is {self.buffer_size} bytes")
+        size = 0
+        async for chunk in request.stream():
+            end = size + len(chunk)
+            if end > self.buffer_size:
+                raise FrameValidationError(f"Frame too large. Maximum size is {self.buffer_size} bytes")
+            buffer[size:end] = chunk
+            size = end
+        return memoryview(buffer)[:size]
@@ -1,8 +1,10 @@
 import os
 from google.cloud import storage
-import json
+from google.api_core import exceptions as gcs_exceptions
 import logging
 from datetime import datetime, timedelta
+from utils.serialization import dumps, loads
+from utils.storage import PreconditionFailedError
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +18,7 @@ class GCPConnector:
             # Bucket name'i environment variable'dan al
             cls._instance.bucket_name = bucket_name or os.getenv('GCP_BUCKET_NAME')
             if not cls._instance.bucket_name:
+                cls._instance = None
                 raise ValueError("GCP_BUCKET_NAME environment variable is not set")
             
             try:
@@ -24,6 +27,8 @@ class GCPConnector:
                 logger.info(f"GCPConnector initialized with bucket: {cls._instance.bucket_name}")
             except Exception as e:
                 logger.error(f"Failed to initialize GCPConnector: {str(e)}")
+                # Yarım kalan örnek saklanmaz; sonraki deneme yeniden bağlanır
+                cls._instance = None
                 raise
         return cls._instance
 
@@ -44,6 +49,66 @@ class GCPConnector:
         blobs = self.bucket.list_blobs()
         return [blob.name for blob in blobs]
 
+    def blob_exists(self, gcp_path: str) -> bool:
+        """Check whether a blob exists in the bucket"""
+        try:
+            return self.bucket.blob(gcp_path).exists()
+        except Exception as e:
+            logger.error(f"Error checking blob in GCP: {str(e)}")
+            raise Exception(f"Failed to check blob in GCP: {str(e)}")
+
+    def upload_bytes(self, data: bytes, gcp_path: str, content_type: str = "application/octet-stream",
+                     if_generation_match: int = None) -> str:
+        """Upload raw bytes to GCP Storage and return the GCP path"""
+        try:
+            blob = self.bucket.blob(gcp_path)
+            blob.upload_from_string(data, content_type=content_type, if_generation_match=if_generation_match)
+            return gcp_path
+        except gcs_exceptions.PreconditionFailed as e:
+            raise PreconditionFailedError(f"{gcp_path} is not at generation {if_generation_match}") from e
+        except Exception as e:
+            logger.error(f"Error uploading bytes to GCP: {str(e)}")
+            raise Exception(f"Failed to upload bytes to GCP: {str(e)}")
+
+    def download_bytes(self, gcp_path: str, if_generation_match: int = None) -> bytes:
+        """Download a blob from GCP Storage as bytes"""
+        try:
+            return self.bucket.blob(gcp_path).download_as_bytes(if_generation_match=if_generation_match)
+        except gcs_exceptions.PreconditionFailed as e:
+            raise PreconditionFailedError(f"{gcp_path} is not at generation {if_generation_match}") from e
+        except Exception as e:
+            logger.error(f"Error downloading bytes from GCP: {str(e)}")
+            raise Exception(f"Failed to download bytes from GCP: {str(e)}")
+
+    def iter_bytes(self, gcp_path: str, chunk_size: int = 1024 * 1024):
+        """Stream a blob in chunks without loading it fully into memory"""
+        with self.bucket.blob(gcp_path).open("rb", chunk_size=chunk_size) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def compose(self, source_paths: list, destination_path: str, content_type: str = None) -> str:
+        """Compose up to 32 blobs into a single destination blob"""
+        try:
+            destination = self.bucket.blob(destination_path)
+            if content_type:
+                destination.content_type = content_type
+            destination.compose([self.bucket.blob(path) for path in source_paths])
+            return destination_path
+        except Exception as e:
+            logger.error(f"Error composing blobs in GCP: {str(e)}")
+            raise Exception(f"Failed to compose blobs in GCP: {str(e)}")
+
+    def delete_blob(self, gcp_path: str):
+        """Delete a blob from the bucket"""
+        try:
+            self.bucket.blob(gcp_path).delete()
+        except Exception as e:
+            logger.error(f"Error deleting blob from GCP: {str(e)}")
+            raise Exception(f"Failed to delete blob from GCP: {str(e)}")
+
     def upload_video(self, local_path: str) -> str:
         """Upload video to GCP Storage and return the GCP path"""
         try:
@@ -71,7 +136,7 @@ class GCPConnector:
             # Save results as JSON
             blob = self.bucket.blob(results_path)
             blob.upload_from_string(
-                json.dumps(results),
+                dumps(results),
                 content_type='application/json'
             )
             
@@ -86,24 +151,65 @@ class GCPConnector:
         """Get analysis results from GCP Storage"""
         try:
             blob = self.bucket.blob(results_path)
-            content = blob.download_as_string()
-            return json.loads(content)
+            content = blob.download_as_bytes()
+            return loads(content)
             
         except Exception as e:
             logger.error(f"Error getting results from GCP: {str(e)}")
             raise Exception(f"Failed to get results from GCP: {str(e)}")
     
-    def generate_signed_url(self, gcp_path: str, expiration: int = 3600) -> str:
+    def get_blob_metadata(self, gcp_path: str):
+        """Return size/generation metadata for a blob, or None if it does not exist"""
+        try:
+            blob = self.bucket.get_blob(gcp_path)
+            if blob is None:
+                return None
+            return {
+                "path": gcp_path,
+                "size": blob.size,
+                "generation": blob.generation,
+                "content_type": blob.content_type,
+                "md5_hash": blob.md5_hash
+            }
+        except Exception as e:
+            logger.error(f"Error getting blob metadata from GCP: {str(e)}")
+            raise Exception(f"Failed to get blob metadata from GCP: {str(e)}")
+
+    def generate_signed_url(self, gcp_path: str, expiration: int = 3600, method: str = "GET",
+                            content_type: str = None, headers: dict = None) -> str:
         """Generate a signed URL for temporary access to a file"""
         try:
             blob = self.bucket.blob(gcp_path)
             url = blob.generate_signed_url(
                 version="v4",
                 expiration=datetime.utcnow() + timedelta(seconds=expiration),
-                method="GET"
+                method=method,
+                content_type=content_type,
+                headers=headers
             )
             return url
             
         except Exception as e:
             logger.error(f"Error generating signed URL: {str(e)}")
-            raise Exception(f"Failed to generate signed URL: {str(e)}") 
+            raise Exception(f"Failed to generate signed URL: {str(e)}")
+
+    def create_resumable_upload_url(self, gcp_path: str, content_type: str, expiration: int = 3600) -> dict:
+        """Generate a signed URL that starts a resumable upload directly into the bucket.
+
+        The client POSTs to the URL with the returned headers, receives the
+        session URI in the ``Location`` header and PUTs the file (optionally
+        in ``Content-Range`` chunks) to that URI.
+        """
+        headers = {"x-goog-resumable": "start"}
+        url = self.generate_signed_url(
+            gcp_path,
+            expiration=expiration,
+            method="POST",
+            content_type=content_type,
+            headers=headers
+        )
+        return {
+            "url": url,
+            "method": "POST",
+            "headers": {**headers, "Content-Type": content_type}
+        }
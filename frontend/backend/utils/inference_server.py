@@ -0,0 +1,392 @@
+"""Local inference server: model processes fed with frames through shared memory.
+
+API workers send frames to a small pool of inference processes instead
+of running the model themselves. Each client process owns one
+``SharedMemory`` segment split into ``INFERENCE_SLOTS`` fixed-size slots,
+and each slot has its own Unix-socket connection. A frame is copied once
+into its slot; only a small fixed header (shape, thresholds, model) goes
+over the socket, and the reply carries the raw ``(N, 6)`` float32 boxes.
+Nothing is pickled.
+
+Inference processes share one listening socket, so connections (and
+with them slots) are spread over the pool by the kernel. A process
+serves its connections one frame at a time with its own torch and OpenCV
+thread pools, and can be pinned to CPUs of its own.
+
+The server preprocesses and runs the model; tracking and behaviour
+analysis stay in the API worker, where the per-session state lives.
+"""
+import os
+import json
+import atexit
+import time
+import queue
+import socket
+import struct
+import logging
+import selectors
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Boşsa inference her süreçte yerel modelle yapılır
+INFERENCE_SOCKET_ENV = "INFERENCE_SOCKET"
+INFERENCE_SLOTS = int(os.getenv("INFERENCE_SLOTS", "4"))
+# 1920x1080x3 = 6 MB; daha büyük frame'ler slota sığacak şekilde küçültülür
+INFERENCE_SLOT_MB = float(os.getenv("INFERENCE_SLOT_MB", "8"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+INFERENCE_CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "30"))
+
+_LENGTH = struct.Struct("<I")
+# seq, height, width, channels, preprocess, conf, iou, imgsz; ardından model yolu
+_REQUEST = struct.Struct("<IHHBBffH")
+# seq, status, box count, preprocess seconds, inference seconds, names length; ardından names JSON ve kutular
+_REPLY = struct.Struct("<IBIffI")
+_BOX_BYTES = 6 * 4
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+class InferenceUnavailable(RuntimeError):
+    """The inference server could not be reached or did not answer in time"""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Inference connection closed")
+        received += count
+    return buffer
+
+
+def _recv_message(sock: socket.socket) -> bytearray:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+def _send_message(sock: socket.socket, *parts: bytes):
+    sock.sendall(_LENGTH.pack(sum(len(part) for part in parts)) + b"".join(parts))
+
+
+class _ClientSlot:
+    """One slot of the client segment and the connection that carries its frames"""
+
+    def __init__(self, client: "InferenceClient", index: int):
+        self.client = client
+        self.index = index
+        self.offset = index * client.slot_bytes
+        self.sock: Optional[socket.socket] = None
+        self.seq = 0
+
+    def _connect(self):
+        deadline = time.monotonic() + self.client.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(self.client.timeout)
+                sock.connect(self.client.socket_path)
+                hello = {"shm": self.client.shm.name, "offset": self.offset, "size": self.client.slot_bytes}
+                _send_message(sock, json.dumps(hello).encode())
+                reply = bytes(_recv_message(sock))
+                if reply != b"ok":
+                    raise InferenceUnavailable(f"Inference server refused slot: {reply.decode(errors='replace')}")
+                self.sock = sock
+                return
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                sock.close()
+                # Sunucu henüz açılıyor olabilir
+                if time.monotonic() >= deadline:
+                    raise InferenceUnavailable(f"Inference server at {self.client.socket_path} unavailable: {e}") from e
+                time.sleep(0.2)
+            except BaseException:
+                sock.close()
+                raise
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _write_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Copy (or downscale) ``frame`` into the slot; returns the slot view and the scale applied"""
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        scale = 1.0
+        if frame.nbytes > self.client.slot_bytes:
+            scale = (self.client.slot_bytes / frame.nbytes) ** 0.5
+            height, width = max(1, int(height * scale)), max(1, int(width * scale))
+        view = np.ndarray((height, width, channels) if frame.ndim == 3 else (height, width), dtype=np.uint8,
+                          buffer=self.client.shm.buf, offset=self.offset)
+        if scale == 1.0:
+            np.copyto(view, frame)
+        else:
+            import cv2
+            cv2.resize(frame, (width, height), dst=view, interpolation=cv2.INTER_AREA)
+            scale = width / frame.shape[1]
+        return view, scale
+
+    def infer(self, frame: np.ndarray, model_path: str, imgsz: int, conf: float, iou: float,
+              preprocess: bool) -> Tuple[np.ndarray, Dict[int, str], Dict[str, float]]:
+        if frame.dtype != np.uint8:
+            raise ValueError("Inference server frames must be uint8")
+        if self.sock is None:
+            self._connect()
+        view, scale = self._write_frame(frame)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        height, width = view.shape[:2]
+        channels = view.shape[2] if view.ndim == 3 else 1
+        try:
+            _send_message(
+                self.sock,
+                _REQUEST.pack(self.seq, height, width, channels, int(preprocess), conf, iou, imgsz),
+                model_path.encode()
+            )
+            reply = _recv_message(self.sock)
+        except (OSError, ConnectionError) as e:
+            # Yarım kalan yanıt bağlantıyı bozar; sonraki frame yeniden bağlanır
+            self.close()
+            raise InferenceUnavailable(f"Inference request failed: {e}") from e
+        seq, status, count, preprocess_s, inference_s, names_length = _REPLY.unpack_from(reply)
+        if seq != self.seq:
+            self.close()
+            raise InferenceUnavailable(f"Out of order inference reply ({seq} != {self.seq})")
+        body = memoryview(reply)[_REPLY.size:]
+        if status != STATUS_OK:
+            raise RuntimeError(f"Inference server error: {bytes(body).decode(errors='replace')}")
+        names = self.client.names.get(model_path)
+        if names_length:
+            names = {int(k): v for k, v in json.loads(bytes(body[:names_length])).items()}
+            self.client.names[model_path] = names
+        raw = np.frombuffer(reply, dtype=np.float32, count=count * 6, offset=_REPLY.size + names_length).reshape(count, 6)
+        if scale != 1.0:
+            raw[:, :4] /= scale
+        return raw, names or {}, {"preprocess": preprocess_s, "inference": inference_s}
+
+
+class InferenceClient:
+    """Per-process client; thread-safe, with at most ``slots`` frames in flight"""
+
+    def __init__(self, socket_path: str, slots: int = INFERENCE_SLOTS, slot_bytes: int = None,
+                 timeout: float = INFERENCE_TIMEOUT, connect_timeout: float = INFERENCE_CONNECT_TIMEOUT):
+        self.socket_path = socket_path
+        self.slot_bytes = slot_bytes or int(INFERENCE_SLOT_MB * 1024 * 1024)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.names: Dict[str, Dict[int, str]] = {}
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+        self._slots: "queue.Queue[_ClientSlot]" = queue.Queue()
+        for index in range(slots):
+            self._slots.put(_ClientSlot(self, index))
+        self.slots = slots
+
+    def infer(self, frame: np.ndarray, model_path: str, imgsz: int, conf: float, iou: float,
+              preprocess: bool = True) -> Tuple[np.ndarray, Dict[int, str], Dict[str, float]]:
+        """Raw ``(N, 6)`` boxes in ``frame`` coordinates, class names and the server-side timings"""
+        try:
+            slot = self._slots.get(timeout=self.timeout)
+        except queue.Empty:
+            raise InferenceUnavailable(f"No free inference slot in {self.timeout}s")
+        try:
+            return slot.infer(frame, model_path, imgsz, conf, iou, preprocess)
+        finally:
+            self._slots.put(slot)
+
+    def close(self):
+        for _ in range(self.slots):
+            self._slots.get().close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+_client: Optional[InferenceClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+_is_server = False
+
+
+def inference_client() -> Optional[InferenceClient]:
+    """The process-wide client when ``INFERENCE_SOCKET`` is set, else None (in-process inference).
+
+    Read at call time, not import time: the preload supervisor sets the
+    variable only after it has loaded the models locally. A client never
+    crosses a fork; each process creates its own segment.
+    """
+    global _client, _client_pid
+    socket_path = os.getenv(INFERENCE_SOCKET_ENV)
+    if not socket_path or _is_server:
+        return None
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = InferenceClient(socket_path)
+            _client_pid = os.getpid()
+            atexit.register(close_client)
+            logger.info(f"Inference via {socket_path} ({_client.slots} slots of {_client.slot_bytes // (1024 * 1024)} MB)")
+    return _client
+
+
+def close_client():
+    """Close this process's client and unlink its segment; a no-op without one"""
+    global _client
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+        _client = None
+
+
+def bind_listener(socket_path: str, backlog: int = 256) -> socket.socket:
+    """Listening socket shared by every inference process; bind before forking them"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    sock.listen(backlog)
+    # Aynı soketi dinleyen diğer süreç bağlantıyı önce alırsa accept bloklamasın
+    sock.setblocking(False)
+    return sock
+
+
+class _ServerConnection:
+    def __init__(self, sock: socket.socket, shm: shared_memory.SharedMemory, offset: int, size: int):
+        self.sock = sock
+        self.shm = shm
+        self.offset = offset
+        self.size = size
+        self.names_sent = set()
+
+
+class InferenceWorker:
+    """One inference process: serves every connection it accepted, one frame at a time"""
+
+    def __init__(self, listener: socket.socket):
+        from models.detector import DEFAULT_MODEL_PATH, ObjectDetector
+        from utils.metrics import StageRecorder
+
+        self.listener = listener
+        self.default_model_path = DEFAULT_MODEL_PATH
+        self.detector = ObjectDetector()
+        self.detector.stages = StageRecorder("inference_server", "inference_server")
+        self.selector = selectors.DefaultSelector()
+        self.segments: Dict[str, List[Any]] = {}
+
+    def _attach(self, name: str) -> shared_memory.SharedMemory:
+        entry = self.segments.get(name)
+        if entry is None:
+            shm = shared_memory.SharedMemory(name=name)
+            # Segment istemcinin; bu süreç kapanınca resource tracker onu silmemeli
+            resource_tracker.unregister(getattr(shm, "_name", shm.name), "shared_memory")
+            entry = self.segments[name] = [shm, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _detach(self, name: str):
+        entry = self.segments.get(name)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.segments[name]
+            try:
+                entry[0].close()
+            except BufferError:
+                logger.warning(f"Shared memory {name} still referenced, left mapped")
+
+    def _accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        # Yarım mesaj gönderen istemci süreci sonsuza dek bekletmesin
+        sock.settimeout(INFERENCE_TIMEOUT)
+        try:
+            hello = json.loads(bytes(_recv_message(sock)))
+            shm = self._attach(hello["shm"])
+            if hello["offset"] + hello["size"] > shm.size:
+                self._detach(hello["shm"])
+                raise ValueError("Slot outside the shared memory segment")
+        except Exception as e:
+            logger.warning(f"Rejected inference connection: {str(e)}")
+            try:
+                _send_message(sock, f"error: {e}".encode())
+            except OSError:
+                pass
+            sock.close()
+            return
+        _send_message(sock, b"ok")
+        self.selector.register(sock, selectors.EVENT_READ, _ServerConnection(sock, shm, hello["offset"], hello["size"]))
+
+    def _drop(self, connection: _ServerConnection):
+        self.selector.unregister(connection.sock)
+        connection.sock.close()
+        self._detach(connection.shm.name)
+
+    def _infer(self, connection: _ServerConnection, request: bytearray) -> List[bytes]:
+        seq, height, width, channels, preprocess, conf, iou, imgsz = _REQUEST.unpack_from(request)
+        model_path = bytes(request[_REQUEST.size:]).decode() or self.default_model_path
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        if height * width * channels > connection.size:
+            raise ValueError("Frame larger than its slot")
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=connection.shm.buf, offset=connection.offset)
+        detector = self.detector
+        detector.set_model_profile(imgsz, None if model_path == self.default_model_path else model_path)
+        detector.conf_threshold, detector.iou_threshold = conf, iou
+        started = time.perf_counter()
+        processed = detector.preprocess_frame(frame) if preprocess else frame
+        preprocessed = time.perf_counter()
+        raw, names = detector.infer_raw(processed)
+        finished = time.perf_counter()
+        del frame, processed
+        names_json = b""
+        if model_path not in connection.names_sent:
+            names_json = json.dumps({str(k): v for k, v in names.items()}).encode()
+            connection.names_sent.add(model_path)
+        raw = np.ascontiguousarray(raw, dtype=np.float32)
+        header = _REPLY.pack(seq, STATUS_OK, len(raw), preprocessed - started, finished - preprocessed, len(names_json))
+        return [header, names_json, raw.tobytes()]
+
+    def _handle(self, connection: _ServerConnection):
+        try:
+            request = _recv_message(connection.sock)
+        except (OSError, ConnectionError):
+            self._drop(connection)
+            return
+        try:
+            parts = self._infer(connection, request)
+        except Exception as e:
+            logger.error(f"Inference failed: {str(e)}")
+            seq = _REQUEST.unpack_from(request)[0] if len(request) >= _REQUEST.size else 0
+            parts = [_REPLY.pack(seq, STATUS_ERROR, 0, 0.0, 0.0, 0), str(e).encode()]
+        try:
+            _send_message(connection.sock, *parts)
+        except OSError:
+            self._drop(connection)
+
+    def serve_forever(self):
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
+        logger.info(f"Inference worker {os.getpid()} serving")
+        while True:
+            for key, _ in self.selector.select():
+                if key.data is None:
+                    self._accept()
+                else:
+                    self._handle(key.data)
+
+
+def run_worker(listener: socket.socket, index: int = 0):
+    """Body of inference process ``index``: apply its thread budget and serve until killed"""
+    global _is_server
+    _is_server = True
+    from utils.thread_budget import apply_role
+    apply_role("inference", index)
+    InferenceWorker(listener).serve_forever()
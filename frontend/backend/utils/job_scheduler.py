@@ -0,0 +1,275 @@
+import os
+import heapq
+import itertools
+import logging
+import threading
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_WORKER_MODE = os.getenv("ANALYSIS_WORKER_MODE", "process")
+ANALYSIS_WORKER_NICE = int(os.getenv("ANALYSIS_WORKER_NICE", "10"))
+
+# Küçük sayı önce çalışır
+PRIORITIES = {"urgent": 0, "normal": 1, "bulk": 2}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancel event has been set"""
+
+
+def check_cancelled(cancel_event):
+    """Call periodically from long-running jobs to honour cancellation"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled("Job cancelled")
+
+
+def _worker_init(nice: int):
+    # Analiz süreçleri API sürecinden düşük öncelikle çalışır
+    if nice and hasattr(os, "nice"):
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+    from utils.thread_budget import apply_role
+    apply_role("analysis")
+
+
+class Job:
+    """A queued or running unit of work and its timing"""
+
+    def __init__(self, job_id: str, func: Callable, args: tuple, priority: str,
+                 callback: Optional[Callable[["Job"], None]], cancel_event):
+        self.job_id = job_id
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.job_id,
+            "status": self.status,
+            "priority": self.priority,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_seconds": self.wait_seconds,
+            "run_seconds": (self.finished_at - self.started_at) if self.finished_at and self.started_at else None,
+            "error": self.error
+        }
+
+
+class JobScheduler:
+    """Priority queue in front of a bounded thread or process pool.
+
+    At most ``max_concurrent`` jobs run at once; the rest wait in a heap
+    ordered by priority class and then submission order. Jobs receive a
+    ``cancel_event`` keyword argument and should call ``check_cancelled``
+    from their main loop. In ``process`` mode jobs run in separate,
+    lower-priority processes so analysis does not contend with the API
+    process for the GIL; the function and its arguments must be picklable
+    and results are returned to the parent instead of mutating module state.
+    """
+
+    def __init__(self, max_concurrent: int = ANALYSIS_WORKERS, mode: str = ANALYSIS_WORKER_MODE,
+                 nice: int = ANALYSIS_WORKER_NICE, history_size: int = 1000):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.max_concurrent = max(1, max_concurrent)
+        self.mode = mode
+        self.nice = nice
+        self._lock = threading.Lock()
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._history = deque(maxlen=history_size)
+        self._running = 0
+        self._executor = None
+        self._manager = None
+        self._wait_times = deque(maxlen=500)
+        self._run_times = deque(maxlen=500)
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    def _make_executor(self):
+        if self.mode == "thread":
+            return ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="analysis")
+        return ProcessPoolExecutor(
+            max_workers=self.max_concurrent,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(self.nice,)
+        )
+
+    def _new_cancel_event(self):
+        if self.mode == "thread":
+            return threading.Event()
+        # Süreçler arası paylaşılabilir event için manager proxy'si gerekir
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager.Event()
+
+    def submit(self, job_id: str, func: Callable, *args, priority: str = "normal",
+               callback: Optional[Callable[[Job], None]] = None) -> Job:
+        """Queue ``func(*args, cancel_event=...)``; ``callback(job)`` runs once the job ends"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}. Allowed: {', '.join(PRIORITIES)}")
+        with self._lock:
+            if job_id in self._jobs and self._jobs[job_id].status in ("queued", "running"):
+                raise ValueError(f"Job already active: {job_id}")
+            job = Job(job_id, func, args, priority, callback, self._new_cancel_event())
+            self._jobs[job_id] = job
+            self._history.append(job_id)
+            heapq.heappush(self._queue, (PRIORITIES[priority], next(self._sequence), job))
+            self.stats["submitted"] += 1
+            self._trim_history_locked()
+        self._dispatch()
+        return job
+
+    def _trim_history_locked(self):
+        # Bitmiş işlerin kaydı sınırlı tutulur
+        while len(self._jobs) > self._history.maxlen:
+            oldest = next((j for j in self._history if self._jobs.get(j) and
+                           self._jobs[j].status not in ("queued", "running")), None)
+            if oldest is None:
+                return
+            self._history.remove(oldest)
+            del self._jobs[oldest]
+
+    def _dispatch(self):
+        started: List[Job] = []
+        with self._lock:
+            while self._running < self.max_concurrent and self._queue:
+                _, _, job = heapq.heappop(self._queue)
+                if job.status != "queued":
+                    continue
+                if self._executor is None:
+                    self._executor = self._make_executor()
+                job.status = "running"
+                job.started_at = time.time()
+                self._wait_times.append(job.wait_seconds)
+                self._running += 1
+                job.future = self._executor.submit(job.func, *job.args, cancel_event=job.cancel_event)
+                started.append(job)
+        for job in started:
+            job.future.add_done_callback(lambda future, job=job: self._on_done(job, future))
+
+    def _on_done(self, job: Job, future: Future):
+        error = future.exception()
+        with self._lock:
+            self._running -= 1
+            job.finished_at = time.time()
+            self._run_times.append(job.finished_at - job.started_at)
+            if error is None:
+                job.status = "completed"
+                job.result = future.result()
+            elif isinstance(error, JobCancelled):
+                job.status = "cancelled"
+            else:
+                job.status = "failed"
+                job.error = str(error)
+                if isinstance(error, BrokenProcessPool):
+                    # Bir worker çöktüyse havuz kullanılamaz; yenisi kurulur
+                    logger.error("Analysis worker pool broke, recreating it")
+                    self._executor = None
+            self.stats[job.status] += 1
+        if job.status == "failed":
+            logger.error(f"Job {job.job_id} failed: {job.error}")
+        self._finish(job)
+        self._dispatch()
+
+    def _finish(self, job: Job):
+        if job.callback is None:
+            return
+        try:
+            job.callback(job)
+        except Exception as e:
+            logger.error(f"Job callback failed for {job.job_id}: {str(e)}")
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job immediately or signal a running one; False if not active"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return False
+            job.cancel_event.set()
+            if job.status != "queued":
+                return True
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            self.stats["cancelled"] += 1
+        self._finish(job)
+        return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            ordered = sorted(entry for entry in self._queue if entry[2].status == "queued")
+            for position, (_, _, job) in enumerate(ordered):
+                if job.job_id == job_id:
+                    return position
+        return None
+
+    @staticmethod
+    def _summary(values) -> Dict[str, float]:
+        if not values:
+            return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(values)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 3),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max": round(ordered[-1], 3)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = [entry[2] for entry in self._queue if entry[2].status == "queued"]
+            now = time.time()
+            return {
+                **self.stats,
+                "mode": self.mode,
+                "max_concurrent": self.max_concurrent,
+                "running": self._running,
+                "queue_depth": len(queued),
+                "queue_depth_by_priority": {
+                    name: sum(1 for job in queued if job.priority == name) for name in PRIORITIES
+                },
+                "oldest_queued_seconds": round(max((now - job.submitted_at for job in queued), default=0.0), 3),
+                "wait_seconds": self._summary(self._wait_times),
+                "run_seconds": self._summary(self._run_times)
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            for _, _, job in self._queue:
+                if job.status == "queued":
+                    job.cancel_event.set()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
@@ -0,0 +1,117 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, Optional, Set
+
+from utils.live_protocol import DeltaEncoder
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+LIVE_SUBSCRIBER_BUFFER = int(os.getenv("LIVE_SUBSCRIBER_BUFFER", "8"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "100"))
+
+
+class SubscriberLimitError(Exception):
+    """Raised when a camera already has the maximum number of viewers"""
+
+
+class Subscriber:
+    """One viewer of a camera, with a bounded drop-oldest buffer.
+
+    A slow viewer only loses its own oldest results; the publisher never
+    waits for it. Binary viewers carry their own ``DeltaEncoder`` since the
+    delta state depends on what that viewer has actually been sent.
+    """
+
+    def __init__(self, camera_id: str, binary: bool = False, buffer_size: int = LIVE_SUBSCRIBER_BUFFER):
+        self.camera_id = camera_id
+        self.encoder = DeltaEncoder() if binary else None
+        self._buffer = deque(maxlen=buffer_size)
+        self._event = asyncio.Event()
+        self._closed = False
+        self.delivered = 0
+        self.dropped = 0
+        # Son teslimden bu yana atılan mesajlar
+        self.dropped_since_last = 0
+
+    def offer(self, message: Dict[str, Any]):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+            self.dropped_since_last += 1
+        self._buffer.append(message)
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """Wait for the next message; returns None once closed"""
+        while not self._buffer:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        self.delivered += 1
+        return self._buffer.popleft()
+
+
+class LiveBroadcaster:
+    """Publish one camera's results to any number of viewers.
+
+    Inference runs once in the camera's ingest session; ``publish`` only
+    appends the result to each viewer's buffer, so the cost per extra viewer
+    is one send. Must be used from the event loop thread.
+    """
+
+    def __init__(self, max_subscribers: int = LIVE_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._channels: Dict[str, Set[Subscriber]] = {}
+        self.stats = {"published": 0}
+
+    def subscribe(self, camera_id: str, binary: bool = False) -> Subscriber:
+        channel = self._channels.setdefault(camera_id, set())
+        if len(channel) >= self.max_subscribers:
+            raise SubscriberLimitError(f"Camera {camera_id} already has {self.max_subscribers} viewers")
+        subscriber = Subscriber(camera_id, binary)
+        channel.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.close()
+        channel = self._channels.get(subscriber.camera_id)
+        if channel is None:
+            return
+        channel.discard(subscriber)
+        if not channel:
+            del self._channels[subscriber.camera_id]
+
+    def has_subscribers(self, camera_id: str) -> bool:
+        return bool(self._channels.get(camera_id))
+
+    def publish(self, camera_id: str, payload: Dict[str, Any]) -> int:
+        """Queue ``payload`` for every viewer of ``camera_id``; returns the viewer count"""
+        channel = self._channels.get(camera_id)
+        if not channel:
+            return 0
+        # JSON bir kez kodlanır, tüm izleyicilere aynı bytes gider
+        message = {"payload": payload, "encoded": dumps(payload)}
+        for subscriber in channel:
+            subscriber.offer(message)
+        self.stats["published"] += 1
+        return len(channel)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "cameras": {
+                camera_id: {
+                    "subscribers": len(channel),
+                    "delivered": sum(s.delivered for s in channel),
+                    "dropped": sum(s.dropped for s in channel)
+                }
+                for camera_id, channel in self._channels.items()
+            }
+        }
@@ -0,0 +1,197 @@
+"""Compact binary result protocol for the live websocket (``vs-bin-1``).
+
+The wire format is specified in ``docs/live_protocol.md``; keep the two in
+sync. All integers are little-endian.
+"""
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+SUBPROTOCOL = "vs-bin-1"
+MAGIC = b"VS"
+VERSION = 2
+
+MSG_KEYFRAME = 1
+MSG_DELTA = 2
+
+FLAG_SUSPICIOUS = 0x01
+
+BEHAVIOR_CODES = {None: 0, "stationary": 1, "moving": 2, "interacting": 3, "erratic": 4}
+BEHAVIOR_NAMES = {code: name for name, code in BEHAVIOR_CODES.items()}
+
+# magic, version, type, frame_number, timestamp_ms, latency_ms, dropped_frames,
+# degradation_level, skipped_frames, rate_limited_frames, class_def_count, upsert_count, removal_count
+HEADER = struct.Struct("<2sBBIQfHBIIHHH")
+# class_id, name_length (followed by UTF-8 name)
+CLASS_DEF = struct.Struct("<HB")
+# track_id, class_id, x1, y1, x2, y2, confidence, anomaly, behavior, flags
+TRACK = struct.Struct("<IHhhhhBBBB")
+REMOVAL = struct.Struct("<I")
+
+
+def _clamp_i16(value: float) -> int:
+    return max(-32768, min(32767, int(value)))
+
+
+def _quantize(value: float) -> int:
+    return max(0, min(255, int(round(float(value) * 255))))
+
+
+class DeltaEncoder:
+    """Per-connection encoder that sends only changed tracks between keyframes.
+
+    Tracks are compared with the last record sent for them, not with the
+    previous frame, so slow motion below ``move_threshold`` per frame is
+    sent once it adds up.
+    """
+
+    def __init__(self, keyframe_interval: int = 30, move_threshold: int = 2):
+        self.keyframe_interval = keyframe_interval
+        self.move_threshold = move_threshold
+        self._previous: Dict[int, tuple] = {}
+        self._class_ids: Dict[str, int] = {}
+        self._messages_since_keyframe = None
+
+    def _class_id(self, class_name: str, new_classes: List[tuple]) -> int:
+        class_id = self._class_ids.get(class_name)
+        if class_id is None:
+            class_id = len(self._class_ids)
+            self._class_ids[class_name] = class_id
+            new_classes.append((class_id, class_name))
+        return class_id
+
+    def _changed(self, old: tuple, new: tuple) -> bool:
+        # Kayıt düzeni TRACK ile aynı: id, class, bbox(4), confidence, anomaly, behavior, flags
+        if old[1] != new[1] or old[8:] != new[8:]:
+            return True
+        if abs(old[6] - new[6]) > 12 or abs(old[7] - new[7]) > 12:  # ~0.05
+            return True
+        return any(abs(a - b) > self.move_threshold for a, b in zip(old[2:6], new[2:6]))
+
+    def encode(self, frame_number: int, detections: List[Dict[str, Any]],
+               suspicious_track_ids=(), latency_ms: float = 0.0, dropped_frames: int = 0,
+               degradation_level: int = 0, skipped_frames: int = 0, rate_limited_frames: int = 0) -> bytes:
+        """One result message; ``skipped_frames`` and ``rate_limited_frames`` are totals for the stream"""
+        keyframe = (
+            self._messages_since_keyframe is None
+            or self._messages_since_keyframe + 1 >= self.keyframe_interval
+        )
+        new_classes: List[tuple] = []
+        suspicious = set(suspicious_track_ids)
+        current: Dict[int, tuple] = {}
+        for detection in detections:
+            track_id = int(detection["track_id"])
+            x1, y1, x2, y2 = detection["bbox"]
+            flags = FLAG_SUSPICIOUS if track_id in suspicious else 0
+            current[track_id] = (
+                track_id,
+                self._class_id(detection["class_name"], new_classes),
+                _clamp_i16(x1), _clamp_i16(y1), _clamp_i16(x2), _clamp_i16(y2),
+                _quantize(detection["confidence"]),
+                _quantize(detection.get("anomaly_score", 0.0)),
+                BEHAVIOR_CODES.get(detection.get("behavior"), 0),
+                flags
+            )
+        if keyframe:
+            upserts = list(current.values())
+            removals = []
+            class_defs = [(cid, name) for name, cid in self._class_ids.items()]
+            self._messages_since_keyframe = 0
+            self._previous = dict(current)
+        else:
+            upserts = [
+                record for track_id, record in current.items()
+                if track_id not in self._previous or self._changed(self._previous[track_id], record)
+            ]
+            removals = [track_id for track_id in self._previous if track_id not in current]
+            class_defs = new_classes
+            self._messages_since_keyframe += 1
+            # Karşılaştırma istemcinin son aldığı kayda göre; eşiğin altındaki kaymalar birikip gönderilir
+            for record in upserts:
+                self._previous[record[0]] = record
+            for track_id in removals:
+                del self._previous[track_id]
+
+        parts = [HEADER.pack(
+            MAGIC, VERSION, MSG_KEYFRAME if keyframe else MSG_DELTA,
+            frame_number & 0xFFFFFFFF, int(time.time() * 1000),
+            float(latency_ms), min(int(dropped_frames), 0xFFFF), min(int(degradation_level), 0xFF),
+            min(int(skipped_frames), 0xFFFFFFFF), min(int(rate_limited_frames), 0xFFFFFFFF),
+            len(class_defs), len(upserts), len(removals)
+        )]
+        for class_id, name in class_defs:
+            encoded = name.encode("utf-8")[:255]
+            parts.append(CLASS_DEF.pack(class_id, len(encoded)))
+            parts.append(encoded)
+        for record in upserts:
+            parts.append(TRACK.pack(*record))
+        for track_id in removals:
+            parts.append(REMOVAL.pack(track_id))
+        return b"".join(parts)
+
+
+class DeltaDecoder:
+    """Reference decoder mirroring the spec; keeps the client-side track table"""
+
+    def __init__(self):
+        self.classes: Dict[int, str] = {}
+        self.tracks: Dict[int, Dict[str, Any]] = {}
+
+    def decode(self, message: bytes) -> Dict[str, Any]:
+        (magic, version, msg_type, frame_number, timestamp_ms, latency_ms, dropped_frames, degradation_level,
+         skipped_frames, rate_limited_frames, class_count, upsert_count, removal_count) = HEADER.unpack_from(message, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unsupported live protocol message")
+        offset = HEADER.size
+
+        for _ in range(class_count):
+            class_id, length = CLASS_DEF.unpack_from(message, offset)
+            offset += CLASS_DEF.size
+            self.classes[class_id] = bytes(message[offset:offset + length]).decode("utf-8")
+            offset += length
+
+        if msg_type == MSG_KEYFRAME:
+            self.tracks = {}
+        for _ in range(upsert_count):
+            (track_id, class_id, x1, y1, x2, y2, confidence, anomaly,
+             behavior, flags) = TRACK.unpack_from(message, offset)
+            offset += TRACK.size
+            self.tracks[track_id] = {
+                "track_id": track_id,
+                "class_name": self.classes.get(class_id, str(class_id)),
+                "bbox": [x1, y1, x2, y2],
+                "confidence": confidence / 255,
+                "anomaly_score": anomaly / 255,
+                "behavior": BEHAVIOR_NAMES.get(behavior),
+                "suspicious": bool(flags & FLAG_SUSPICIOUS)
+            }
+        for _ in range(removal_count):
+            (track_id,) = REMOVAL.unpack_from(message, offset)
+            offset += REMOVAL.size
+            self.tracks.pop(track_id, None)
+
+        return {
+            "keyframe": msg_type == MSG_KEYFRAME,
+            "frame_number": frame_number,
+            "timestamp_ms": timestamp_ms,
+            "latency_ms": latency_ms,
+            "dropped_frames": dropped_frames,
+            "degradation_level": degradation_level,
+            "skipped_frames": skipped_frames,
+            "rate_limited_frames": rate_limited_frames,
+            "detections": list(self.tracks.values())
+        }
+
+
+def negotiate(requested_subprotocols: List[str], query_protocol: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """Return ``(use_binary, subprotocol_to_accept)`` for a connecting client.
+
+    Browsers should request the ``vs-bin-1`` subprotocol; clients that cannot
+    set subprotocols may pass ``?protocol=binary`` instead, in which case no
+    subprotocol is echoed back.
+    """
+    if SUBPROTOCOL in (requested_subprotocols or []):
+        return True, SUBPROTOCOL
+    if query_protocol in ("binary", SUBPROTOCOL):
+        return True, None
+    return False, None
@@ -0,0 +1,226 @@
+import os
+import time
+import uuid
+import secrets
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from utils.metrics import StageRecorder
+
+logger = logging.getLogger(__name__)
+
+LIVE_MAX_SESSIONS = int(os.getenv("LIVE_MAX_SESSIONS", "32"))
+LIVE_SESSION_IDLE_SECONDS = float(os.getenv("LIVE_SESSION_IDLE_SECONDS", "60"))
+LIVE_SESSION_MAX_TRACKS = int(os.getenv("LIVE_SESSION_MAX_TRACKS", "128"))
+
+
+class SessionLimitError(Exception):
+    """Raised when no session slot is free and none can be evicted"""
+
+
+class UnknownSessionError(Exception):
+    """Raised when a request names a session token this worker does not hold"""
+
+
+class LiveSession:
+    """Per-camera state: the tracker/processor plus timing counters.
+
+    ``lock`` serialises frames of the same session, so two concurrent
+    ``/frame`` requests carrying the same token cannot interleave inside the
+    tracker.
+    """
+
+    def __init__(self, processor, name: str, kind: str, max_tracks: int = LIVE_SESSION_MAX_TRACKS,
+                 key: str = None):
+        self.session_id = uuid.uuid4().hex[:12]
+        self.token = secrets.token_urlsafe(24)
+        self.name = name
+        self.kind = kind
+        # Token'sız istemcilerin oturumu bu anahtarla (kamera veya istemci adresi) bulunur
+        self.key = key
+        self.processor = processor
+        self.max_tracks = max_tracks
+        # İlk frame'de seçilen JPEG decode ölçeği; tracker koordinatları oturum boyunca aynı ölçekte kalır
+        self.decode_factor: Optional[int] = None
+        self.lock = threading.Lock()
+        self.created_at = time.time()
+        self.last_seen = time.monotonic()
+        self.frames = 0
+        self.active = 0
+        self.last_latency_ms = 0.0
+        self.avg_latency_ms = 0.0
+        self._frame_times = deque(maxlen=30)
+        # Aşama süreleri bu oturumun kamera etiketiyle kaydedilir
+        self.stages = StageRecorder(name, kind)
+        # Admin profil isteği açıkken bu oturumun frame'lerini işleyen thread'ler örneklenir
+        self.profile_run = None
+        model = getattr(processor, "model", None)
+        if model is not None and hasattr(model, "stages"):
+            model.stages = self.stages
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def record_frame(self, latency_ms: float):
+        now = time.monotonic()
+        self.last_seen = now
+        self.frames += 1
+        self._frame_times.append(now)
+        self.last_latency_ms = latency_ms
+        # Üstel hareketli ortalama; ilk frame doğrudan alınır
+        self.avg_latency_ms = latency_ms if self.frames == 1 else 0.9 * self.avg_latency_ms + 0.1 * latency_ms
+        model = getattr(self.processor, "model", None)
+        if model is not None and hasattr(model, "prune_state"):
+            model.prune_state(self.max_tracks)
+
+    @property
+    def fps(self) -> float:
+        if len(self._frame_times) < 2:
+            return 0.0
+        span = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / span if span > 0 else 0.0
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_seen
+
+    def summary(self) -> Dict[str, Any]:
+        model = getattr(self.processor, "model", None)
+        return {
+            "session_id": self.session_id,
+            "name": self.name,
+            "kind": self.kind,
+            "created_at": self.created_at,
+            "idle_seconds": round(self.idle_seconds(), 3),
+            "frames": self.frames,
+            "fps": round(self.fps, 2),
+            "last_latency_ms": round(self.last_latency_ms, 2),
+            "avg_latency_ms": round(self.avg_latency_ms, 2),
+            "state": model.state_size() if model is not None and hasattr(model, "state_size") else {}
+        }
+
+
+class LiveSessionManager:
+    """Bounded registry of live sessions keyed by token.
+
+    Processors are built by ``processor_factory`` (which should reuse a
+    shared model, so a session only costs its tracker state). Sessions that
+    have been idle longer than ``idle_timeout`` are evicted on every create
+    and lookup and by ``evict_idle``; sessions in use (an open websocket or a
+    frame in flight, tracked by ``LiveSession.active``) are never evicted.
+
+    Clients that send no token get one session per ``key`` (``get_or_create_keyed``)
+    instead of a new session per request. The registry lives in one worker
+    process: a token is only found by the worker that issued it, so HTTP
+    sessions need sticky routing (or a single worker) to keep their tracker.
+    """
+
+    def __init__(self, processor_factory: Callable[[], Any], max_sessions: int = LIVE_MAX_SESSIONS,
+                 idle_timeout: float = LIVE_SESSION_IDLE_SECONDS, max_tracks: int = LIVE_SESSION_MAX_TRACKS):
+        self.processor_factory = processor_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_tracks = max_tracks
+        self._sessions: Dict[str, LiveSession] = {}
+        self._keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "evicted": 0, "rejected": 0}
+
+    def _evict_idle_locked(self) -> List[LiveSession]:
+        evicted = [
+            s for s in self._sessions.values()
+            if s is not None and s.active == 0 and s.idle_seconds() > self.idle_timeout
+        ]
+        for session in evicted:
+            self._remove_locked(session)
+            session.stages.close()
+        self.stats["evicted"] += len(evicted)
+        return evicted
+
+    def _remove_locked(self, session: LiveSession):
+        del self._sessions[session.token]
+        if session.key is not None and self._keys.get(session.key) == session.token:
+            del self._keys[session.key]
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            evicted = self._evict_idle_locked()
+        for session in evicted:
+            logger.info(f"Evicted idle live session {session.session_id} ({session.name})")
+        return len(evicted)
+
+    def create(self, name: str = None, kind: str = "http", key: str = None) -> LiveSession:
+        """Create a session; raises SessionLimitError when the registry is full"""
+        with self._lock:
+            self._evict_idle_locked()
+            if len(self._sessions) >= self.max_sessions:
+                self.stats["rejected"] += 1
+                raise SessionLimitError(f"Live session limit reached ({self.max_sessions})")
+            # Slot'u processor oluşmadan ayır, böylece limit yarışta aşılmaz
+            placeholder = secrets.token_urlsafe(24)
+            self._sessions[placeholder] = None
+        try:
+            processor = self.processor_factory()
+        except Exception:
+            with self._lock:
+                self._sessions.pop(placeholder, None)
+            raise
+        session = LiveSession(processor, name or "anonymous", kind, self.max_tracks, key)
+        with self._lock:
+            self._sessions.pop(placeholder, None)
+            existing = self._sessions.get(self._keys.get(key)) if key is not None else None
+            if existing is None:
+                self._sessions[session.token] = session
+                if key is not None:
+                    self._keys[key] = session.token
+                self.stats["created"] += 1
+        if existing is not None:
+            # Aynı anahtar için eşzamanlı iki istek; ilk oluşturulan oturum kullanılır
+            session.stages.close()
+            existing.touch()
+            return existing
+        logger.info(f"Created live session {session.session_id} ({session.name}, {kind})")
+        return session
+
+    def get(self, token: Optional[str]) -> Optional[LiveSession]:
+        if not token:
+            return None
+        with self._lock:
+            self._evict_idle_locked()
+            session = self._sessions.get(token)
+        if session is not None:
+            session.touch()
+        return session
+
+    def get_or_create(self, token: Optional[str], name: str = None, kind: str = "http") -> LiveSession:
+        return self.get(token) or self.create(name, kind)
+
+    def get_or_create_keyed(self, key: str, name: str = None, kind: str = "http") -> LiveSession:
+        """Session for a client that sends no token, shared by all its requests"""
+        with self._lock:
+            self._evict_idle_locked()
+            session = self._sessions.get(self._keys.get(key))
+        if session is not None:
+            session.touch()
+            return session
+        return self.create(name, kind, key)
+
+    def close(self, session: LiveSession):
+        with self._lock:
+            if self._sessions.get(session.token) is session:
+                self._remove_locked(session)
+        session.stages.close()
+
+    def sessions(self) -> List[LiveSession]:
+        with self._lock:
+            return [s for s in self._sessions.values() if s is not None]
+
+    def get_stats(self) -> Dict[str, Any]:
+        sessions = self.sessions()
+        return {
+            **self.stats,
+            "active": len(sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "sessions": [s.summary() for s in sessions]
+        }
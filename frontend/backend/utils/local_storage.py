@@ -0,0 +1,260 @@
+import os
+import json
+import hmac
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+from urllib.parse import urlencode
+from utils.serialization import dumps, loads
+from utils.storage import PreconditionFailedError
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStorageConnector:
+    """Filesystem stand-in for GCPConnector.
+
+    Implements the same methods on top of a local directory so the API can
+    run offline (development, tests, load generation). Signed URLs point to
+    the ``/api/local-storage`` route and are authenticated with an HMAC, which
+    lets clients exercise the direct-upload flow exactly as they would
+    against the bucket.
+    """
+
+    def __init__(self, root_dir: str = None, base_url: str = None, secret: str = None):
+        self.root_dir = os.path.abspath(root_dir or os.getenv("LOCAL_STORAGE_DIR", "local_storage"))
+        self.base_url = (base_url or os.getenv(
+            "LOCAL_STORAGE_BASE_URL", "http://localhost:8000/api/local-storage"
+        )).rstrip("/")
+        self.secret = (secret or os.getenv("LOCAL_STORAGE_SECRET", "local-dev-secret")).encode()
+        self.bucket_name = f"local:{self.root_dir}"
+        self._sessions_dir = os.path.join(self.root_dir, ".resumable")
+        self._lock = threading.Lock()
+        os.makedirs(self._sessions_dir, exist_ok=True)
+        logger.info(f"LocalStorageConnector initialized at: {self.root_dir}")
+
+    def resolve_path(self, blob_name: str) -> str:
+        """Map a blob name to a path inside the storage root"""
+        path = os.path.abspath(os.path.join(self.root_dir, blob_name.lstrip("/")))
+        if not path.startswith(self.root_dir + os.sep):
+            raise ValueError(f"Invalid blob name: {blob_name}")
+        return path
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def upload_file(self, source_file_name: str, destination_blob_name: str):
+        """Copies a file into the storage root."""
+        path = self.resolve_path(destination_blob_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source_file_name, tmp_path)
+        os.replace(tmp_path, path)
+
+    def download_file(self, source_blob_name: str, destination_file_name: str):
+        """Copies a stored blob to a local file."""
+        shutil.copyfile(self.resolve_path(source_blob_name), destination_file_name)
+
+    def list_files(self):
+        """Lists all the blobs in the storage root."""
+        names = []
+        for dirpath, dirnames, filenames in os.walk(self.root_dir):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                names.append(os.path.relpath(os.path.join(dirpath, filename), self.root_dir).replace(os.sep, "/"))
+        return sorted(names)
+
+    def blob_exists(self, gcp_path: str) -> bool:
+        """Check whether a blob exists"""
+        return os.path.isfile(self.resolve_path(gcp_path))
+
+    def upload_bytes(self, data: bytes, gcp_path: str, content_type: str = "application/octet-stream",
+                     if_generation_match: int = None) -> str:
+        """Store raw bytes and return the blob path"""
+        path = self.resolve_path(gcp_path)
+        if if_generation_match is None:
+            self._write_atomic(path, data)
+            return gcp_path
+        # Koşullu yazmalar süreçler arası kilitle sıralanır; GCS'te bu garantiyi sunucu verir
+        with self._lock, open(os.path.join(self._sessions_dir, "generation.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            current = os.stat(path).st_mtime_ns if os.path.isfile(path) else 0
+            if current != if_generation_match:
+                raise PreconditionFailedError(f"{gcp_path} is not at generation {if_generation_match}")
+            self._write_atomic(path, data)
+            # mtime çözünürlüğü kaba olabilir; yeni generation eskisinden büyük olmalı
+            if os.stat(path).st_mtime_ns <= current:
+                os.utime(path, ns=(current + 1, current + 1))
+        return gcp_path
+
+    def download_bytes(self, gcp_path: str, if_generation_match: int = None) -> bytes:
+        """Read a blob as bytes"""
+        try:
+            with open(self.resolve_path(gcp_path), "rb") as f:
+                # Yazmalar dosyayı değiştirmez, yerine yenisini koyar; açılan dosyanın generation'ı okunan içeriğinkidir
+                if if_generation_match is not None and os.fstat(f.fileno()).st_mtime_ns != if_generation_match:
+                    raise PreconditionFailedError(f"{gcp_path} is not at generation {if_generation_match}")
+                return f.read()
+        except PreconditionFailedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading local blob: {str(e)}")
+            raise Exception(f"Failed to read local blob: {str(e)}")
+
+    def iter_bytes(self, gcp_path: str, chunk_size: int = 1024 * 1024):
+        """Stream a blob in chunks"""
+        with open(self.resolve_path(gcp_path), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def compose(self, source_paths: list, destination_path: str, content_type: str = None) -> str:
+        """Concatenate blobs into a single destination blob"""
+        path = self.resolve_path(destination_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as out:
+            for source in source_paths:
+                with open(self.resolve_path(source), "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(tmp_path, path)
+        return destination_path
+
+    def delete_blob(self, gcp_path: str):
+        """Delete a blob"""
+        path = self.resolve_path(gcp_path)
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def upload_video(self, local_path: str) -> str:
+        """Store a video and return its blob path"""
+        filename = os.path.basename(local_path)
+        gcp_path = f"videos/{datetime.utcnow().strftime('%Y/%m/%d')}/{filename}"
+        self.upload_file(local_path, gcp_path)
+        logger.info(f"Video stored locally: {gcp_path}")
+        return gcp_path
+
+    def save_results(self, video_id: str, results: dict) -> str:
+        """Store analysis results and return the results path"""
+        results_path = f"results/{video_id}/analysis.json"
+        self.upload_bytes(dumps(results), results_path, content_type="application/json")
+        logger.info(f"Results saved locally: {results_path}")
+        return results_path
+
+    def get_results(self, results_path: str) -> dict:
+        """Load analysis results"""
+        try:
+            return loads(self.download_bytes(results_path))
+        except Exception as e:
+            logger.error(f"Error getting local results: {str(e)}")
+            raise Exception(f"Failed to get local results: {str(e)}")
+
+    def get_blob_metadata(self, gcp_path: str):
+        """Return size/generation metadata for a blob, or None if it does not exist"""
+        path = self.resolve_path(gcp_path)
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        return {
+            "path": gcp_path,
+            "size": stat.st_size,
+            "generation": stat.st_mtime_ns,
+            "content_type": None,
+            "md5_hash": None
+        }
+
+    def _signature(self, method: str, blob_name: str, expires: int) -> str:
+        message = f"{method.upper()}\n{blob_name}\n{expires}".encode()
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def verify_signature(self, method: str, blob_name: str, expires: int, signature: str) -> bool:
+        """Validate a signed URL issued by this connector"""
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(method, blob_name, expires), signature or "")
+
+    def generate_signed_url(self, gcp_path: str, expiration: int = 3600, method: str = "GET",
+                            content_type: str = None, headers: dict = None) -> str:
+        """Generate an HMAC-signed URL served by the local storage route"""
+        self.resolve_path(gcp_path)
+        expires = int(time.time()) + expiration
+        query = urlencode({
+            "method": method.upper(),
+            "expires": expires,
+            "signature": self._signature(method, gcp_path, expires)
+        })
+        return f"{self.base_url}/{gcp_path}?{query}"
+
+    def create_resumable_upload_url(self, gcp_path: str, content_type: str, expiration: int = 3600) -> dict:
+        """Generate a signed URL that starts a resumable upload (GCS-compatible flow)"""
+        headers = {"x-goog-resumable": "start"}
+        return {
+            "url": self.generate_signed_url(gcp_path, expiration=expiration, method="POST"),
+            "method": "POST",
+            "headers": {**headers, "Content-Type": content_type}
+        }
+
+    def start_resumable_session(self, gcp_path: str, expiration: int = 3600) -> str:
+        """Open a resumable session and return the session URI for chunk PUTs"""
+        session_id = uuid.uuid4().hex
+        session_path = os.path.join(self._sessions_dir, session_id)
+        with open(session_path, "wb"):
+            pass
+        with open(f"{session_path}.json", "w") as f:
+            json.dump({"path": gcp_path}, f)
+        return self.generate_signed_url(f".resumable/{session_id}", expiration=expiration, method="PUT")
+
+    def write_resumable_chunk(self, session_id: str, data: bytes, content_range: str = None) -> dict:
+        """Append a chunk to a resumable session.
+
+        Follows the GCS semantics: ``Content-Range: bytes start-end/total``
+        (``*`` when the total is still unknown). The object is published
+        atomically once the last byte arrives.
+        """
+        session_path = os.path.join(self._sessions_dir, session_id)
+        if not os.path.isfile(f"{session_path}.json"):
+            raise FileNotFoundError(f"Unknown upload session: {session_id}")
+        with open(f"{session_path}.json") as f:
+            target = json.load(f)["path"]
+
+        start, total = 0, None
+        if content_range:
+            unit_range = content_range.replace("bytes", "").strip()
+            span, _, total_str = unit_range.partition("/")
+            if span != "*":
+                start = int(span.split("-")[0])
+            total = None if total_str in ("", "*") else int(total_str)
+        else:
+            total = len(data)
+
+        with self._lock:
+            current = os.path.getsize(session_path)
+            if start != current:
+                return {"complete": False, "received": current}
+            with open(session_path, "ab") as f:
+                f.write(data)
+            received = current + len(data)
+            if total is not None and received >= total:
+                final_path = self.resolve_path(target)
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(session_path, final_path)
+                os.remove(f"{session_path}.json")
+                return {"complete": True, "received": received, "path": target}
+        return {"complete": False, "received": received}
@@ -0,0 +1,222 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, disable_created_metrics,
+    generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# *_created serileri kamera başına seri sayısını ikiye katlar; kullanılmıyor
+disable_created_metrics()
+
+# Kamera başına etiket çok fazla seri üretirse kapatılır; etiket oturum türüne düşer
+METRICS_CAMERA_LABELS = os.getenv("METRICS_CAMERA_LABELS", "true").lower() == "true"
+# Birden çok process (analiz worker'ları, preload-fork) tek /metrics'ten okunacaksa ayarlanır
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Frame aşamaları 1 ms altından birkaç saniyeye kadar
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STORAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "visionsleuth_stage_seconds", "Per-frame pipeline stage latency",
+    ["stage", "camera", "model"], buckets=STAGE_BUCKETS
+)
+FRAMES = Counter("visionsleuth_frames", "Frames run through tracking and analysis", ["camera", "model"])
+FRAME_ERRORS = Counter("visionsleuth_frame_errors", "Frames that failed inside the detector", ["camera"])
+DROPPED_FRAMES = Counter(
+    "visionsleuth_dropped_frames", "Frames received but never processed", ["camera", "reason"]
+)
+STORAGE_SECONDS = Histogram(
+    "visionsleuth_storage_seconds", "Storage call latency including retries", ["operation"], buckets=STORAGE_BUCKETS
+)
+STORAGE_ERRORS = Counter("visionsleuth_storage_errors", "Storage calls that failed after retries", ["operation"])
+CACHE_REQUESTS = Counter("visionsleuth_cache_requests", "Cache lookups by cache and result", ["cache", "result"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "visionsleuth_http_request_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS
+)
+
+# Bir kameranın tüm serileri, o kameraya ait son kaydedici kapanınca silinir
+_camera_refs: Dict[str, int] = {}
+_camera_series: Dict[str, Set[Tuple[Any, Tuple[str, ...]]]] = {}
+_camera_lock = threading.Lock()
+
+
+def _retain(camera: str):
+    with _camera_lock:
+        _camera_refs[camera] = _camera_refs.get(camera, 0) + 1
+
+
+def _release(camera: str):
+    with _camera_lock:
+        refs = _camera_refs.get(camera, 0) - 1
+        if refs > 0:
+            _camera_refs[camera] = refs
+            return
+        _camera_refs.pop(camera, None)
+        series = _camera_series.pop(camera, set())
+    for metric, labels in series:
+        try:
+            metric.remove(*labels)
+        except KeyError:
+            pass
+
+
+def _bind(metric, camera: str, *labels: str):
+    with _camera_lock:
+        _camera_series.setdefault(camera, set()).add((metric, labels))
+    return metric.labels(*labels)
+
+
+class StageRecorder:
+    """Stage timings and frame counters of one stream (a live session or batch analyses).
+
+    Label children are bound once per ``(stage, model)`` and cached, so a
+    per-frame observation is a dict lookup plus the histogram update.
+    Closing the last recorder of a camera removes that camera's series.
+    ``totals`` keeps this recorder's own count and seconds per stage, for
+    per-job and per-session breakdowns; it is updated under a lock, since
+    shared recorders (``shared_recorder``) are observed from many threads.
+    """
+
+    def __init__(self, camera: str, kind: str = "live"):
+        self.camera = camera if METRICS_CAMERA_LABELS else kind
+        self._children: Dict[Tuple[Any, ...], Any] = {}
+        self._closed = False
+        self.totals: Dict[str, List[float]] = {}
+        self._totals_lock = threading.Lock()
+        _retain(self.camera)
+
+    def _child(self, key: Tuple[Any, ...], metric, *labels: str):
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = _bind(metric, self.camera, *labels)
+        return child
+
+    def observe(self, stage: str, model: str, seconds: float):
+        self._child((stage, model), STAGE_SECONDS, stage, self.camera, model).observe(seconds)
+        with self._totals_lock:
+            total = self.totals.get(stage)
+            if total is None:
+                total = self.totals[stage] = [0, 0.0]
+            total[0] += 1
+            total[1] += seconds
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        with self._totals_lock:
+            return {stage: list(total) for stage, total in self.totals.items()}
+
+    def breakdown(self, since: Dict[str, List[float]] = None) -> Dict[str, Dict[str, float]]:
+        """Count, total seconds and mean milliseconds per stage, slowest stage first.
+
+        With ``since`` (an earlier ``snapshot``) only the time after it is counted.
+        """
+        since = since or {}
+        rows = [
+            (stage, (count - since.get(stage, (0, 0.0))[0], seconds - since.get(stage, (0, 0.0))[1]))
+            for stage, (count, seconds) in self.snapshot().items()
+        ]
+        rows = sorted((row for row in rows if row[1][0] > 0), key=lambda item: -item[1][1])
+        return {
+            stage: {"count": int(count), "seconds": round(seconds, 4),
+                    "mean_ms": round(seconds * 1000 / count, 3) if count else 0.0}
+            for stage, (count, seconds) in rows
+        }
+
+    def frame(self, model: str):
+        self._child(("frames", model), FRAMES, self.camera, model).inc()
+
+    def error(self):
+        self._child(("errors",), FRAME_ERRORS, self.camera).inc()
+
+    def dropped(self, reason: str, count: int = 1):
+        if count:
+            self._child(("dropped", reason), DROPPED_FRAMES, self.camera, reason).inc(count)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._children.clear()
+            _release(self.camera)
+
+
+_shared_recorders: Dict[str, StageRecorder] = {}
+
+
+def shared_recorder(name: str) -> StageRecorder:
+    """Process-wide recorder for streams without a camera of their own (e.g. batch analyses)"""
+    recorder = _shared_recorders.get(name)
+    if recorder is None:
+        recorder = _shared_recorders.setdefault(name, StageRecorder(name, name))
+    return recorder
+
+
+@contextmanager
+def storage_timer(operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STORAGE_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        STORAGE_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+
+def cache_lookup(cache: str, result: str):
+    """Count a lookup; ``result`` is ``hit``, ``miss`` or a cache-specific outcome such as ``not_modified``"""
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+# Kuyruk derinliği, oturum sayısı gibi değerler frame başına değil, scrape anında okunur
+_gauges: List[Tuple[str, str, Sequence[str], Callable[[], Iterable[Tuple[Sequence[str], float]]]]] = []
+
+
+def register_gauge(name: str, documentation: str, labelnames: Sequence[str],
+                   callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+    """Expose a gauge whose ``(label_values, value)`` samples are read from ``callback`` at scrape time"""
+    _gauges.append((name, documentation, labelnames, callback))
+
+
+class _ScrapeCollector:
+    def describe(self):
+        return []
+
+    def collect(self):
+        for name, documentation, labelnames, callback in list(_gauges):
+            family = GaugeMetricFamily(name, documentation, labels=labelnames)
+            try:
+                for labels, value in callback():
+                    family.add_metric(list(labels), value)
+            except Exception as e:
+                logger.warning(f"Metric {name} could not be collected: {str(e)}")
+                continue
+            yield family
+
+
+_scrape_collector = _ScrapeCollector()
+REGISTRY.register(_scrape_collector)
+
+
+def render() -> Tuple[bytes, str]:
+    """Exposition text and content type for ``/metrics``.
+
+    With ``PROMETHEUS_MULTIPROC_DIR`` set, histograms and counters are
+    merged across all processes writing to that directory; scrape-time
+    gauges still come from the process serving the request.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_scrape_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
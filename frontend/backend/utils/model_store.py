@@ -0,0 +1,328 @@
+"""Host-wide cache of model weights and their exported formats.
+
+Layout under ``MODEL_CACHE_DIR``::
+
+    manifest.json                  variants, checksums and formats
+    yolov8x.lock                   download/export lock for one model
+    yolov8x/<sha256[:16]>/yolov8x.pt
+    yolov8x/<sha256[:16]>/yolov8x.onnx
+
+Every version lives in its own directory named after its content hash.
+A download goes to a temporary file in the cache, is checked against the
+expected SHA-256 (``MODEL_SHA256_<NAME>``, else the checksum the manifest
+pinned on the first download) and is renamed into place atomically, so
+no process can load a half-written file. The download runs under an
+``flock`` on the model's lock file: the first process on the host
+fetches, and the others wait and then find the finished entry. A warm
+start reads the manifest and stats the file, with no network I/O; with
+``MODEL_CACHE_VERIFY=always`` the file is re-hashed on every load.
+
+Sources are tried in order: the storage bucket (``models/<name>.pt``),
+then the ultralytics release assets.
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: kilit yalnızca süreç içinde geçerli
+    fcntl = None
+
+from utils.raw_detections import file_sha256
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_DIR = os.getenv(
+    "MODEL_CACHE_DIR",
+    os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "visionsleuth", "models")
+)
+# download: SHA-256 indirirken doğrulanır, sıcak açılışta boyut yeter; always: her yüklemede yeniden hesaplanır
+MODEL_CACHE_VERIFY = os.getenv("MODEL_CACHE_VERIFY", "download").lower()
+MODEL_CACHE_LOCK_TIMEOUT = float(os.getenv("MODEL_CACHE_LOCK_TIMEOUT", "900"))
+MODEL_BUCKET_PREFIX = os.getenv("MODEL_BUCKET_PREFIX", "models")
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+class ModelCacheError(RuntimeError):
+    """A model could not be fetched, verified or locked"""
+
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path: str, timeout: float = MODEL_CACHE_LOCK_TIMEOUT):
+    """Exclusive lock across every process on the host; the kernel releases it if the holder dies"""
+    with _thread_locks_guard:
+        local = _thread_locks.setdefault(path, threading.Lock())
+    if not local.acquire(timeout=timeout):
+        raise ModelCacheError(f"Timed out waiting for {path}")
+    try:
+        if fcntl is None:
+            yield
+            return
+        with open(path, "a+") as f:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise ModelCacheError(f"Timed out after {timeout}s waiting for {path}")
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    finally:
+        local.release()
+
+
+def _from_bucket(name: str, destination: str):
+    from utils.storage import get_storage_connector
+    connector = get_storage_connector()
+    blob = f"{MODEL_BUCKET_PREFIX}/{name}.pt"
+    if not connector.blob_exists(blob):
+        raise FileNotFoundError(f"{blob} not in bucket")
+    connector.download_file(blob, destination)
+
+
+def _from_ultralytics(name: str, destination: str):
+    from ultralytics.utils.downloads import attempt_download_asset
+    path = attempt_download_asset(destination)
+    # Ultralytics ayarlarındaki weights dizininde zaten varsa oradan döner
+    if os.path.abspath(path) != os.path.abspath(destination) and os.path.isfile(path):
+        shutil.copyfile(path, destination)
+    if not os.path.isfile(destination):
+        raise FileNotFoundError(f"{name}.pt is not an ultralytics asset")
+
+
+DEFAULT_SOURCES: List[Tuple[str, Callable[[str, str], None]]] = [
+    ("bucket", _from_bucket),
+    ("ultralytics", _from_ultralytics),
+]
+
+
+class ModelStore:
+    """Versioned, checksum-verified model files shared by every process on the host"""
+
+    def __init__(self, root: str = MODEL_CACHE_DIR, verify: str = MODEL_CACHE_VERIFY,
+                 sources: Optional[List[Tuple[str, Callable[[str, str], None]]]] = None):
+        self.root = os.path.abspath(root)
+        self.verify = verify
+        self.sources = sources if sources is not None else DEFAULT_SOURCES
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": MANIFEST_VERSION, "models": {}}
+
+    def _update_manifest(self, mutate: Callable[[Dict[str, Any]], None]):
+        with file_lock(os.path.join(self.root, ".manifest.lock")):
+            manifest = self.manifest()
+            mutate(manifest)
+            fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=self.root)
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+
+    def _current(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self.manifest()["models"].get(name)
+        if not entry or entry.get("current") not in entry.get("versions", {}):
+            return None
+        return entry["versions"][entry["current"]]
+
+    def cached(self, name: str, fmt: str = "pt") -> Optional[str]:
+        """Absolute path of the current ``name`` artifact in ``fmt`` if it is cached and intact; never downloads"""
+        variant = self._current(name)
+        artifact = (variant or {}).get("formats", {}).get(fmt)
+        if artifact is None:
+            return None
+        path = os.path.join(self.root, artifact["path"])
+        if not os.path.exists(path):
+            return None
+        if os.path.isfile(path):
+            if os.path.getsize(path) != artifact["size"]:
+                logger.warning(f"Cached {name} ({fmt}) has the wrong size, fetching it again")
+                return None
+            if self.verify == "always" and file_sha256(path) != artifact["sha256"]:
+                logger.warning(f"Cached {name} ({fmt}) failed its checksum, fetching it again")
+                return None
+        return path
+
+    def _lock_path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.lock")
+
+    def fetch(self, name: str, refresh: bool = False) -> str:
+        """Path of the cached ``name.pt``, downloading it once per host if needed.
+
+        ``refresh`` downloads again and makes the result the current
+        version even if its checksum differs from the pinned one (new
+        weights published under the same name), unless
+        ``MODEL_SHA256_<NAME>`` pins it.
+        """
+        path = None if refresh else self.cached(name)
+        if path is not None:
+            return path
+        with file_lock(self._lock_path(name)):
+            # Kilidi beklerken başka süreç indirmiş olabilir
+            path = None if refresh else self.cached(name)
+            if path is not None:
+                return path
+            return self._download(name, refresh)
+
+    def _expected_sha256(self, name: str, refresh: bool) -> Optional[str]:
+        pinned = os.getenv(f"MODEL_SHA256_{name.upper().replace('-', '_').replace('.', '_')}")
+        if pinned:
+            return pinned.lower()
+        if refresh:
+            return None
+        return self.manifest()["models"].get(name, {}).get("pinned_sha256")
+
+    def _download(self, name: str, refresh: bool) -> str:
+        expected = self._expected_sha256(name, refresh)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{name}-", dir=self.root)
+        try:
+            tmp_path = os.path.join(tmp_dir, f"{name}.pt")
+            started = time.perf_counter()
+            source = self._fetch_from_sources(name, tmp_path)
+            sha256 = file_sha256(tmp_path)
+            if expected and sha256 != expected:
+                raise ModelCacheError(f"Checksum mismatch for {name} from {source}: {sha256} != {expected}")
+            path = self._install(name, sha256, "pt", tmp_path)
+            size = os.path.getsize(path)
+
+            def record(manifest: Dict[str, Any]):
+                entry = manifest["models"].setdefault(name, {"versions": {}})
+                variant = entry["versions"].setdefault(sha256[:16], {"sha256": sha256, "formats": {}})
+                variant.update({"source": source, "fetched_at": datetime.utcnow().isoformat()})
+                variant["formats"]["pt"] = {"path": os.path.relpath(path, self.root), "sha256": sha256, "size": size}
+                entry["current"] = sha256[:16]
+                # İlk indirilen sürüm sabitlenir; bozulan dosya ancak aynı içerikle yeniden indirilir
+                entry["pinned_sha256"] = expected or sha256
+            self._update_manifest(record)
+            logger.info(f"Fetched {name} ({size / 1e6:.1f} MB, sha256 {sha256[:16]}) from {source} "
+                        f"in {time.perf_counter() - started:.1f}s")
+            return path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _fetch_from_sources(self, name: str, destination: str) -> str:
+        errors = []
+        for source, fetch in self.sources:
+            try:
+                fetch(name, destination)
+                return source
+            except Exception as e:
+                errors.append(f"{source}: {str(e)}")
+                if os.path.exists(destination):
+                    os.remove(destination)
+        raise ModelCacheError(f"Could not fetch {name}: {'; '.join(errors) or 'no sources'}")
+
+    def _install(self, name: str, sha256: str, fmt: str, tmp_path: str) -> str:
+        """Atomically move a verified file (or export directory) into the version directory"""
+        version_dir = os.path.join(self.root, name, sha256[:16])
+        os.makedirs(version_dir, exist_ok=True)
+        path = os.path.join(version_dir, os.path.basename(tmp_path))
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        return path
+
+    def export(self, name: str, fmt: str, **kwargs) -> str:
+        """Path of ``name`` exported to ``fmt`` (e.g. ``onnx``, ``torchscript``), exporting once per host and version"""
+        path = self.cached(name, fmt)
+        if path is not None:
+            return path
+        weights = self.fetch(name)
+        with file_lock(self._lock_path(name)):
+            path = self.cached(name, fmt)
+            if path is not None:
+                return path
+            variant = self._current(name)
+            sha256 = variant["sha256"]
+            tmp_dir = tempfile.mkdtemp(prefix=f".{name}-{fmt}-", dir=self.root)
+            try:
+                # Export çıktısı ağırlık dosyasının yanına yazılır; önce geçici dizinde üretilir
+                tmp_weights = os.path.join(tmp_dir, os.path.basename(weights))
+                try:
+                    os.link(weights, tmp_weights)
+                except OSError:
+                    shutil.copyfile(weights, tmp_weights)
+                from ultralytics import YOLO
+                exported = str(YOLO(tmp_weights).export(format=fmt, **kwargs))
+                path = self._install(name, sha256, fmt, exported)
+                artifact = {"path": os.path.relpath(path, self.root),
+                            "sha256": file_sha256(path) if os.path.isfile(path) else None,
+                            "size": os.path.getsize(path) if os.path.isfile(path) else None}
+
+                def record(manifest: Dict[str, Any]):
+                    manifest["models"][name]["versions"][sha256[:16]]["formats"][fmt] = artifact
+                self._update_manifest(record)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.info(f"Exported {name} ({sha256[:16]}) to {fmt}")
+            return path
+
+    def variants(self) -> List[Dict[str, Any]]:
+        """Every cached model version with its formats, current one first per model"""
+        rows = []
+        for name, entry in sorted(self.manifest()["models"].items()):
+            versions = sorted(entry.get("versions", {}).items(), key=lambda item: item[0] != entry.get("current"))
+            for version, variant in versions:
+                rows.append({
+                    "name": name,
+                    "version": version,
+                    "current": version == entry.get("current"),
+                    "source": variant.get("source"),
+                    "fetched_at": variant.get("fetched_at"),
+                    "formats": sorted(variant.get("formats", {}))
+                })
+        return rows
+
+
+_store: Optional[ModelStore] = None
+_store_lock = threading.Lock()
+
+
+def get_model_store() -> ModelStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ModelStore()
+    return _store
+
+
+def resolve_model_path(model_path: str, download: bool = True) -> str:
+    """``model_path`` if it exists, else the cached weights of the same name (``models/yolov8n.pt`` -> ``yolov8n``).
+
+    With ``download`` False nothing is fetched and ``model_path`` comes
+    back unchanged when the cache does not have the model either.
+    """
+    if os.path.exists(model_path):
+        return model_path
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    store = get_model_store()
+    if download:
+        return store.fetch(name)
+    return store.cached(name) or model_path
@@ -0,0 +1,354 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_SAMPLE_SECONDS = float(os.getenv("RESOURCE_SAMPLE_SECONDS", "5"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_POLL_SECONDS = float(os.getenv("PROFILE_POLL_SECONDS", "10"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "16"))
+PROFILE_REQUEST_PREFIX = "profiles/requests"
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # /proc yoksa (macOS) process ömrü boyunca görülen tepe değer
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def process_cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system
+
+
+class ResourceMonitor:
+    """Samples process CPU time, RSS and a progress counter on a background thread.
+
+    ``progress`` returns the number of frames done so far; the timeline
+    gives frames/sec between samples, so slow stretches of a video show up.
+    Process CPU includes every thread of the process (torch intra-op threads,
+    and other jobs in thread mode); ``job_thread_cpu_seconds`` is the
+    calling thread alone.
+    """
+
+    def __init__(self, progress: Callable[[], int], interval: float = RESOURCE_SAMPLE_SECONDS):
+        self.progress = progress
+        self.interval = interval
+        self.timeline: List[Dict[str, float]] = []
+        self.peak_rss = 0
+        self.summary: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._cpu_started = process_cpu_seconds()
+        self._thread_cpu_started = time.thread_time()
+        self._last = (self._started, self._cpu_started, self.progress())
+        self.peak_rss = current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        now, cpu, frames = time.perf_counter(), process_cpu_seconds(), self.progress()
+        rss = current_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        last_time, last_cpu, last_frames = self._last
+        span = now - last_time
+        entry = {
+            "t": round(now - self._started, 2),
+            "frames": frames,
+            "fps": round((frames - last_frames) / span, 2) if span > 0 else 0.0,
+            "cpu_percent": round((cpu - last_cpu) / span * 100, 1) if span > 0 else 0.0,
+            "rss_mb": round(rss / 1024 / 1024, 1)
+        }
+        if tracemalloc.is_tracing():
+            entry["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 1024 / 1024, 1)
+        self.timeline.append(entry)
+        self._last = (now, cpu, frames)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def reset_progress(self):
+        """Re-read the progress counter, e.g. after resuming at a later frame"""
+        self._last = (self._last[0], self._last[1], self.progress())
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling (from the thread that called ``start``) and return the summary"""
+        if self.summary is not None:
+            return self.summary
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+        wall = time.perf_counter() - self._started
+        cpu = process_cpu_seconds() - self._cpu_started
+        self.summary = {
+            "wall_seconds": round(wall, 3),
+            "process_cpu_seconds": round(cpu, 3),
+            "job_thread_cpu_seconds": round(time.thread_time() - self._thread_cpu_started, 3),
+            "cpu_utilization": round(cpu / wall, 3) if wall > 0 else 0.0,
+            "peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1)
+        }
+        return self.summary
+
+
+class SamplingProfiler:
+    """Statistical profiler for selected Python threads, aggregated as folded stacks.
+
+    Every ``interval_ms`` the stacks of the registered threads are read with
+    ``sys._current_frames`` and counted. ``folded()`` returns one
+    ``root;...;leaf count`` line per distinct stack, the input format of
+    flamegraph.pl, inferno and speedscope. Native frames (inside torch or
+    OpenCV) show up as the Python call that entered them.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_thread(self, ident: int = None):
+        ident = ident or threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def remove_thread(self, ident: int = None):
+        ident = ident or threading.get_ident()
+        with self._lock:
+            count = self._threads.get(ident, 0) - 1
+            if count > 0:
+                self._threads[ident] = count
+            else:
+                self._threads.pop(ident, None)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                targets: Set[int] = set(self._threads)
+            if not targets:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident not in targets:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if ident not in names:
+                    thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+                    names[ident] = thread.name if thread is not None else str(ident)
+                stack.append(names[ident])
+                self._stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+class MemoryTracer:
+    """tracemalloc snapshots at start and stop, reported as growth by line and top allocation sites.
+
+    tracemalloc is process-wide; concurrent tracers share one tracing
+    session and the last one to stop turns it off.
+    """
+
+    _users = 0
+    _lock = threading.Lock()
+
+    def __init__(self, frames: int = TRACEMALLOC_FRAMES, top: int = 30):
+        self.frames = frames
+        self.top = top
+        self._baseline = None
+
+    def start(self):
+        with MemoryTracer._lock:
+            if MemoryTracer._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            MemoryTracer._users += 1
+        self._baseline = self._snapshot()
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ])
+
+    def stop(self) -> str:
+        snapshot = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with MemoryTracer._lock:
+            MemoryTracer._users -= 1
+            if MemoryTracer._users == 0:
+                tracemalloc.stop()
+
+        lines = [
+            f"traced memory: current {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB",
+            "",
+            f"Top {self.top} growth by line since profiling started:"
+        ]
+        lines += [str(stat) for stat in snapshot.compare_to(self._baseline, "lineno")[:self.top]]
+        lines += ["", f"Top {min(self.top, 10)} allocation sites still alive:"]
+        for stat in snapshot.statistics("traceback")[:min(self.top, 10)]:
+            lines.append(f"{stat.count} blocks, {stat.size / 1024:.1f} KiB")
+            lines += [f"    {line}" for line in stat.traceback.format()]
+        return "\n".join(lines) + "\n"
+
+
+class ProfileRun:
+    """One profiling request: sampling profiler and/or tracemalloc, written to storage on finish.
+
+    Threads doing the profiled work call ``enter``/``exit`` (or are added
+    once for a job thread); only they are sampled.
+    """
+
+    def __init__(self, storage, output_prefix: str, sampling: bool = True, memory: bool = False,
+                 interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS, duration_seconds: Optional[float] = None):
+        self.storage = storage
+        self.output_prefix = output_prefix.rstrip("/")
+        self.profiler = SamplingProfiler(interval_ms) if sampling else None
+        self.memory = MemoryTracer() if memory else None
+        self.duration_seconds = min(duration_seconds, PROFILE_MAX_SECONDS) if duration_seconds else None
+        self.options = {"sampling": sampling, "tracemalloc": memory, "interval_ms": interval_ms,
+                        "duration_seconds": self.duration_seconds}
+        self.started_at: Optional[float] = None
+        self.finished = False
+        self.outputs: List[str] = []
+
+    def start(self) -> "ProfileRun":
+        self.started_at = time.time()
+        if self.memory is not None:
+            self.memory.start()
+        if self.profiler is not None:
+            self.profiler.start()
+        logger.info(f"Profiling started: {self.output_prefix} {json.dumps(self.options)}")
+        return self
+
+    def enter(self):
+        if self.profiler is not None:
+            self.profiler.add_thread()
+
+    def exit(self):
+        if self.profiler is not None:
+            self.profiler.remove_thread()
+
+    def expired(self) -> bool:
+        return self.duration_seconds is not None and time.time() - self.started_at >= self.duration_seconds
+
+    def finish(self, extra: Dict[str, Any] = None) -> List[str]:
+        """Stop collectors and upload their output (blocking storage calls)"""
+        if self.finished:
+            return self.outputs
+        self.finished = True
+        files: Dict[str, tuple] = {}
+        if self.profiler is not None:
+            self.profiler.stop()
+            files["profile.folded"] = (self.profiler.folded().encode(), "text/plain")
+        if self.memory is not None:
+            files["tracemalloc.txt"] = (self.memory.stop().encode(), "text/plain")
+        summary = {
+            **self.options,
+            "started_at": datetime.utcfromtimestamp(self.started_at).isoformat(),
+            "seconds": round(time.time() - self.started_at, 3),
+            "samples": self.profiler.samples if self.profiler is not None else 0,
+            **(extra or {})
+        }
+        files["profile.json"] = (json.dumps(summary, indent=2).encode(), "application/json")
+        for name, (data, content_type) in files.items():
+            path = f"{self.output_prefix}/{name}"
+            try:
+                self.storage.call_blocking("upload_bytes", data, path, content_type)
+                self.outputs.append(path)
+            except Exception as e:
+                logger.error(f"Could not store profile output {path}: {str(e)}")
+        logger.info(f"Profiling finished: {self.output_prefix} ({summary['samples']} samples)")
+        return self.outputs
+
+
+def profile_request_path(video_id: str) -> str:
+    return f"{PROFILE_REQUEST_PREFIX}/{video_id}.json"
+
+
+class JobProfiler:
+    """Picks up admin profiling requests for an analysis job, wherever the job runs.
+
+    The admin endpoint writes a request blob; the job checks for it at
+    start and then every ``PROFILE_POLL_SECONDS`` from its frame loop, so
+    process-pool and distributed workers honour it too. Output goes under
+    ``results/{video_id}/profile/`` next to the analysis results.
+    """
+
+    def __init__(self, storage, video_id: str, poll_seconds: float = PROFILE_POLL_SECONDS):
+        self.storage = storage
+        self.video_id = video_id
+        self.poll_seconds = poll_seconds
+        self.run: Optional[ProfileRun] = None
+        self._next_poll = 0.0
+
+    def poll(self):
+        """Cheap to call every frame; only touches storage once per poll interval"""
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_seconds
+        if self.run is not None:
+            if self.run.expired():
+                self.finish()
+            return
+        try:
+            path = profile_request_path(self.video_id)
+            if not self.storage.call_blocking("blob_exists", path):
+                return
+            options = json.loads(self.storage.call_blocking("download_bytes", path))
+            self.storage.call_blocking("delete_blob", path)
+        except Exception as e:
+            logger.warning(f"Could not read profiling request for {self.video_id}: {str(e)}")
+            return
+        self.run = ProfileRun(
+            self.storage, f"results/{self.video_id}/profile",
+            sampling=options.get("sampling", True),
+            memory=options.get("tracemalloc", False),
+            interval_ms=options.get("interval_ms", PROFILE_SAMPLE_INTERVAL_MS),
+            duration_seconds=options.get("duration_seconds")
+        ).start()
+        self.run.enter()
+
+    def finish(self, extra: Dict[str, Any] = None):
+        if self.run is not None and not self.run.finished:
+            self.run.exit()
+            self.run.finish(extra)
@@ -0,0 +1,253 @@
+import os
+import io
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RAW_DETECTION_CACHE = os.getenv("RAW_DETECTION_CACHE", "true").lower() == "true"
+RAW_CACHE_DIR = os.getenv("RAW_CACHE_DIR", "raw_cache")
+RAW_CONF_FLOOR = float(os.getenv("RAW_CONF_FLOOR", "0.05"))
+RAW_CACHE_PREFIX = "raw_detections"
+
+# Yeniden puanlanabilen parametreler; diğerleri modelin tekrar çalışmasını gerektirir
+RESCORE_PARAMS = ("conf_threshold", "iou_threshold", "velocity_threshold", "anomaly_threshold")
+
+_model_versions: Dict[str, str] = {}
+_model_versions_lock = threading.Lock()
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(model_path: Optional[str]) -> Optional[str]:
+    """Short content hash of a weights file, so retrained weights never reuse old outputs"""
+    if not model_path:
+        return None
+    from utils.model_store import resolve_model_path
+    # Dosya modül dizininde yoksa model önbelleğindeki kopya hash'lenir
+    model_path = resolve_model_path(model_path, download=False)
+    if not os.path.exists(model_path):
+        return None
+    with _model_versions_lock:
+        version = _model_versions.get(model_path)
+        if version is None:
+            version = file_sha256(model_path)[:16]
+            _model_versions[model_path] = version
+        return version
+
+
+class RawDetections:
+    """Per-frame raw model boxes of one video, stored as one flat float32 array plus frame offsets"""
+
+    def __init__(self, boxes: np.ndarray, offsets: np.ndarray, names: Dict[int, str], meta: Dict[str, Any]):
+        self.boxes = boxes
+        self.offsets = offsets
+        self.names = names
+        self.meta = meta
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def frame(self, index: int) -> np.ndarray:
+        return self.boxes[self.offsets[index]:self.offsets[index + 1]]
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            boxes=self.boxes,
+            offsets=self.offsets,
+            names=np.array(json.dumps({str(k): v for k, v in self.names.items()})),
+            meta=np.array(json.dumps(self.meta))
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, path: str) -> "RawDetections":
+        with np.load(path, allow_pickle=False) as data:
+            names = {int(k): v for k, v in json.loads(str(data["names"])).items()}
+            return cls(data["boxes"], data["offsets"], names, json.loads(str(data["meta"])))
+
+
+class RawDetectionRecorder:
+    """Collects ``ObjectDetector.last_raw`` frame by frame during an analysis.
+
+    Boxes are copied into one growing float32 buffer (capacity doubles when
+    full) and frame boundaries into a growing offsets array, so a long video
+    costs two arrays instead of one small array per frame, and ``build``
+    returns views of them without concatenating.
+    """
+
+    def __init__(self, expected_frames: int = 0, initial_boxes: int = 4096):
+        self._boxes = np.empty((max(1, initial_boxes), 6), dtype=np.float32)
+        self._offsets = np.zeros(max(1, expected_frames) + 1, dtype=np.int64)
+        self._frames = 0
+        self.names: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return self._frames
+
+    def append(self, raw: Optional[np.ndarray]):
+        start = self._offsets[self._frames]
+        count = 0 if raw is None else len(raw)
+        if start + count > len(self._boxes):
+            self._boxes = self._grow(self._boxes, start + count)
+        if count:
+            self._boxes[start:start + count] = raw
+        if self._frames + 2 > len(self._offsets):
+            self._offsets = self._grow(self._offsets, self._frames + 2)
+        self._frames += 1
+        self._offsets[self._frames] = start + count
+
+    @staticmethod
+    def _grow(array: np.ndarray, needed: int) -> np.ndarray:
+        grown = np.zeros((max(needed, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def build(self, meta: Dict[str, Any]) -> RawDetections:
+        offsets = self._offsets[:self._frames + 1]
+        return RawDetections(self._boxes[:offsets[-1]], offsets, self.names, meta)
+
+
+class RawDetectionCache:
+    """Raw detections keyed by video content hash, model version and input size.
+
+    Entries are kept in storage so any node can re-score a video, with a
+    local copy under ``RAW_CACHE_DIR`` to avoid repeated downloads. A small
+    pointer per video id maps analyses to their cache entry.
+    """
+
+    def __init__(self, storage, cache_dir: str = RAW_CACHE_DIR):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(video_sha: str, model_ver: str, input_size: int) -> str:
+        return f"{video_sha[:32]}-{model_ver}-{input_size}"
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def blob_path(self, key: str) -> str:
+        return f"{RAW_CACHE_PREFIX}/{key}.npz"
+
+    def pointer_path(self, video_id: str) -> str:
+        return f"{RAW_CACHE_PREFIX}/videos/{video_id}.json"
+
+    def save(self, key: str, detections: RawDetections):
+        data = detections.to_bytes()
+        tmp_path = f"{self.local_path(key)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.local_path(key))
+        self.storage.call_blocking("upload_bytes", data, self.blob_path(key))
+        logger.info(f"Raw detections cached: {key} ({len(detections)} frames, {len(data) / 1024:.0f} KB)")
+
+    def fetch(self, key: str) -> Optional[str]:
+        """Local path of the cache entry, downloading it if needed; None if it does not exist"""
+        path = self.local_path(key)
+        if os.path.exists(path):
+            return path
+        if not self.storage.call_blocking("blob_exists", self.blob_path(key)):
+            return None
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.storage.call_blocking("download_file", self.blob_path(key), tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, key: str) -> Optional[RawDetections]:
+        path = self.fetch(key)
+        return RawDetections.load(path) if path else None
+
+    def link(self, video_id: str, key: str):
+        pointer = {"key": key, "created": time.time()}
+        self.storage.call_blocking("upload_bytes", json.dumps(pointer).encode(), self.pointer_path(video_id), "application/json")
+
+    def key_for_video(self, video_id: str) -> Optional[str]:
+        if not self.storage.call_blocking("blob_exists", self.pointer_path(video_id)):
+            return None
+        return json.loads(self.storage.call_blocking("download_bytes", self.pointer_path(video_id)))["key"]
+
+
+def validate_rescore_params(params: Dict[str, Any]) -> Dict[str, float]:
+    unknown = set(params) - set(RESCORE_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}. Allowed: {', '.join(RESCORE_PARAMS)}")
+    return {name: float(value) for name, value in params.items() if value is not None}
+
+
+def rescore_cached(cache_file: str, params: Dict[str, float], output_path: Optional[str] = None) -> Dict[str, Any]:
+    """Replay thresholding, tracking, behaviour and anomaly analysis over cached raw detections.
+
+    Runs in a worker process for sweeps, so it takes a local file path and
+    returns only a summary; frame results go to ``output_path`` as NDJSON
+    when given.
+    """
+    from models.detector import ObjectDetector
+    from models.video_processor import VideoProcessor
+    from utils.serialization import dumps
+    from utils.metrics import shared_recorder
+
+    started = time.time()
+    raw = RawDetections.load(cache_file)
+    if params.get("conf_threshold", 1.0) <= raw.meta["conf_floor"]:
+        raise ValueError(f"conf_threshold must be above the cached floor {raw.meta['conf_floor']}")
+    if params.get("iou_threshold", 0.0) > raw.meta["iou_threshold"]:
+        raise ValueError(f"iou_threshold can only be lowered from the cached {raw.meta['iou_threshold']}")
+
+    detector = ObjectDetector(load_model=False)
+    detector.stages = shared_recorder("rescore")
+    for name, value in params.items():
+        setattr(detector, name, value)
+    processor = VideoProcessor(detector)
+
+    detections = suspicious = 0
+    confidence_sum = 0.0
+    classes: Dict[str, int] = {}
+    behaviors: Dict[str, int] = {}
+    output = open(output_path, "wb") if output_path else None
+    try:
+        for index in range(len(raw)):
+            frame_results = processor.process_raw(raw.frame(index), raw.names, raw_iou=raw.meta["iou_threshold"])
+            if output is not None:
+                output.write(dumps(frame_results) + b"\n")
+            detections += len(frame_results["detections"])
+            suspicious += len(frame_results["suspicious_interactions"])
+            confidence_sum += frame_results["confidence"]
+            for detection in frame_results["detections"]:
+                classes[detection["class_name"]] = classes.get(detection["class_name"], 0) + 1
+                if "behavior" in detection:
+                    behaviors[detection["behavior"]] = behaviors.get(detection["behavior"], 0) + 1
+    finally:
+        if output is not None:
+            output.close()
+
+    frames = len(raw)
+    return {
+        "params": {name: getattr(detector, name) for name in RESCORE_PARAMS},
+        "frames": frames,
+        "detections": detections,
+        "tracks": detector.next_track_id,
+        "suspicious_interactions": suspicious,
+        "average_confidence": confidence_sum / frames if frames else 0.0,
+        "detections_by_class": classes,
+        "behaviors": behaviors,
+        "rescore_seconds": round(time.time() - started, 3)
+    }
@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import register_gauge
+
+logger = logging.getLogger(__name__)
+
+# Kapalıysa model ilk istekte yüklenir; servis storage bağlanınca hazır sayılır
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+MODEL_WARMUP_RUNS = int(os.getenv("MODEL_WARMUP_RUNS", "1"))
+# Başarısız adım (ör. geçici GCS hatası) üstel bekleme ile tekrarlanır; 0 = sınırsız deneme
+STARTUP_RETRY_INITIAL_SECONDS = float(os.getenv("STARTUP_RETRY_INITIAL_SECONDS", "1"))
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", "60"))
+STARTUP_MAX_ATTEMPTS = int(os.getenv("STARTUP_MAX_ATTEMPTS", "0"))
+
+
+class StartupState:
+    """Progress of the startup steps, reported by the readiness probe.
+
+    Steps (storage connection, model load and warm-up inference) run in
+    order in the background while the liveness probe already answers; the
+    process is ready once every step has finished. A failed step is retried
+    with exponential backoff (reported as ``retrying``), so a transient
+    error delays readiness instead of failing it for the life of the
+    process; only ``STARTUP_MAX_ATTEMPTS`` (when set) makes it final.
+
+    All times are seconds since ``started_at`` (the start of the
+    application import), so the probe shows import time, time to ready and
+    time to the first served live frame.
+    """
+
+    def __init__(self, retry_initial: float = STARTUP_RETRY_INITIAL_SECONDS,
+                 retry_max: float = STARTUP_RETRY_MAX_SECONDS, max_attempts: int = STARTUP_MAX_ATTEMPTS):
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+        self.started_at = time.perf_counter()
+        self.import_seconds: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+        self.first_frame_seconds: Optional[float] = None
+        self.status = "starting"
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def elapsed(self) -> float:
+        return round(time.perf_counter() - self.started_at, 3)
+
+    def imported(self, started_at: float):
+        """Called once the application module is imported; ``started_at`` is when its import began"""
+        self.started_at = started_at
+        self.import_seconds = self.elapsed()
+
+    async def run(self, steps: List[Tuple[str, Callable[[], Awaitable[Optional[Dict[str, Any]]]]]]):
+        """Run ``(name, coroutine function)`` steps in order, retrying each until it succeeds"""
+        for name, step in steps:
+            self.steps[name] = {"status": "running"}
+            started = time.perf_counter()
+            delay = self.retry_initial
+            attempt = 1
+            while True:
+                try:
+                    details = await step()
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    seconds = round(time.perf_counter() - started, 3)
+                    if self.max_attempts and attempt >= self.max_attempts:
+                        self.steps[name] = {"status": "failed", "seconds": seconds, "attempts": attempt, "error": str(e)}
+                        self.status = "failed"
+                        logger.error(f"Startup step {name} failed after {attempt} attempts: {str(e)}")
+                        return
+                    self.steps[name] = {"status": "retrying", "seconds": seconds, "attempts": attempt,
+                                        "retry_in": delay, "error": str(e)}
+                    logger.error(f"Startup step {name} failed (attempt {attempt}), retrying in {delay:.1f}s: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+                attempt += 1
+            self.steps[name] = {"status": "done", "seconds": round(time.perf_counter() - started, 3),
+                                "attempts": attempt, **(details or {})}
+            logger.info(f"Startup step {name} done in {self.steps[name]['seconds']:.2f}s")
+        self.status = "ready"
+        self.ready_seconds = self.elapsed()
+        logger.info(f"Ready {self.ready_seconds:.2f}s after start (import {self.import_seconds}s)")
+
+    def frame_served(self):
+        if self.first_frame_seconds is None:
+            self.first_frame_seconds = self.elapsed()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "uptime_seconds": self.elapsed(),
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+            "first_frame_seconds": self.first_frame_seconds,
+            "steps": self.steps
+        }
+
+
+startup = StartupState()
+
+register_gauge(
+    "visionsleuth_startup_seconds", "Seconds from application import to each startup milestone", ["milestone"],
+    lambda: [((name,), value) for name, value in (
+        ("imported", startup.import_seconds), ("ready", startup.ready_seconds), ("first_frame", startup.first_frame_seconds)
+    ) if value is not None]
+)
@@ -0,0 +1,115 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from utils.metrics import cache_lookup
+from utils.storage import PreconditionFailedError
+
+logger = logging.getLogger(__name__)
+
+RESULTS_CACHE_MAX_BYTES = int(os.getenv("RESULTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class ResultsCache:
+    """Bounded LRU (by bytes) of serialized analysis results.
+
+    Entries are revalidated against the blob generation before being
+    served, so a re-written results blob is picked up on the next request
+    while unchanged blobs are never downloaded twice. Downloads are
+    conditional on the generation just read, so a body is always cached
+    under the ETag of the generation it came from. The cached value is the
+    raw JSON body, which lets the route return it without re-serialising.
+    """
+
+    def __init__(self, max_bytes: int = RESULTS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "not_modified": 0,
+            "bytes_saved": 0
+        }
+
+    @staticmethod
+    def make_etag(generation) -> str:
+        return f'"{generation}"'
+
+    def _lookup(self, path: str, generation) -> Dict:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry["generation"] != generation:
+                return None
+            self._entries.move_to_end(path)
+            return entry
+
+    def _store(self, path: str, generation, body: bytes):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._size -= previous["size"]
+            self._entries[path] = {"generation": generation, "body": body, "size": size}
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted["size"]
+                self.stats["evictions"] += 1
+
+    async def get(self, storage, path: str, if_none_match: str = None) -> Tuple[Optional[bytes], str]:
+        """Return ``(body, etag)`` for a results blob, downloading only if it changed.
+
+        When ``if_none_match`` already names the current generation the body
+        is ``None`` and the caller should answer 304 Not Modified.
+        """
+        for attempt in range(3):
+            metadata = await storage.get_metadata(path)
+            if metadata is None:
+                raise FileNotFoundError(f"Results not found: {path}")
+            generation = metadata["generation"]
+            etag = self.make_etag(generation)
+
+            if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+                with self._lock:
+                    self.stats["not_modified"] += 1
+                    self.stats["bytes_saved"] += metadata.get("size") or 0
+                cache_lookup("analysis_results", "not_modified")
+                return None, etag
+
+            entry = self._lookup(path, generation)
+            if entry is not None:
+                with self._lock:
+                    self.stats["hits"] += 1
+                    self.stats["bytes_saved"] += entry["size"]
+                cache_lookup("analysis_results", "hit")
+                return entry["body"], etag
+
+            try:
+                # Gövde okunan generation'a bağlı indirilir; araya giren yazma eski ETag ile önbelleğe girmez
+                body = await storage.download_bytes(path, if_generation_match=generation)
+            except PreconditionFailedError:
+                if attempt == 2:
+                    raise
+                continue
+            with self._lock:
+                self.stats["misses"] += 1
+            cache_lookup("analysis_results", "miss")
+            self._store(path, generation, body)
+            return body, etag
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
@@ -0,0 +1,103 @@
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator
+
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson yoksa stdlib json ile devam et
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _default(obj: Any) -> Any:
+    """Convert NumPy and datetime values that the encoders do not handle natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+    def loads(data) -> Any:
+        return json.loads(data)
+
+
+def iter_ndjson(items: Iterable[Any]) -> Iterator[bytes]:
+    """Yield one JSON document per line"""
+    for item in items:
+        yield dumps(item) + b"\n"
+
+
+def iter_json_array(items: Iterable[Any], raw: bool = False) -> Iterator[bytes]:
+    """Yield a JSON array incrementally; ``raw`` items are already-encoded JSON bytes"""
+    yield b"["
+    first = True
+    for item in items:
+        encoded = item if raw else dumps(item)
+        yield encoded if first else b"," + encoded
+        first = False
+    yield b"]"
+
+
+def iter_json_document(head: Dict[str, Any], key: str, items: Iterable[Any], raw: bool = False) -> Iterator[bytes]:
+    """Yield ``head`` as a JSON object whose ``key`` member is streamed from ``items``"""
+    prefix = dumps(head)
+    if prefix == b"{}":
+        yield b"{" + dumps(key) + b":"
+    else:
+        yield prefix[:-1] + b"," + dumps(key) + b":"
+    yield from iter_json_array(items, raw=raw)
+    yield b"}"
+
+
+async def ndjson_lines_to_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Re-frame a stream of NDJSON bytes as a JSON array without parsing it"""
+    yield b"["
+    first = True
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if not line:
+                continue
+            yield line if first else b"," + line
+            first = False
+    if pending.strip():
+        yield pending if first else b"," + pending
+    yield b"]"
+
+
+class FastJSONResponse(Response):
+    """JSONResponse replacement that uses the fast encoder and handles NumPy types"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
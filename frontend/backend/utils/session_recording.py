@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import time
+import queue
+import struct
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# off: hiç kayıt yok, request: yalnızca ?record=1 ile bağlananlar, all: tüm websocket oturumları
+LIVE_RECORDING = os.getenv("LIVE_RECORDING", "off").lower()
+LIVE_RECORDING_DIR = os.getenv("LIVE_RECORDING_DIR", "recordings")
+LIVE_RECORDING_MAX_MB = float(os.getenv("LIVE_RECORDING_MAX_MB", "512"))
+LIVE_RECORDING_QUEUE = int(os.getenv("LIVE_RECORDING_QUEUE", "256"))
+
+MAGIC = b"VSREC\x00"
+VERSION = 1
+_HEADER = struct.Struct("<6sHI")    # magic, version, metadata length
+_RECORD = struct.Struct("<dI")      # arrival offset in seconds, payload length
+
+
+def recording_requested(query_params) -> bool:
+    """Whether a websocket connection with these query parameters should be recorded"""
+    if LIVE_RECORDING == "all":
+        return True
+    if LIVE_RECORDING == "request":
+        return query_params.get("record", "").lower() in ("1", "true", "yes")
+    return False
+
+
+class SessionRecorder:
+    """Appends a live session's incoming frames with their arrival times to a ``.vsrec`` file.
+
+    Layout: a header carrying JSON metadata, then one ``(offset, length,
+    payload)`` record per frame, where offset is seconds since recording
+    started. Frames are stored exactly as received (already-compressed
+    JPEG/PNG), so a recording costs about as much disk as the camera's
+    upstream bandwidth.
+
+    Writes happen on a background thread; ``add`` never blocks the event
+    loop. If the disk falls behind, frames are dropped from the recording
+    (not from the live session) and counted in ``dropped``.
+    """
+
+    def __init__(self, path: str, meta: Dict[str, Any] = None, max_bytes: int = None,
+                 queue_size: int = LIVE_RECORDING_QUEUE):
+        self.path = path
+        self.max_bytes = max_bytes if max_bytes is not None else int(LIVE_RECORDING_MAX_MB * 1024 * 1024)
+        self.frames = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.truncated = False
+        self._start = time.perf_counter()
+        self._queue: "queue.Queue[Optional[Tuple[float, bytes]]]" = queue.Queue(maxsize=queue_size)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        header = dict(meta or {})
+        header.setdefault("started_at", datetime.utcnow().isoformat())
+        header_bytes = json.dumps(header).encode()
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(header_bytes)) + header_bytes)
+        self.bytes_written = _HEADER.size + len(header_bytes)
+        self._writer = threading.Thread(target=self._write_loop, name="session-recorder", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def for_session(cls, client_id: str, session_id: str, meta: Dict[str, Any] = None,
+                    directory: str = LIVE_RECORDING_DIR) -> "SessionRecorder":
+        safe_client = re.sub(r"[^A-Za-z0-9_.-]", "_", client_id)[:64] or "client"
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(directory, f"{safe_client}-{stamp}-{session_id}.vsrec")
+        return cls(path, {"client_id": client_id, "session_id": session_id, **(meta or {})})
+
+    def add(self, data: bytes, received_at: float = None):
+        """Queue a frame; ``received_at`` is a ``time.perf_counter()`` value"""
+        if self.truncated:
+            return
+        offset = (received_at if received_at is not None else time.perf_counter()) - self._start
+        try:
+            self._queue.put_nowait((offset, bytes(data)))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            offset, data = item
+            if self.bytes_written + _RECORD.size + len(data) > self.max_bytes:
+                if not self.truncated:
+                    logger.warning(f"Recording {self.path} reached {self.max_bytes // (1024 * 1024)} MB, stopped")
+                self.truncated = True
+                continue
+            try:
+                self._file.write(_RECORD.pack(offset, len(data)))
+                self._file.write(data)
+            except OSError as e:
+                logger.error(f"Recording {self.path} failed: {e}")
+                self.truncated = True
+                continue
+            self.bytes_written += _RECORD.size + len(data)
+            self.frames += 1
+
+    def close(self) -> Dict[str, Any]:
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+        summary = self.summary()
+        logger.info(f"Recording closed: {json.dumps(summary)}")
+        return summary
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "bytes": self.bytes_written,
+            "truncated": self.truncated
+        }
+
+
+class SessionRecording:
+    """Reader for ``.vsrec`` files written by ``SessionRecorder``"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, meta_length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a session recording")
+            if version > VERSION:
+                raise ValueError(f"{path} has recording version {version}, newest supported is {VERSION}")
+            self.meta: Dict[str, Any] = json.loads(f.read(meta_length))
+            self._data_start = f.tell()
+
+    def frames(self) -> Iterator[Tuple[float, bytes]]:
+        """Yield ``(offset_seconds, frame_bytes)`` in arrival order.
+
+        A record cut short (server killed mid-write) ends the iteration
+        instead of raising, so crash-time recordings stay usable.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(self._data_start)
+            while True:
+                head = f.read(_RECORD.size)
+                if len(head) < _RECORD.size:
+                    if head:
+                        logger.warning(f"{self.path}: truncated record header at end of file")
+                    return
+                offset, length = _RECORD.unpack(head)
+                data = f.read(length)
+                if len(data) < length:
+                    logger.warning(f"{self.path}: truncated frame at end of file")
+                    return
+                yield offset, data
+
+    def __iter__(self):
+        return self.frames()
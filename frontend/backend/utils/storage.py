@@ -0,0 +1,374 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+import functools
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from utils.serialization import dumps, loads
+from utils.metrics import storage_timer
+
+logger = logging.getLogger(__name__)
+
+STORAGE_IO_THREADS = int(os.getenv("STORAGE_IO_THREADS", "16"))
+STORAGE_MAX_RETRIES = int(os.getenv("STORAGE_MAX_RETRIES", "4"))
+STORAGE_RETRY_BASE_DELAY = float(os.getenv("STORAGE_RETRY_BASE_DELAY", "0.5"))
+STORAGE_RETRY_MAX_DELAY = float(os.getenv("STORAGE_RETRY_MAX_DELAY", "8"))
+COMPOSITE_UPLOAD_THRESHOLD = int(os.getenv("STORAGE_COMPOSITE_THRESHOLD", str(64 * 1024 * 1024)))
+COMPOSITE_CHUNK_SIZE = int(os.getenv("STORAGE_COMPOSITE_CHUNK_SIZE", str(32 * 1024 * 1024)))
+COMPOSITE_PARALLELISM = int(os.getenv("STORAGE_COMPOSITE_PARALLELISM", "4"))
+MAX_COMPOSE_SOURCES = 32  # GCS compose limiti
+
+_NON_RETRYABLE_ERRORS = (ValueError, FileNotFoundError, PermissionError, KeyError)
+_NON_RETRYABLE_STATUS = {400, 401, 403, 404, 409, 412}
+
+_connector = None
+_backend = None
+
+
+class PreconditionFailedError(Exception):
+    """The blob's generation did not match ``if_generation_match`` (0: the blob already exists)"""
+
+    code = 412
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Walk the exception chain; client errors and missing objects are final"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, _NON_RETRYABLE_ERRORS):
+            return False
+        if getattr(error, "code", None) in _NON_RETRYABLE_STATUS:
+            return False
+        error = error.__cause__ or error.__context__
+    return True
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Full jitter exponential backoff
+    return random.uniform(0, min(STORAGE_RETRY_MAX_DELAY, STORAGE_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def retry_call(func: Callable, *args, **kwargs) -> Any:
+    """Call a blocking storage operation with retries and backoff"""
+    for attempt in range(STORAGE_MAX_RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= STORAGE_MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(f"Storage call {getattr(func, '__name__', func)} failed ({str(e)}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+class LazyConnector:
+    """Stands in for a connector and creates it on first attribute access.
+
+    Importing the routes therefore needs neither credentials nor the GCS
+    client library; a missing ``GCP_BUCKET_NAME`` surfaces when storage is
+    first used (the startup readiness check) instead of as an import error.
+    """
+
+    def __init__(self, factory: Callable[[], Any], on_connect: Optional[Callable[[Any], None]] = None):
+        self._factory = factory
+        self.on_connect = on_connect
+        self._connector = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._connector is not None
+
+    def resolve(self):
+        connector = self._connector
+        if connector is None:
+            with self._lock:
+                if self._connector is None:
+                    connector = self._factory()
+                    if self.on_connect is not None:
+                        self.on_connect(connector)
+                    self._connector = connector
+                connector = self._connector
+        return connector
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+
+class StorageBackend(ABC):
+    """Async storage interface used by the API routes.
+
+    Every method is a coroutine so route handlers never block the event
+    loop on a transfer. Blocking code (background analysis) can reach the
+    underlying connector through :meth:`call_blocking`.
+    """
+
+    bucket_name: str
+
+    @abstractmethod
+    async def upload_file(self, local_path: str, blob_name: str, content_type: str = None) -> str:
+        ...
+
+    @abstractmethod
+    async def download_file(self, blob_name: str, local_path: str):
+        ...
+
+    @abstractmethod
+    async def upload_bytes(self, data: bytes, blob_name: str, content_type: str = "application/octet-stream",
+                           if_generation_match: Optional[int] = None) -> str:
+        """Store bytes; with ``if_generation_match`` raise PreconditionFailedError unless the blob is at that generation"""
+        ...
+
+    @abstractmethod
+    async def download_bytes(self, blob_name: str, if_generation_match: Optional[int] = None) -> bytes:
+        ...
+
+    @abstractmethod
+    def iter_bytes(self, blob_name: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """Stream a blob in chunks"""
+        ...
+
+    @abstractmethod
+    async def exists(self, blob_name: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def get_metadata(self, blob_name: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def delete(self, blob_name: str):
+        ...
+
+    @abstractmethod
+    async def generate_signed_url(self, blob_name: str, expiration: int = 3600, method: str = "GET") -> str:
+        ...
+
+    @abstractmethod
+    async def create_resumable_upload_url(self, blob_name: str, content_type: str, expiration: int = 3600) -> Dict:
+        ...
+
+    @abstractmethod
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking helper (e.g. EvidenceStore) on the storage I/O pool"""
+        ...
+
+    @abstractmethod
+    def call_blocking(self, method: str, *args, **kwargs) -> Any:
+        """Call a connector method synchronously, with retries, from a worker thread"""
+        ...
+
+    async def upload_video(self, local_path: str) -> str:
+        """Upload a video and return its blob path"""
+        filename = os.path.basename(local_path)
+        blob_name = f"videos/{datetime.utcnow().strftime('%Y/%m/%d')}/{filename}"
+        await self.upload_file(local_path, blob_name)
+        logger.info(f"Video uploaded: {blob_name}")
+        return blob_name
+
+    async def save_results(self, video_id: str, results: dict) -> str:
+        """Save analysis results and return the results path"""
+        results_path = f"results/{video_id}/analysis.json"
+        data = await self.run(dumps, results)
+        await self.upload_bytes(data, results_path, content_type="application/json")
+        return results_path
+
+    async def get_results(self, results_path: str) -> dict:
+        """Load analysis results"""
+        data = await self.download_bytes(results_path)
+        return await self.run(loads, data)
+
+
+class ConnectorStorageBackend(StorageBackend):
+    """Runs a synchronous connector on a dedicated I/O thread pool.
+
+    Transfers get retries with jittered exponential backoff, and files above
+    ``COMPOSITE_UPLOAD_THRESHOLD`` are uploaded as parallel parts that are
+    composed server-side.
+    """
+
+    def __init__(self, connector, max_workers: int = STORAGE_IO_THREADS):
+        self.sync = connector
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-io")
+
+    @property
+    def bucket_name(self) -> str:
+        return self.sync.bucket_name
+
+    async def connect(self):
+        """Create the connector now if it is lazy (startup check), off the event loop"""
+        if isinstance(self.sync, LazyConnector):
+            await self.run(self.sync.resolve)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        func = getattr(self.sync, method)
+        with storage_timer(method):
+            for attempt in range(STORAGE_MAX_RETRIES + 1):
+                try:
+                    return await self.run(func, *args, **kwargs)
+                except Exception as e:
+                    if attempt >= STORAGE_MAX_RETRIES or not _is_retryable(e):
+                        raise
+                    delay = _backoff_delay(attempt)
+                    logger.warning(f"Storage call {method} failed ({str(e)}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+    def call_blocking(self, method: str, *args, **kwargs) -> Any:
+        with storage_timer(method):
+            return retry_call(getattr(self.sync, method), *args, **kwargs)
+
+    async def upload_file(self, local_path: str, blob_name: str, content_type: str = None) -> str:
+        size = await self.run(os.path.getsize, local_path)
+        if size > COMPOSITE_UPLOAD_THRESHOLD:
+            # Parçalar upload_bytes olarak ayrıca ölçülür
+            with storage_timer("upload_composite"):
+                return await self._upload_composite(local_path, blob_name, size, content_type)
+        await self._call("upload_file", local_path, blob_name)
+        return blob_name
+
+    async def _upload_composite(self, local_path: str, blob_name: str, size: int, content_type: str = None) -> str:
+        """Upload a large file as parallel parts and compose them into one blob"""
+        chunk_size = max(COMPOSITE_CHUNK_SIZE, -(-size // MAX_COMPOSE_SOURCES))
+        offsets = list(range(0, size, chunk_size))
+        prefix = f"{blob_name}.parts/{uuid.uuid4().hex}"
+        part_names = [f"{prefix}/{index:04d}" for index in range(len(offsets))]
+        semaphore = asyncio.Semaphore(COMPOSITE_PARALLELISM)
+
+        def read_range(offset: int) -> bytes:
+            with open(local_path, "rb") as f:
+                f.seek(offset)
+                return f.read(chunk_size)
+
+        async def upload_part(offset: int, part_name: str):
+            async with semaphore:
+                # Parça sadece yüklenirken bellekte tutulur
+                data = await self.run(read_range, offset)
+                await self._call("upload_bytes", data, part_name)
+
+        try:
+            await asyncio.gather(*(upload_part(o, p) for o, p in zip(offsets, part_names)))
+            await self._call("compose", part_names, blob_name, content_type)
+            logger.info(f"Composite upload finished: {blob_name} ({len(part_names)} parts)")
+        finally:
+            for part_name in part_names:
+                try:
+                    await self.run(self.sync.delete_blob, part_name)
+                except Exception as e:
+                    logger.warning(f"Could not delete upload part {part_name}: {str(e)}")
+        return blob_name
+
+    async def download_file(self, blob_name: str, local_path: str):
+        await self._call("download_file", blob_name, local_path)
+
+    async def upload_bytes(self, data: bytes, blob_name: str, content_type: str = "application/octet-stream",
+                           if_generation_match: Optional[int] = None) -> str:
+        if if_generation_match is None:
+            return await self._call("upload_bytes", data, blob_name, content_type)
+        return await self._call("upload_bytes", data, blob_name, content_type, if_generation_match=if_generation_match)
+
+    async def download_bytes(self, blob_name: str, if_generation_match: Optional[int] = None) -> bytes:
+        if if_generation_match is None:
+            return await self._call("download_bytes", blob_name)
+        return await self._call("download_bytes", blob_name, if_generation_match=if_generation_match)
+
+    async def iter_bytes(self, blob_name: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        iterator = self.sync.iter_bytes(blob_name, chunk_size)
+        done = object()
+        try:
+            while True:
+                chunk = await self.run(next, iterator, done)
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            await self.run(iterator.close)
+
+    async def exists(self, blob_name: str) -> bool:
+        return await self._call("blob_exists", blob_name)
+
+    async def get_metadata(self, blob_name: str) -> Optional[Dict]:
+        return await self._call("get_blob_metadata", blob_name)
+
+    async def delete(self, blob_name: str):
+        await self._call("delete_blob", blob_name)
+
+    async def generate_signed_url(self, blob_name: str, expiration: int = 3600, method: str = "GET") -> str:
+        return await self._call("generate_signed_url", blob_name, expiration, method)
+
+    async def create_resumable_upload_url(self, blob_name: str, content_type: str, expiration: int = 3600) -> Dict:
+        return await self._call("create_resumable_upload_url", blob_name, content_type, expiration)
+
+
+class GCSStorageBackend(ConnectorStorageBackend):
+    """GCS backend with a connection pool sized to the I/O thread pool"""
+
+    def __init__(self, connector, max_workers: int = STORAGE_IO_THREADS):
+        super().__init__(connector, max_workers=max_workers)
+        self._max_workers = max_workers
+        if isinstance(connector, LazyConnector):
+            connector.on_connect = self._configure_pool
+        else:
+            self._configure_pool(connector)
+
+    def _configure_pool(self, connector):
+        try:
+            from requests.adapters import HTTPAdapter
+            adapter = HTTPAdapter(pool_connections=self._max_workers, pool_maxsize=self._max_workers)
+            connector.client._http.mount("https://", adapter)
+        except Exception as e:
+            logger.warning(f"Could not configure pooled HTTP session: {str(e)}")
+
+
+class LocalStorageBackend(ConnectorStorageBackend):
+    """Local-disk backend for offline development and tests"""
+
+
+def get_storage_connector():
+    """Return the configured synchronous storage connector.
+
+    ``STORAGE_BACKEND=gcs`` (default) uses the bucket named by
+    ``GCP_BUCKET_NAME``; ``STORAGE_BACKEND=local`` uses a directory on disk
+    and is meant for offline development and tests.
+    """
+    global _connector
+    if _connector is None:
+        backend = os.getenv("STORAGE_BACKEND", "gcs").lower()
+        if backend == "local":
+            from utils.local_storage import LocalStorageConnector
+            _connector = LocalStorageConnector()
+        elif backend == "gcs":
+            from utils.gcp_connector import GCPConnector
+            bucket_name = os.getenv("GCP_BUCKET_NAME")
+            if not bucket_name:
+                raise ValueError("GCP_BUCKET_NAME environment variable is not set")
+            _connector = GCPConnector(bucket_name=bucket_name)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+        logger.info(f"Storage backend: {backend}")
+    return _connector
+
+
+def get_storage_backend() -> StorageBackend:
+    """Return the async storage backend wrapping the configured connector.
+
+    The connector itself is created on first use (see ``LazyConnector``).
+    """
+    global _backend
+    if _backend is None:
+        connector = LazyConnector(get_storage_connector)
+        if os.getenv("STORAGE_BACKEND", "gcs").lower() == "local":
+            _backend = LocalStorageBackend(connector)
+        else:
+            _backend = GCSStorageBackend(connector)
+    return _backend
@@ -0,0 +1,284 @@
+"""Per-role CPU thread budget for every process this service runs.
+
+torch, OpenCV and the executors each size their pools to the core count
+on their own, so N API workers plus their analysis and rescore processes
+each start a core-count pool and the host runs many times more runnable
+threads than cores. The budget splits the host's CPUs between the roles
+that run, then divides each role's share between its processes:
+
+- ``api``: HTTP workers (``WEB_CONCURRENCY`` of them). They run live
+  inference themselves, or only decode and track when
+  ``INFERENCE_WORKERS`` inference processes exist.
+- ``inference``: inference server processes.
+- ``analysis``: background analysis processes (``ANALYSIS_WORKERS`` per
+  API worker in process mode) and ``worker.py``.
+- ``rescore``: rescoring pool processes, which run numpy only.
+
+A role with a ``CPUS_<ROLE>`` list gets exactly those CPUs. The other
+CPUs go to the remaining roles: one per process first, then the spare ones
+by ``THREAD_WEIGHT_<ROLE>`` (defaults below). Rescore processes are idle
+between requests and take one thread from the API share.
+
+Each process calls ``apply_role`` once at start, which sets torch intra-
+and inter-op threads and ``cv2.setNumThreads``, and pins the process when
+a ``CPUS_<ROLE>`` list is given (inference processes get disjoint slices
+of theirs). Executor sizes for the role are read from ``role(...).executors``
+where the executors are created. ``THREADS_<ROLE>`` overrides the computed
+thread count; ``THREAD_BUDGET=off`` keeps the library defaults.
+"""
+import os
+import sys
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# off: torch/OpenCV/executor varsayılanları (çekirdek sayısı kadar thread) korunur
+THREAD_BUDGET = os.getenv("THREAD_BUDGET", "auto").lower()
+
+ROLES = ("api", "inference", "analysis", "rescore")
+# Boşta kalan CPU'ların paylaşımı; inference süreçleri hem canlı hem toplu yükü taşır
+DEFAULT_WEIGHTS = {"api": 1, "inference": 2, "analysis": 1}
+
+
+def parse_cpus(spec: str) -> List[int]:
+    """``"0-3,6"`` -> ``[0, 1, 2, 3, 6]``"""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def split_cpus(cpus: List[int], count: int) -> List[List[int]]:
+    """Disjoint CPU sets for ``count`` processes; processes share CPUs only when there are fewer CPUs than processes"""
+    if len(cpus) < count:
+        return [[cpus[index % len(cpus)]] for index in range(count)]
+    size, extra = divmod(len(cpus), count)
+    sets, start = [], 0
+    for index in range(count):
+        end = start + size + (1 if index < extra else 0)
+        sets.append(cpus[start:end])
+        start = end
+    return sets
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (the container's cpuset, not the host's core count)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+class RoleBudget:
+    """Threads and executor sizes for one process of a role; ``threads`` None means library default"""
+
+    def __init__(self, role: str, processes: int, threads: Optional[int], interop_threads: Optional[int],
+                 executors: Dict[str, int], cpus: Optional[List[int]] = None, split: bool = False):
+        self.role = role
+        self.processes = processes
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.executors = executors
+        self.cpus = cpus
+        self.split = split
+
+    def cpus_for(self, index: int) -> Optional[List[int]]:
+        if not self.cpus:
+            return None
+        if self.split and self.processes > 1:
+            return split_cpus(self.cpus, self.processes)[index % self.processes]
+        return self.cpus
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "processes": self.processes,
+            "threads": self.threads,
+            "interop_threads": self.interop_threads,
+            "executors": self.executors,
+            "cpus": self.cpus
+        }
+
+
+class ThreadBudget:
+    """Split the available CPUs between the roles running on this host.
+
+    Process counts come from the same settings that start the processes
+    (``WEB_CONCURRENCY``, ``INFERENCE_WORKERS``, ``ANALYSIS_WORKERS``), so
+    every process of a deployment computes the same plan on its own. The
+    planned threads add up to at most the CPU count unless there are more
+    processes than CPUs (each process needs one thread); ``oversubscribed``
+    in the snapshot reports that case.
+    """
+
+    def __init__(self, cpus: Optional[List[int]] = None, api_workers: Optional[int] = None,
+                 inference_workers: Optional[int] = None, analysis_workers: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        from utils.inference_server import INFERENCE_SLOTS
+        from utils.job_scheduler import ANALYSIS_WORKER_MODE, ANALYSIS_WORKERS
+
+        self.cpus = cpus or available_cpus()
+        self.enabled = THREAD_BUDGET != "off" if enabled is None else enabled
+        self.api_workers = max(1, api_workers or _env_int("WEB_CONCURRENCY") or 1)
+        self.inference_workers = max(0, inference_workers if inference_workers is not None
+                                     else _env_int("INFERENCE_WORKERS") or 0)
+        per_api = analysis_workers if analysis_workers is not None else ANALYSIS_WORKERS
+        # Thread modunda analizler API sürecinin içinde çalışır, ayrı süreç yoktur
+        self.analysis_processes = self.api_workers * per_api if ANALYSIS_WORKER_MODE == "process" else 0
+        self.inference_slots = INFERENCE_SLOTS
+        self.shares = self._split()
+        self.roles = {role: self._plan(role) for role in ROLES}
+
+    def _pinned_cpus(self, role: str) -> Optional[List[int]]:
+        spec = os.getenv(f"CPUS_{role.upper()}")
+        return parse_cpus(spec) if spec else None
+
+    def _split(self) -> Dict[str, int]:
+        """CPUs per active role: pinned roles get their list, the rest one per process plus spare CPUs by weight"""
+        processes = {"api": self.api_workers, "inference": self.inference_workers, "analysis": self.analysis_processes}
+        shares, weights = {}, {}
+        pinned_cpus = set()
+        for role, count in processes.items():
+            if not count:
+                continue
+            cpus = self._pinned_cpus(role)
+            if cpus:
+                shares[role] = len(cpus)
+                pinned_cpus.update(cpus)
+            else:
+                shares[role] = count
+                # Inference ayrı süreçteyse API worker yalnızca decode ve takip yapar; fazladan CPU almaz
+                default = 0 if role == "api" and self.inference_workers else DEFAULT_WEIGHTS[role]
+                weights[role] = float(os.getenv(f"THREAD_WEIGHT_{role.upper()}", default))
+        free = len([cpu for cpu in self.cpus if cpu not in pinned_cpus]) or len(self.cpus)
+        spare = free - sum(shares[role] for role in weights)
+        total_weight = sum(weights.values())
+        if spare > 0 and total_weight > 0:
+            extra = {role: spare * weight / total_weight for role, weight in weights.items()}
+            for role in weights:
+                shares[role] += int(extra[role])
+            # Kalan CPU'lar en büyük küsurata sahip rollere
+            leftover = spare - sum(int(value) for value in extra.values())
+            for role in sorted(weights, key=lambda r: extra[r] - int(extra[r]), reverse=True)[:leftover]:
+                shares[role] += 1
+        return shares
+
+    def _threads(self, role: str, processes: int) -> int:
+        share = self.shares.get(role, processes)
+        return _env_int(f"THREADS_{role.upper()}") or max(1, share // max(1, processes))
+
+    def _plan(self, role: str) -> RoleBudget:
+        pinned = self._pinned_cpus(role)
+        if not self.enabled:
+            defaults = {"live_inference": 4, "sync_handlers": 40, "rescore_processes": os.cpu_count() or 2}
+            return RoleBudget(role, 1, None, None, defaults if role == "api" else {}, pinned)
+        if role == "api":
+            threads = self._threads(role, self.api_workers)
+            if self.inference_workers:
+                live = self.inference_slots
+            else:
+                # Paylaşılan model kilitli; biri inference yaparken diğeri decode eder
+                live = max(2, threads)
+            executors = {
+                "live_inference": live,
+                # Sync handler'lar çoğunlukla I/O bekler; CPU payından geniş ama 40'tan dar
+                "sync_handlers": max(8, 4 * threads),
+                # Rescore süreçleri API payını kullanır; worker başına payı kadar
+                "rescore_processes": threads
+            }
+            return RoleBudget(role, self.api_workers, threads, 1, executors, pinned)
+        if role == "inference":
+            processes = max(1, self.inference_workers)
+            return RoleBudget(role, processes, self._threads(role, processes), 1, {}, pinned, split=True)
+        if role == "analysis":
+            processes = max(1, self.analysis_processes)
+            return RoleBudget(role, processes, self._threads(role, processes), 1, {}, pinned)
+        return RoleBudget(role, self.api_workers, _env_int("THREADS_RESCORE") or 1, 1, {}, pinned)
+
+    def planned_threads(self) -> int:
+        """Threads of every long-lived process of the plan (rescore pools excluded; they are idle between requests)"""
+        counts = {"api": self.api_workers, "inference": self.inference_workers, "analysis": self.analysis_processes}
+        return sum(counts[role] * (self.roles[role].threads or 0) for role in counts)
+
+    def role(self, name: str) -> RoleBudget:
+        return self.roles[name]
+
+    def snapshot(self) -> Dict[str, Any]:
+        planned = self.planned_threads()
+        return {
+            "enabled": self.enabled,
+            "cpus": len(self.cpus),
+            "shares": self.shares,
+            "planned_threads": planned,
+            "oversubscribed": self.enabled and planned > len(self.cpus),
+            "applied": _applied,
+            "roles": {name: plan.to_dict() for name, plan in self.roles.items()}
+        }
+
+
+_budget: Optional[ThreadBudget] = None
+_budget_lock = threading.Lock()
+_applied: Optional[Dict[str, Any]] = None
+_library_defaults: Optional[Dict[str, int]] = None
+
+
+def get_budget() -> ThreadBudget:
+    global _budget
+    if _budget is None:
+        with _budget_lock:
+            if _budget is None:
+                _budget = ThreadBudget()
+    return _budget
+
+
+def record_library_defaults():
+    """Remember torch/OpenCV defaults before a preloading parent lowers them, so ``THREAD_BUDGET=off`` can restore them"""
+    global _library_defaults
+    if _library_defaults is None:
+        import cv2
+        import torch
+        _library_defaults = {"threads": torch.get_num_threads(), "cv2_threads": cv2.getNumThreads()}
+
+
+def apply_role(role: str, index: int = 0) -> RoleBudget:
+    """Size this process's torch/OpenCV pools for ``role`` and pin it if the role has CPUs; call before inference starts"""
+    global _applied
+    plan = get_budget().role(role)
+    cpus = plan.cpus_for(index)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    threads = plan.threads or (_library_defaults or {}).get("threads")
+    cv2_threads = plan.threads or (_library_defaults or {}).get("cv2_threads")
+    if threads:
+        if "torch" in sys.modules:
+            import torch
+            torch.set_num_threads(threads)
+            if plan.interop_threads:
+                try:
+                    torch.set_num_interop_threads(plan.interop_threads)
+                except RuntimeError:
+                    # Inter-op havuzu ilk paralel işten sonra değiştirilemez; fork edilen worker'da zaten 1
+                    pass
+        else:
+            # torch henüz yüklenmedi (ör. rescore süreci); import edilirse bu değerle başlar
+            os.environ["OMP_NUM_THREADS"] = str(threads)
+    if cv2_threads:
+        import cv2
+        cv2.setNumThreads(cv2_threads)
+    _applied = {"role": role, "index": index, "threads": threads, "cv2_threads": cv2_threads, "cpus": cpus}
+    logger.info(f"Thread budget for {role} process {os.getpid()}: {threads or 'default'} threads"
+                + (f", CPUs {cpus}" if cpus else ""))
+    return plan
+
+
+def applied_role() -> Optional[str]:
+    return _applied["role"] if _applied else None
@@ -0,0 +1,106 @@
+"""Direct-upload session records and Pub/Sub push authentication.
+
+A session is created by one API worker and completed by whichever worker
+receives the client's callback or the bucket notification, so the record
+lives in the bucket (``uploads/sessions/{id}.json``) rather than in process
+memory. Completing a session is a conditional write on the record's
+generation: when the callback and the notification race, only one of them
+queues the analysis.
+"""
+import os
+import hmac
+import uuid
+import logging
+from typing import Dict, Optional, Tuple
+from utils.serialization import dumps, loads
+from utils.storage import PreconditionFailedError
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SESSION_PREFIX = os.getenv("UPLOAD_SESSION_PREFIX", "uploads/sessions")
+# Push aboneliğinin URL'sine ?token=... olarak eklenen paylaşılan anahtar
+UPLOAD_NOTIFICATION_TOKEN = os.getenv("UPLOAD_NOTIFICATION_TOKEN")
+# Ya da aboneliğin OIDC token'ı: audience ve (isteğe bağlı) imzalayan servis hesabı
+UPLOAD_NOTIFICATION_AUDIENCE = os.getenv("UPLOAD_NOTIFICATION_AUDIENCE")
+UPLOAD_NOTIFICATION_SERVICE_ACCOUNT = os.getenv("UPLOAD_NOTIFICATION_SERVICE_ACCOUNT")
+
+_google_request = None
+
+
+class UploadSessionStore:
+    """Upload session records in the bucket, shared by every worker"""
+
+    def __init__(self, storage, prefix: str = UPLOAD_SESSION_PREFIX):
+        self.storage = storage
+        self.prefix = prefix.rstrip("/")
+
+    def path(self, video_id: str) -> str:
+        return f"{self.prefix}/{video_id}.json"
+
+    @staticmethod
+    def video_id_for(object_path: str) -> Optional[str]:
+        """Video id of an uploaded object (``videos/.../{id}.mp4``), or None for other objects"""
+        name = os.path.splitext(os.path.basename(object_path or ""))[0]
+        try:
+            return str(uuid.UUID(name))
+        except ValueError:
+            return None
+
+    async def create(self, video_id: str, record: Dict):
+        await self.storage.upload_bytes(dumps(record), self.path(video_id), "application/json", if_generation_match=0)
+
+    async def get(self, video_id: str) -> Optional[Tuple[Dict, int]]:
+        """The record and the generation it was read at, or None"""
+        path = self.path(video_id)
+        for attempt in range(3):
+            metadata = await self.storage.get_metadata(path)
+            if metadata is None:
+                return None
+            try:
+                data = await self.storage.download_bytes(path, if_generation_match=metadata["generation"])
+            except PreconditionFailedError:
+                # Metadata ile indirme arasında başka bir worker kaydı güncelledi
+                if attempt == 2:
+                    raise
+                continue
+            return loads(data), metadata["generation"]
+
+    async def claim(self, video_id: str, record: Dict, generation: int, **changes) -> bool:
+        """Write ``changes`` into the record read at ``generation``; False if another worker wrote it first"""
+        try:
+            await self.storage.upload_bytes(
+                dumps({**record, **changes}), self.path(video_id), "application/json", if_generation_match=generation
+            )
+        except PreconditionFailedError:
+            return False
+        return True
+
+
+def verify_push_request(authorization: Optional[str], token: Optional[str]) -> Optional[str]:
+    """Why a Pub/Sub push request is rejected, or None when it is authentic; blocking (fetches Google's certs)"""
+    global _google_request
+    if UPLOAD_NOTIFICATION_TOKEN and token and hmac.compare_digest(token, UPLOAD_NOTIFICATION_TOKEN):
+        return None
+    if not UPLOAD_NOTIFICATION_AUDIENCE:
+        if UPLOAD_NOTIFICATION_TOKEN:
+            return "Invalid notification token"
+        # Kimlik doğrulaması yapılandırılmamışsa uç nokta kapalıdır
+        return "Upload notifications are disabled; set UPLOAD_NOTIFICATION_TOKEN or UPLOAD_NOTIFICATION_AUDIENCE"
+    if not authorization or not authorization.startswith("Bearer "):
+        return "Missing bearer token"
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token
+
+    if _google_request is None:
+        _google_request = google_requests.Request()
+    try:
+        claims = id_token.verify_oauth2_token(
+            authorization[len("Bearer "):], _google_request, audience=UPLOAD_NOTIFICATION_AUDIENCE
+        )
+    except ValueError as e:
+        return f"Invalid OIDC token: {str(e)}"
+    if UPLOAD_NOTIFICATION_SERVICE_ACCOUNT and (
+        claims.get("email") != UPLOAD_NOTIFICATION_SERVICE_ACCOUNT or not claims.get("email_verified")
+    ):
+        return "OIDC token was not issued to the notification service account"
+    return None
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from utils.job_scheduler import PRIORITIES
+
+logger = logging.getLogger(__name__)
+
+WORK_QUEUE_BACKEND = os.getenv("WORK_QUEUE_BACKEND", "sqlite")
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "work_queue.db")
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+WORK_QUEUE_LEASE_SECONDS = float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "60"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class WorkQueue(ABC):
+    """Durable job queue shared by API nodes (producers) and workers (consumers).
+
+    Workers ``claim`` a job together with a time-limited lease and keep it
+    alive with ``heartbeat``. A job whose lease expires (worker crashed or
+    was partitioned) is handed to the next claimer until it has been
+    attempted ``max_attempts`` times. Implementations must make ``claim``
+    atomic across processes and machines.
+    """
+
+    @abstractmethod
+    def enqueue(self, job_id: str, task: str, payload: Dict[str, Any], priority: str = "normal",
+                max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float = WORK_QUEUE_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Lease the highest-priority runnable job, or return None"""
+        pass
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float = WORK_QUEUE_LEASE_SECONDS) -> bool:
+        """Extend the lease; False means the lease was lost and the worker must stop"""
+        pass
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        pass
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True) -> bool:
+        pass
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def is_cancel_requested(self, job_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def queue_position(self, job_id: str) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Single-file broker for one machine or a shared volume.
+
+    Claims run inside ``BEGIN IMMEDIATE`` so only one connection can pick a
+    job at a time. SQLite locking is unreliable on network filesystems, so
+    across machines point ``WORK_QUEUE_PATH`` at a local disk of the broker
+    host or replace this class with a networked broker.
+    """
+
+    def __init__(self, path: str = WORK_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    priority_name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    worker_id TEXT,
+                    lease_expires REAL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (status, priority, enqueued_at)")
+        logger.info(f"SQLiteWorkQueue initialized at: {os.path.abspath(path)}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Fork edilen süreç ebeveynin bağlantısını kullanmamalı (SQLite kilitleri süreç başınadır)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE: yazma kilidi baştan alınır, iki worker aynı işi seçemez
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["priority"] = job.pop("priority_name")
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def enqueue(self, job_id, task, payload, priority="normal", max_attempts=WORK_QUEUE_MAX_ATTEMPTS):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}. Allowed: {', '.join(PRIORITIES)}")
+        with self._transaction() as conn:
+            existing = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if existing is not None and existing["status"] in ACTIVE_STATUSES:
+                raise ValueError(f"Job already active: {job_id}")
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, task, payload, priority, priority_name, status, max_attempts, enqueued_at)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, task, json.dumps(payload), PRIORITIES[priority], priority, max_attempts, time.time())
+            )
+        return self.get(job_id)
+
+    def _expire_leases(self, conn: sqlite3.Connection, now: float):
+        # Süresi dolan kiralar: deneme hakkı kaldıysa kuyruğa geri, yoksa failed
+        expired = conn.execute(
+            "SELECT id, attempts, max_attempts, worker_id, cancel_requested FROM jobs"
+            " WHERE status = 'running' AND lease_expires < ?",
+            (now,)
+        ).fetchall()
+        for row in expired:
+            if row["cancel_requested"]:
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ?, worker_id = NULL, lease_expires = NULL"
+                    " WHERE id = ?",
+                    (now, row["id"])
+                )
+            elif row["attempts"] >= row["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, worker_id = NULL, lease_expires = NULL,"
+                    " error = ? WHERE id = ?",
+                    (now, f"Lease expired after {row['attempts']} attempts (last worker {row['worker_id']})", row["id"])
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker_id = NULL, lease_expires = NULL WHERE id = ?",
+                    (row["id"],)
+                )
+            logger.warning(f"Lease expired for job {row['id']} held by {row['worker_id']}")
+
+    def claim(self, worker_id, lease_seconds=WORK_QUEUE_LEASE_SECONDS):
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, now)
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND cancel_requested = 0"
+                " ORDER BY priority, enqueued_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, lease_expires = ?, attempts = attempts + 1,"
+                " started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?",
+                (worker_id, now + lease_seconds, now, now, row["id"])
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return self._row_to_dict(job)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=WORK_QUEUE_LEASE_SECONDS):
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, heartbeat_at = ?"
+                " WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (now + lease_seconds, now, job_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, job_id, worker_id, result):
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'completed', result = ?, finished_at = ?, lease_expires = NULL"
+                " WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (json.dumps(result), time.time(), job_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def fail(self, job_id, worker_id, error, retry=True):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts, cancel_requested FROM jobs"
+                " WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            if row["cancel_requested"]:
+                status = "cancelled"
+            elif retry and row["attempts"] < row["max_attempts"]:
+                status = "queued"
+            else:
+                status = "failed"
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker_id = NULL, lease_expires = NULL,"
+                " finished_at = CASE WHEN ? = 'queued' THEN NULL ELSE ? END WHERE id = ?",
+                (status, error, status, now, job_id)
+            )
+        return True
+
+    def cancel(self, job_id):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] not in ACTIVE_STATUSES:
+                return False
+            if row["status"] == "queued":
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (time.time(), job_id)
+                )
+            else:
+                # Çalışan iş heartbeat sırasında isteği görür ve kendini durdurur
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        return True
+
+    def is_cancel_requested(self, job_id):
+        row = self._connection().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def get(self, job_id):
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row is not None else None
+
+    def queue_position(self, job_id):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT priority, enqueued_at FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return conn.execute(
+            "SELECT COUNT(*) AS n FROM jobs WHERE status = 'queued' AND cancel_requested = 0"
+            " AND (priority < ? OR (priority = ? AND enqueued_at < ?))",
+            (row["priority"], row["priority"], row["enqueued_at"])
+        ).fetchone()["n"]
+
+    def get_stats(self):
+        conn = self._connection()
+        now = time.time()
+        counts = {
+            row["status"]: row["n"]
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        }
+        by_priority = {
+            row["priority_name"]: row["n"]
+            for row in conn.execute(
+                "SELECT priority_name, COUNT(*) AS n FROM jobs WHERE status = 'queued' GROUP BY priority_name"
+            )
+        }
+        oldest = conn.execute("SELECT MIN(enqueued_at) AS t FROM jobs WHERE status = 'queued'").fetchone()["t"]
+        workers = conn.execute(
+            "SELECT worker_id, id, heartbeat_at FROM jobs WHERE status = 'running'"
+        ).fetchall()
+        return {
+            "backend": "sqlite",
+            "counts": counts,
+            "queue_depth": counts.get("queued", 0),
+            "queue_depth_by_priority": {name: by_priority.get(name, 0) for name in PRIORITIES},
+            "oldest_queued_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "running": [
+                {"worker_id": w["worker_id"], "job_id": w["id"], "heartbeat_age": round(now - w["heartbeat_at"], 3)}
+                for w in workers
+            ]
+        }
+
+
+def get_work_queue() -> WorkQueue:
+    """Build the work queue selected by ``WORK_QUEUE_BACKEND``"""
+    if WORK_QUEUE_BACKEND == "sqlite":
+        return SQLiteWorkQueue()
+    raise ValueError(f"Unknown WORK_QUEUE_BACKEND: {WORK_QUEUE_BACKEND}")
@@ -0,0 +1,122 @@
+"""Analysis worker: claims jobs from the distributed work queue and runs them.
+
+Start as many of these as needed, on any machine that can reach the queue
+and the storage bucket; the API tier does not need to change.
+
+    python worker.py [--worker-id ID] [--lease 60] [--poll-interval 2]
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+
+from utils.job_scheduler import JobCancelled
+from utils.work_queue import WORK_QUEUE_LEASE_SECONDS, get_work_queue
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("worker")
+
+
+def load_tasks():
+    """Task name -> callable; each callable accepts its payload as kwargs plus ``cancel_event``"""
+    # Model ve storage sadece worker'da yüklenir; route modülünün kurulumu (scheduler, metrikler) gerekmez
+    from services import video_analysis
+    return {
+        "process_uploaded_video": video_analysis.process_uploaded_video,
+    }
+
+
+class Worker:
+    def __init__(self, queue, worker_id: str, lease_seconds: float, poll_interval: float):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.tasks = load_tasks()
+        self.stopping = threading.Event()
+        self.current_cancel = None
+
+    def stop(self, *_):
+        logger.info(f"Worker {self.worker_id} stopping, current job will be requeued")
+        self.stopping.set()
+        if self.current_cancel is not None:
+            self.current_cancel.set()
+
+    def _heartbeat(self, job_id: str, cancel_event: threading.Event, done: threading.Event):
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                    logger.warning(f"Lost lease on job {job_id}, abandoning it")
+                    cancel_event.set()
+                    return
+                if self.queue.is_cancel_requested(job_id):
+                    cancel_event.set()
+            except Exception as e:
+                # Broker geçici olarak erişilemezse kira süresi dolana kadar denemeye devam et
+                logger.error(f"Heartbeat failed for job {job_id}: {str(e)}")
+
+    def run_job(self, job):
+        job_id = job["id"]
+        cancel_event = threading.Event()
+        done = threading.Event()
+        self.current_cancel = cancel_event
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, cancel_event, done), daemon=True)
+        heartbeat.start()
+        started = time.time()
+        logger.info(f"Claimed job {job_id} ({job['task']}, attempt {job['attempts']}/{job['max_attempts']})")
+        try:
+            task = self.tasks.get(job["task"])
+            if task is None:
+                self.queue.fail(job_id, self.worker_id, f"Unknown task: {job['task']}", retry=False)
+                return
+            result = task(**job["payload"], cancel_event=cancel_event)
+            self.queue.complete(job_id, self.worker_id, result)
+            logger.info(f"Completed job {job_id} in {time.time() - started:.1f}s")
+        except JobCancelled:
+            if self.stopping.is_set():
+                self.queue.fail(job_id, self.worker_id, "Worker shut down", retry=True)
+            else:
+                self.queue.fail(job_id, self.worker_id, "Job cancelled", retry=False)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self.queue.fail(job_id, self.worker_id, str(e), retry=True)
+        finally:
+            done.set()
+            heartbeat.join()
+            self.current_cancel = None
+
+    def run(self, once: bool = False):
+        logger.info(f"Worker {self.worker_id} started")
+        while not self.stopping.is_set():
+            job = self.queue.claim(self.worker_id, self.lease_seconds)
+            if job is None:
+                if once:
+                    break
+                self.stopping.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a video analysis worker")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+    parser.add_argument("--lease", type=float, default=WORK_QUEUE_LEASE_SECONDS, help="Lease length in seconds")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between polls when idle")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    from utils.thread_budget import apply_role
+    apply_role("analysis")
+    worker = Worker(get_work_queue(), args.worker_id, args.lease, args.poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -81,6 +81,8 @@ export default function LiveAnalysisPage() {
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [frameResults, setFrameResults] = useState<DetectionWithTimestamp[]>([]);
   const intervalRef = useRef<NodeJS.Timeout | null>(null);
+  // Backend'deki tracker oturumu; frame'ler arası takip sürekliliği için geri gönderilir
+  const sessionTokenRef = useRef<string | null>(null);
 
   // Kamera başlat
   const startCamera = async () => {
@@ -119,17 +121,23 @@ export default function LiveAnalysisPage() {
       const ctx = canvas.getContext('2d');
       if (!ctx) return;
       ctx.drawImage(videoRef.current, 0, 0);
-      const imageData = canvas.toDataURL('image/jpeg');
+      // Frame'i base64 JSON yerine ham JPEG olarak gönder
+      const imageBlob = await new Promise<Blob | null>(resolve => canvas.toBlob(resolve, 'image/jpeg'));
+      if (!imageBlob) return;
       try {
         const apiUrl = process.env.NEXT_PUBLIC_API_URL?.replace(/\/$/, '');
         const response = await fetch(`${apiUrl}/live/frame`, {
           method: 'POST',
           headers: {
-            'Content-Type': 'application/json',
+            'Content-Type': 'image/jpeg',
+            ...(sessionTokenRef.current ? { 'X-Session-Token': sessionTokenRef.current } : {}),
           },
-          body: JSON.stringify({ image: imageData }),
+          body: imageBlob,
         });
         const data = await response.json();
+        // 410: oturum süresi doldu ya da başka worker'da; sonraki frame token'sız gider
+        if (response.status === 410) sessionTokenRef.current = null;
+        if (data.session_token) sessionTokenRef.current = data.session_token;
         const now = new Date().toLocaleString();
         // Her detection'a timestamp ve risk ekle
         const detections = (data.detections || []).map((det: any) => ({